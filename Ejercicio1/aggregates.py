@@ -0,0 +1,158 @@
+import math
+import tempfile
+from dataclasses import dataclass, field
+
+import numpy as np
+
+#agregados parciales que se pueden combinar: cada trozo de un trimestre (y cada
+#trimestre, en otro proceso) da un Partial, y merge() los junta sin volver a leer
+#los datos. Asi la memoria depende del tamaño del trozo, no del de los ficheros.
+#SpilledSum da ademas la suma exactamente como la calcula pandas con todo en memoria.
+
+#error relativo de los cuantiles aproximados
+QUANTILE_ERROR = 0.01
+
+
+def exact_sum_terms(values: np.ndarray) -> list[float]:
+    """La suma exacta de los valores como unos pocos floats que no se solapan.
+
+    math.fsum redondea el resultado; lo que se pierde al redondear se vuelve a sumar
+    hasta que no queda nada. Juntando los terminos de varios trozos y haciendo fsum
+    al final sale la suma correctamente redondeada de todos, como si fuera un solo trozo.
+    """
+    values = values.tolist()
+    terms = []
+    while True:
+        term = math.fsum(values + [-t for t in terms])
+        if term == 0:
+            return terms
+        terms.append(term)
+
+
+@dataclass
+class QuantileSketch:
+    """Histograma con cubos logaritmicos (como DDSketch): el cuantil que devuelve
+    esta a menos de QUANTILE_ERROR (relativo) del real, y se combina sumando cubos."""
+
+    error: float = QUANTILE_ERROR
+    bins: dict[int, int] = field(default_factory=dict)
+    zeros: int = 0  #valores <= 0, no tienen logaritmo
+
+    @property
+    def gamma(self) -> float:
+        return (1 + self.error) / (1 - self.error)
+
+    def add(self, values: np.ndarray):
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        keys, counts = np.unique(np.ceil(np.log(positive) / math.log(self.gamma)), return_counts=True)
+        for key, count in zip(keys.astype(int).tolist(), counts.tolist()):
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def merge(self, other: "QuantileSketch"):
+        self.zeros += other.zeros
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+
+    def quantile(self, q: float) -> float | None:
+        total = self.zeros + sum(self.bins.values())
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                #punto medio del cubo (gamma^(key-1), gamma^key]
+                return 2 * self.gamma**key / (self.gamma + 1)
+        return None
+
+
+@dataclass
+class Partial:
+    """Recuento, suma exacta, minimo, maximo y cuantiles de una serie de valores."""
+
+    count: int = 0
+    sum_terms: list[float] = field(default_factory=list)
+    min: float = math.inf
+    max: float = -math.inf
+    sketch: QuantileSketch = field(default_factory=QuantileSketch)
+
+    def add(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.sum_terms.extend(exact_sum_terms(values))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.sketch.add(values)
+
+    def merge(self, other: "Partial") -> "Partial":
+        self.count += other.count
+        self.sum_terms.extend(other.sum_terms)
+        self.sum_terms = exact_sum_terms(np.array(self.sum_terms))  #la lista no crece con los trozos
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def sum(self) -> float:
+        return math.fsum(self.sum_terms)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else math.nan
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min if self.count else math.nan,
+            "max": self.max if self.count else math.nan,
+            "p50": self.sketch.quantile(0.5),
+            "p90": self.sketch.quantile(0.9),
+            "p99": self.sketch.quantile(0.99),
+        }
+
+
+class SpilledSum:
+    """Suma de una columna leida por trozos que sale igual, bit a bit, que ndarray.sum()
+    con toda la columna en memoria (lo que hacia mean() con los DataFrames enteros).
+
+    numpy suma por parejas: parte la columna por la mitad (en multiplos de 8) hasta
+    bloques pequeños, y el redondeo depende de esos cortes, que dependen del numero
+    total de filas. Los valores se van guardando en un fichero temporal (8 bytes por
+    fila, no en memoria) y al final se recorre el mismo arbol de cortes leyendo
+    trozos de como mucho `block` valores.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.count = 0
+
+    def add(self, values: np.ndarray):
+        #como pandas: los NaN se suman como 0 (pero siguen ocupando su sitio en el arbol)
+        np.nan_to_num(values.astype("float64"), nan=0.0).tofile(self.file)
+        self.count += len(values)
+
+    def _read(self, offset: int, size: int) -> np.ndarray:
+        self.file.seek(offset * 8)
+        return np.fromfile(self.file, dtype="float64", count=size)
+
+    def _node(self, offset: int, size: int, block: int) -> float:
+        if size <= block:
+            return float(self._read(offset, size).sum())  #el subarbol entero lo calcula numpy
+        half = size // 2
+        half -= half % 8
+        return self._node(offset, half, block) + self._node(offset + half, size - half, block)
+
+    def total(self, block: int = 1 << 20) -> float:
+        self.file.flush()
+        return self._node(0, self.count, max(block, 128))
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,73 @@
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import timestamps
+
+#compara el calculo de duraciones de 2020 (started_at/ended_at) de antes, con
+#pd.to_datetime sin formato y Timedelta, con el de timestamps (formato detectado
+#una vez, columnas enteras con pyarrow, segundos int64), sobre un trimestre sintetico:
+#
+#    python bench_durations.py --rows 5000000
+
+
+def synthetic_times(rows: int, seed: int = 0) -> pd.DataFrame:
+    #columnas como las del CSV de 2020 (texto), con alguna duracion negativa y alguna fecha rota
+    rng = np.random.default_rng(seed)
+    started = np.datetime64("2020-01-01T00:00:00") + rng.integers(0, 90 * 24 * 3600, rows).astype("timedelta64[s]")
+    ended = started + np.round(rng.lognormal(6.4, 0.8, rows)).astype("timedelta64[s]")
+    negative = rng.random(rows) < 0.001
+    ended[negative] = started[negative] - rng.integers(1, 600, negative.sum()).astype("timedelta64[s]")
+    frame = pd.DataFrame({
+        "started_at": pd.Series(np.datetime_as_string(started)).str.replace("T", " ", regex=False),
+        "ended_at": pd.Series(np.datetime_as_string(ended)).str.replace("T", " ", regex=False),
+    }).astype(str)
+    frame.loc[rng.random(rows) < 0.0001, "ended_at"] = "not a date"
+    return frame
+
+
+def legacy_minutes(df: pd.DataFrame) -> pd.Series:
+    #lo que hacia mean_trip_minutes
+    start = pd.to_datetime(df["started_at"], errors="coerce")
+    end = pd.to_datetime(df["ended_at"], errors="coerce")
+    mins = (end - start).dt.total_seconds() / 60
+    return mins[mins >= 0]
+
+
+def fast_minutes(df: pd.DataFrame) -> pd.Series:
+    date_format = timestamps.detect_format(df["started_at"])
+    seconds, valid = timestamps.duration_seconds(df["started_at"], df["ended_at"], date_format)
+    keep = valid & (seconds >= 0)
+    return pd.Series(seconds[keep] / 60, index=df.index[keep])
+
+
+def best_of(function, df: pd.DataFrame, repeat: int) -> tuple[float, pd.Series]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el calculo de duraciones a partir de started_at/ended_at.")
+    parser.add_argument("--rows", type=int, default=5_000_000, help="Viajes del trimestre sintetico.")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones, se queda con la mejor.")
+    args = parser.parse_args()
+
+    df = synthetic_times(args.rows)
+    legacy_seconds, legacy = best_of(legacy_minutes, df, args.repeat)
+    fast_seconds, fast = best_of(fast_minutes, df, args.repeat)
+
+    if not (legacy.index.equals(fast.index) and (legacy.to_numpy() == fast.to_numpy()).all()):
+        raise SystemExit("Las duraciones no coinciden con las de antes")
+    for name, seconds in [("antes", legacy_seconds), ("timestamps", fast_seconds)]:
+        print(f"{name:>10}: {seconds:.2f} s ({args.rows / seconds / 1e6:.1f} M filas/s)")
+    print(f"{legacy_seconds / fast_seconds:.1f}x mas rapido, media {fast.mean():.4f} min en los dos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import os
+import time
+import argparse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+
+import ingest
+
+#cubo de agregados de los viajes: se calcula una vez por trimestre a partir del almacen
+#Parquet (ingest.py) y las consultas solo leen unos miles de celdas ya agregadas:
+#
+#    python cube.py build
+#    python cube.py query --by start_station --where quarter=2019_Q3 --where daytype=weekend
+#    python cube.py query --by hour user_type
+#    python cube.py report
+#
+#cada celda guarda recuento, suma, minimo y maximo de la duracion (en segundos), que
+#se pueden volver a agregar para cualquier corte. Solo cuentan los viajes con
+#duracion >= 0. Las duraciones "1,234.0" si cuentan (mean_trip_time.csv las descarta).
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+cube_dir = os.path.join(base_dir, "processed", "cube")
+
+#cada cuboide es una agregacion por unas dimensiones; una consulta usa el mas pequeño
+#que tenga todas las dimensiones que pide
+CUBOIDS = {
+    "time": ["date", "hour", "user_type"],
+    "station": ["start_station_id", "weekday", "user_type"],
+}
+#dimensiones que se sacan de otras al consultar
+DERIVED = {
+    "weekday": "date",  #0 = lunes
+    "daytype": "weekday",  #weekday / weekend
+}
+MEASURES = {"count": "sum", "duration_sum": "sum", "duration_min": "min", "duration_max": "max"}
+SOURCE_COLUMNS = ["started_at", "duration_seconds", "start_station_id", "start_station_name", "user_type"]
+
+
+def cuboid_path(cuboid: str, quarter: str) -> str:
+    return os.path.join(cube_dir, cuboid, f"quarter={quarter}", "part-0.parquet")
+
+
+def _cells(trips: pd.DataFrame, dimensions: list[str]) -> pd.DataFrame:
+    grouped = trips.groupby(dimensions, observed=True, dropna=False)["duration_seconds"]
+    return grouped.agg(count="count", duration_sum="sum", duration_min="min", duration_max="max").reset_index()
+
+
+def _merge_cells(parts: list[pd.DataFrame], dimensions: list[str]) -> pd.DataFrame:
+    #las celdas de varios trozos se juntan sumando recuentos y sumas
+    return pd.concat(parts).groupby(dimensions, observed=True, dropna=False).agg(MEASURES).reset_index()
+
+
+def build_quarter(quarter: str) -> dict:
+    """Calcula los cuboides de un trimestre, leyendo su Parquet por row groups.
+    Returns:
+        dict: cuboide -> celdas escritas.
+    """
+    source = os.path.join(ingest.store_dir, f"quarter={quarter}", "part-0.parquet")
+    parts = {cuboid: [] for cuboid in CUBOIDS}
+    names = {}
+    for batch in pq.ParquetFile(source).iter_batches(columns=SOURCE_COLUMNS):
+        trips = batch.to_pandas()
+        trips = trips[trips["duration_seconds"] >= 0]
+        trips["date"] = trips["started_at"].dt.floor("D")
+        trips["hour"] = trips["started_at"].dt.hour.astype("int8")
+        trips["weekday"] = trips["started_at"].dt.weekday.astype("int8")
+        for cuboid, dimensions in CUBOIDS.items():
+            parts[cuboid].append(_cells(trips, dimensions))
+        names.update(trips.drop_duplicates("start_station_id").set_index("start_station_id")["start_station_name"])
+
+    written = {}
+    for cuboid, dimensions in CUBOIDS.items():
+        cells = _merge_cells(parts[cuboid], dimensions)
+        if "start_station_id" in dimensions:
+            cells["start_station_name"] = cells["start_station_id"].map(names)
+        path = cuboid_path(cuboid, quarter)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(cells, preserve_index=False), path + ".tmp")
+        os.replace(path + ".tmp", path)
+        written[cuboid] = len(cells)
+    return written
+
+
+def build(force: bool = False) -> dict:
+    """Calcula el cubo de los trimestres del almacen que no lo tienen o que han cambiado."""
+    built = {}
+    for entry in sorted(os.listdir(ingest.store_dir)):
+        if not entry.startswith("quarter="):
+            continue
+        quarter = entry.split("=", 1)[1]
+        source = os.path.join(ingest.store_dir, entry, "part-0.parquet")
+        outputs = [cuboid_path(cuboid, quarter) for cuboid in CUBOIDS]
+        if not force and all(
+            os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(source) for output in outputs
+        ):
+            continue
+        built[quarter] = build_quarter(quarter)
+        print(f"{quarter}: {', '.join(f'{cells} celdas {cuboid}' for cuboid, cells in built[quarter].items())}")
+    return built
+
+
+def _with_derived(cells: pd.DataFrame, dimensions: set[str]) -> pd.DataFrame:
+    if {"weekday", "daytype"} & dimensions and "weekday" not in cells:
+        cells["weekday"] = pd.to_datetime(cells["date"]).dt.weekday
+    if "daytype" in dimensions:
+        cells["daytype"] = cells["weekday"].map(lambda day: "weekend" if day >= 5 else "weekday")
+    return cells
+
+
+def _covers(dimensions: list[str], dimension: str) -> bool:
+    #la dimension esta en el cuboide o se puede sacar de una que esta
+    while dimension not in dimensions:
+        if dimension not in DERIVED:
+            return False
+        dimension = DERIVED[dimension]
+    return True
+
+
+def query(by: list[str], where: dict[str, list[str]] | None = None) -> pd.DataFrame:
+    """Agrega el cubo por unas dimensiones, filtrando por otras.
+    Args:
+        by (list[str]): Dimensiones del resultado (quarter, date, hour, weekday, daytype,
+            user_type, start_station).
+        where (dict): dimension -> valores aceptados.
+    Returns:
+        pd.DataFrame: trips, mean_min, min_min y max_min por cada combinacion.
+    """
+    where = where or {}
+    by = ["start_station_id" if dimension == "start_station" else dimension for dimension in by]
+    where = {"start_station_id" if key == "start_station" else key: values for key, values in where.items()}
+    needed = {*by, *where} - {"quarter"}
+    cuboid = min(
+        (name for name, dimensions in CUBOIDS.items() if all(_covers(dimensions, need) for need in needed)),
+        key=lambda name: len(CUBOIDS[name]),
+        default=None,
+    )
+    if cuboid is None:
+        raise ValueError(f"Ningun cuboide tiene a la vez {sorted(needed)}")
+
+    dataset = ds.dataset(os.path.join(cube_dir, cuboid), format="parquet", partitioning="hive")
+    quarter_filter = ds.field("quarter").isin(where["quarter"]) if "quarter" in where else None
+    cells = dataset.to_table(filter=quarter_filter).to_pandas()
+    cells = _with_derived(cells, {*by, *where})
+    for key, values in where.items():
+        #los valores llegan como texto desde la linea de comandos
+        cells = cells[cells[key].astype(str).isin([str(value) for value in values])]
+
+    keys = [*by, "start_station_name"] if "start_station_id" in by else by
+    if keys:
+        result = cells.groupby(keys, observed=True, dropna=False).agg(MEASURES).reset_index()
+    else:
+        result = cells.agg(MEASURES).to_frame().T
+    result["mean_min"] = result["duration_sum"] / result["count"] / 60
+    result["min_min"] = result["duration_min"] / 60
+    result["max_min"] = result["duration_max"] / 60
+    return result.rename(columns={"count": "trips"}).drop(columns=list(MEASURES)[1:])
+
+
+def report(excel_path: str, plot: bool = True):
+    """Excel (una hoja por corte) y grafico de la duracion media, todo sacado del cubo."""
+    sheets = {
+        "trimestre": query(["quarter"]),
+        "hora": query(["quarter", "hour"]),
+        "dia_semana": query(["quarter", "weekday"]),
+        "tipo_usuario": query(["quarter", "user_type"]),
+        "estacion": query(["quarter", "start_station"]),
+    }
+    with pd.ExcelWriter(excel_path) as writer:
+        for name, sheet in sheets.items():
+            sheet.to_excel(writer, sheet_name=name, index=False)
+    print("Guardado Excel:", excel_path)
+
+    if plot:
+        import matplotlib.pyplot as plt
+
+        sheets["trimestre"].plot(x="quarter", y="mean_min", marker="o", legend=False)
+        plt.xticks(rotation=45)
+        plt.ylabel("Duración media (min)")
+        plt.title("Evolución de la duración media por trimestre")
+        plt.tight_layout()
+        plt.show()
+
+
+def parse_where(conditions: list[str]) -> dict[str, list[str]]:
+    #["quarter=2019_Q3", "daytype=weekend,weekday"] -> {"quarter": ["2019_Q3"], ...}
+    where = {}
+    for condition in conditions:
+        key, _, values = condition.partition("=")
+        where.setdefault(key, []).extend(values.split(","))
+    return where
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cubo de agregados de los viajes de Divvy.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="Calcular el cubo de los trimestres nuevos o cambiados.")
+    build_parser.add_argument("--force", action="store_true", help="Recalcular todos los trimestres.")
+    query_parser = commands.add_parser("query", help="Consultar un corte del cubo.")
+    query_parser.add_argument("--by", nargs="*", default=[], help="Dimensiones del resultado.")
+    query_parser.add_argument("--where", action="append", default=[], help="dimension=valor[,valor...]")
+    query_parser.add_argument("--sort", default="mean_min", help="Columna por la que ordenar (descendente).")
+    query_parser.add_argument("--top", type=int, default=20, help="Filas a mostrar (0 = todas).")
+    report_parser = commands.add_parser("report", help="Excel y grafico a partir del cubo.")
+    report_parser.add_argument("--no-plot", action="store_true", help="No mostrar el gráfico.")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if not build(force=args.force):
+            print("El cubo esta al dia.")
+    elif args.command == "query":
+        start = time.perf_counter()
+        result = query(args.by, parse_where(args.where)).sort_values(args.sort, ascending=False)
+        elapsed = time.perf_counter() - start
+        print((result.head(args.top) if args.top else result).to_string(index=False))
+        print(f"{len(result)} filas en {elapsed * 1000:.0f} ms")
+    else:
+        report(os.path.join(base_dir, "processed", "trip_cube.xlsx"), plot=not args.no_plot)
+
+
+if __name__ == "__main__":
+    main()
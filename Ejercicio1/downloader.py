@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import zipfile
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+#descarga de los zips de Divvy:
+# - cada zip se escribe a disco por trozos (nunca esta entero en memoria)
+# - varias descargas a la vez, con un numero maximo de hilos
+# - si el zip ya esta descargado y coincide (tamaño, ETag y checksum) no se vuelve a bajar
+# - solo se extraen los CSV que faltan o han cambiado
+# - se muestra la velocidad de cada descarga en MB/s
+
+CHUNK_SIZE = 1024 * 1024  #1 MB por trozo
+WORKERS = 4
+TIMEOUT = 60
+MANIFEST_NAME = "_descargas.json"  #lo que sabemos de cada zip descargado
+
+
+class Manifest:
+    """Tamaño, ETag y sha256 de cada zip descargado, guardado en la carpeta de descargas."""
+
+    def __init__(self, download_dir: str):
+        self.path = os.path.join(download_dir, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as file:
+                self.entries = json.load(file)
+
+    def get(self, url: str) -> dict | None:
+        with self.lock:
+            return self.entries.get(url)
+
+    def set(self, url: str, entry: dict):
+        #se guarda entero en cada cambio, asi un fallo a mitad no pierde lo ya bajado
+        with self.lock:
+            self.entries[url] = entry
+            temporary = self.path + ".tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump(self.entries, file, indent=2)
+            os.replace(temporary, self.path)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remote_info(session: requests.Session, url: str) -> tuple[int | None, str | None]:
+    #tamaño y ETag del zip en el servidor, sin descargarlo
+    response = session.head(url, timeout=TIMEOUT, allow_redirects=True)
+    response.raise_for_status()
+    size = response.headers.get("Content-Length")
+    return (int(size) if size else None), response.headers.get("ETag")
+
+
+def is_current(path: str, entry: dict | None, size: int | None, etag: str | None, verify: bool = True) -> bool:
+    #el zip local vale si es el mismo que el del servidor y no se ha corrompido en disco
+    if entry is None or not os.path.exists(path):
+        return False
+    if os.path.getsize(path) != entry["size"] or (size is not None and size != entry["size"]):
+        return False
+    if etag is not None and etag != entry.get("etag"):
+        return False
+    return not verify or file_sha256(path) == entry["sha256"]
+
+
+def md5_from_etag(etag: str | None) -> str | None:
+    #en S3 el ETag de un fichero subido de una vez es su md5 (con '-' si se subio por partes)
+    if etag is None:
+        return None
+    value = etag.strip('"')
+    return value if len(value) == 32 and "-" not in value else None
+
+
+def stream_to_disk(session: requests.Session, url: str, path: str) -> dict:
+    """Descarga un zip por trozos a <path>.part y lo renombra al acabar.
+    Returns:
+        dict: size, etag y sha256 del zip descargado.
+    """
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    size = 0
+    partial = path + ".part"
+    with session.get(url, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        expected = response.headers.get("Content-Length")
+        with open(partial, "wb") as file:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                file.write(chunk)
+                sha256.update(chunk)
+                md5.update(chunk)
+                size += len(chunk)
+
+    #comprobaciones de integridad antes de darlo por bueno
+    if expected is not None and int(expected) != size:
+        os.remove(partial)
+        raise IOError(f"descarga incompleta ({size} de {expected} bytes)")
+    if md5_from_etag(etag) not in (None, md5.hexdigest()):
+        os.remove(partial)
+        raise IOError("el md5 no coincide con el ETag")
+    os.replace(partial, path)
+    return {"size": size, "etag": etag, "sha256": sha256.hexdigest()}
+
+
+def extract(zip_path: str, download_dir: str, extracted_before: dict | None = None) -> tuple[list[str], dict]:
+    """Extrae los CSV del zip que no esten ya extraidos de ese mismo miembro.
+    Args:
+        zip_path (str): El zip.
+        download_dir (str): Carpeta donde se extraen.
+        extracted_before (dict): CRC y tamaño de los miembros extraidos la ultima vez (manifiesto).
+    Returns:
+        tuple[list[str], dict]: Los ficheros extraidos en esta llamada y el CRC y tamaño de
+        todos los miembros que estan extraidos, para guardarlos en el manifiesto.
+    """
+    extracted_before = extracted_before or {}
+    root = os.path.realpath(download_dir)
+    extracted, members = [], {}
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in archive.infolist():
+            #la carpeta __MACOSX de los zips no tiene datos
+            if member.is_dir() or member.filename.startswith("__MACOSX"):
+                continue
+            target = os.path.join(download_dir, member.filename)
+            #nombres absolutos o con '..' que saldrian de la carpeta de descargas
+            if os.path.commonpath([root, os.path.realpath(target)]) != root:
+                print(f"{os.path.basename(zip_path)}: se ignora {member.filename!r}, queda fuera de {download_dir}")
+                continue
+            known = {"crc": member.CRC, "size": member.file_size}
+            members[member.filename] = known
+            #mismo tamaño no basta: un CSV corregido puede medir lo mismo, se compara el CRC del miembro
+            if extracted_before.get(member.filename) == known and os.path.exists(target) \
+                    and os.path.getsize(target) == member.file_size:
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            #se copia por trozos, el CSV descomprimido tampoco pasa entero por memoria
+            with archive.open(member) as source, open(target + ".part", "wb") as destination:
+                shutil.copyfileobj(source, destination, CHUNK_SIZE)
+            os.replace(target + ".part", target)
+            extracted.append(target)
+    return extracted, members
+
+
+def download(session: requests.Session, url: str, download_dir: str, manifest: Manifest, verify: bool = True) -> dict:
+    """Descarga (si hace falta) y extrae un zip.
+    Returns:
+        dict: url, fichero, bytes, segundos, si se salto y los CSV extraidos.
+    """
+    name = os.path.basename(urlparse(url).path)
+    path = os.path.join(download_dir, name)
+    start = time.perf_counter()
+
+    size, etag = remote_info(session, url)
+    entry = manifest.get(url)
+    skipped = is_current(path, entry, size, etag, verify)
+    if not skipped:
+        #los miembros extraidos del zip anterior se conservan para comparar sus CRC
+        entry = {"file": name, **stream_to_disk(session, url, path), "members": (entry or {}).get("members", {})}
+        manifest.set(url, entry)
+    seconds = time.perf_counter() - start
+
+    extracted, members = extract(path, download_dir, entry.get("members"))
+    manifest.set(url, {**entry, "members": members})
+    return {
+        "url": url,
+        "file": name,
+        "bytes": 0 if skipped else entry["size"],
+        "seconds": seconds,
+        "skipped": skipped,
+        "extracted": extracted,
+    }
+
+
+def download_all(urls, download_dir: str, workers: int = WORKERS, verify: bool = True) -> list[dict]:
+    """Descarga y extrae varios zips a la vez.
+    Args:
+        urls: URLs de los zips.
+        download_dir (str): Carpeta de descargas.
+        workers (int): Descargas simultaneas como maximo.
+        verify (bool): Comprobar el sha256 de los zips ya descargados antes de saltarlos.
+    Returns:
+        list[dict]: El resultado de cada zip (ver download), los que fallan no estan.
+    """
+    os.makedirs(download_dir, exist_ok=True)
+    manifest = Manifest(download_dir)
+    results = []
+    start = time.perf_counter()
+
+    #una sesion por hilo, requests.Session no se debe compartir entre hilos
+    local = threading.local()
+
+    def worker(url):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return download(local.session, url, download_dir, manifest, verify)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(worker, url): url for url in sorted(urls)}
+        for future, url in futures.items():
+            try:
+                result = future.result()
+            except zipfile.BadZipFile:
+                #filtro para los zips
+                print(f"{url} no es un ZIP valido")
+                continue
+            except Exception as e:
+                print(f"Error con {url}: {e}")
+                continue
+            results.append(result)
+            if result["skipped"]:
+                print(f"{result['file']}: ya descargado, {len(result['extracted'])} CSV extraidos")
+            else:
+                megabytes = result["bytes"] / 1e6
+                print(
+                    f"{result['file']}: {megabytes:.1f} MB en {result['seconds']:.1f} s "
+                    f"({megabytes / result['seconds']:.1f} MB/s)"
+                )
+
+    elapsed = time.perf_counter() - start
+    total = sum(result["bytes"] for result in results) / 1e6
+    print(f"Total: {total:.1f} MB en {elapsed:.1f} s ({total / elapsed:.1f} MB/s)")
+    return results
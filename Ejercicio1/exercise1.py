@@ -1,8 +1,9 @@
 import os
-import requests
-import pandas as pd
-import zipfile
-import io
+
+import downloader
+import profiler
+import ingest
+import cube
 
 
 download_urls = {
@@ -15,56 +16,32 @@ download_urls = {
 "https://divvy-tripdata.s3.amazonaws.com/Divvy_Trips_2220_Q1.zip",
 }
 
-#creamos la carpeta dowloads en la url (cambiar URL para seleccionar donde queremos guardarlo), si no existe ya
-base_dir = r"D:\USJ_2025_2026\Ingenieria de Datos\Git\ingenieria_de_datos\Ejercicio1"
+#la carpeta downloads va junto a este script (antes era la ruta absoluta del equipo del autor)
+base_dir = os.path.dirname(os.path.abspath(__file__))
 download_dir = os.path.join(base_dir, "downloads")
-os.makedirs(download_dir, exist_ok=True)
-
-
-#al parecer, la propia libreria detecta que zips se han descargado ya, pero seria conveniente 
-# crear algun control de flujo para que solo se descarse si no esta ya descargado.
-
-#de esta forma no hay que borrar los zips de la carpeta (PREGUNTAR SI SE PUEDE DE ESTA FORMA)
-#con esto se extraeria el nombre pero no hace falta
-#filename=os.path.basename(url)
-#print(filename)
-
-for url in download_urls:
-    try:
-        response = requests.get(url)
-        zip_file = zipfile.ZipFile(io.BytesIO(response.content))
-        zip_file.extractall(download_dir)
-    
-    #filtro para los zips
-    except zipfile.BadZipFile:
-        print(f"{url} no es un ZIP valido")
-        
-    except Exception as e:
-        print(f"Error con {url}: {e}")
 
-dataframes = []
-    
-#para cada csv dentro de la carpeta (lista una direccion) downloads
-for csv in os.listdir(download_dir):
-    #asegurarse de que acaba en csv, pero no es relevante aqui
-    if csv.lower().endswith(".csv"):
 
-    #el path de cada uno tendra que ser la carpeta donde esta guardado + /el nombre del archivo
-    #el nombre es el objeto de iteración del primer bucle
-        path = os.path.join(download_dir, csv)
-        print(path)
-        df = pd.read_csv(path)
-        dataframes.append(df)
+#todo va dentro de main(): con spawn (Windows, macOS) cada proceso del perfil importa
+#este script de nuevo y no debe volver a descargar ni a lanzar su propio pool
+def main():
+    os.makedirs(download_dir, exist_ok=True)
 
+    #los zips se descargan por trozos y varios a la vez; los que ya estan descargados
+    #(mismo tamaño, ETag y checksum) no se vuelven a bajar, y solo se extraen los CSV que faltan
+    downloader.download_all(download_urls, download_dir)
 
-#mirar los datos nulos que hay en los df, y mostrar solo las columnas que tienen numeros y cuantos tienen
-for i, df in enumerate(dataframes, start=1):
-    nulls = df.isnull().sum()
-    if nulls.sum() > 0:   #hay al menos un nulo en el DataFrame
-        print(f"DataFrame {i} tiene nulos:")
-        print(nulls[nulls > 0])   #muestra solo las columnas con nulos
-        print()
+    #los CSV nuevos o cambiados pasan al almacen Parquet tipado (processed/trips), que es lo que leen los analisis
+    ingest.ingest(download_dir)
+    #y de ahi al cubo de agregados (por dia, hora, estacion y tipo de usuario), solo los trimestres nuevos
+    cube.build()
 
+    #perfil de calidad de cada trimestre (nulos, distintos, invalidos, viajes negativos,
+    #fechas fuera del trimestre, trip_id repetidos): cada CSV se lee una vez por trozos,
+    #nunca estan todos en memoria, y los que no han cambiado salen de la cache
+    profiles = profiler.profile_all(download_dir)
+    profiler.write_report(profiles)
+    profiler.print_summary(profiles)
 
-   
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import os
+import json
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+
+import timestamps
+
+#ingesta de los trimestres de Divvy a un almacen Parquet con un unico esquema tipado:
+#cada CSV (con cualquiera de los tres esquemas de Divvy) se lee una sola vez, por
+#trozos, y se escribe en processed/trips/quarter=<trimestre>/part-0.parquet.
+#Los analisis leen despues solo las columnas que necesitan:
+#
+#    read_trips(["quarter", "duration_seconds"])
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+download_dir = os.path.join(base_dir, "downloads")
+store_dir = os.path.join(base_dir, "processed", "trips")
+STATE_NAME = "_ingesta.json"  #tamaño y fecha de cada CSV ya ingerido
+CHUNK_ROWS = 500_000
+
+#esquema canonico
+SCHEMA = pa.schema([
+    ("trip_id", pa.string()),  #entero hasta 2019, hexadecimal en 2020
+    ("started_at", pa.timestamp("ms")),
+    ("ended_at", pa.timestamp("ms")),
+    ("bike_id", pa.int32()),
+    ("duration_seconds", pa.float64()),  #la de Divvy; en 2020 no la hay y es ended_at - started_at
+    ("start_station_id", pa.int32()),
+    ("start_station_name", pa.dictionary(pa.int32(), pa.string())),
+    ("end_station_id", pa.int32()),
+    ("end_station_name", pa.dictionary(pa.int32(), pa.string())),
+    ("user_type", pa.dictionary(pa.int8(), pa.string())),  #member / casual
+    ("gender", pa.dictionary(pa.int8(), pa.string())),
+    ("birth_year", pa.int16()),
+    ("start_lat", pa.float64()),
+    ("start_lng", pa.float64()),
+    ("end_lat", pa.float64()),
+    ("end_lng", pa.float64()),
+])
+
+#columnas de cada esquema de origen -> columnas canonicas
+RENAMES = {
+    "tripduration": {
+        "trip_id": "trip_id", "start_time": "started_at", "end_time": "ended_at", "bikeid": "bike_id",
+        "tripduration": "duration_seconds", "from_station_id": "start_station_id",
+        "from_station_name": "start_station_name", "to_station_id": "end_station_id",
+        "to_station_name": "end_station_name", "usertype": "user_type", "gender": "gender",
+        "birthyear": "birth_year",
+    },
+    "rental_details": {
+        "01 - Rental Details Rental ID": "trip_id", "01 - Rental Details Local Start Time": "started_at",
+        "01 - Rental Details Local End Time": "ended_at", "01 - Rental Details Bike ID": "bike_id",
+        "01 - Rental Details Duration In Seconds Uncapped": "duration_seconds",
+        "03 - Rental Start Station ID": "start_station_id", "03 - Rental Start Station Name": "start_station_name",
+        "02 - Rental End Station ID": "end_station_id", "02 - Rental End Station Name": "end_station_name",
+        "User Type": "user_type", "Member Gender": "gender", "05 - Member Details Member Birthday Year": "birth_year",
+    },
+    "started_at": {
+        "ride_id": "trip_id", "started_at": "started_at", "ended_at": "ended_at",
+        "start_station_id": "start_station_id", "start_station_name": "start_station_name",
+        "end_station_id": "end_station_id", "end_station_name": "end_station_name", "start_lat": "start_lat",
+        "start_lng": "start_lng", "end_lat": "end_lat", "end_lng": "end_lng", "member_casual": "user_type",
+    },
+}
+USER_TYPES = {"Subscriber": "member", "Customer": "casual", "member": "member", "casual": "casual"}
+
+
+def detect_schema(columns) -> str:
+    for schema, renames in RENAMES.items():
+        if set(renames).issubset(columns):
+            return schema
+    raise ValueError(f"Esquema desconocido: {list(columns)[:5]}...")
+
+
+def parse_numbers(values: pd.Series) -> pd.Series:
+    #"1,234.0" -> 1234.0 (las duraciones de Divvy llevan separador de miles)
+    return pd.to_numeric(values.str.replace(",", "", regex=False), errors="coerce")
+
+
+def canonical_chunk(chunk: pd.DataFrame, schema: str, date_format: str | None) -> pa.Table:
+    """Convierte un trozo de CSV (todo texto) al esquema canonico."""
+    chunk = chunk.rename(columns=RENAMES[schema])
+    columns = {"trip_id": chunk["trip_id"]}
+    columns["started_at"] = timestamps.parse(chunk["started_at"], date_format)
+    columns["ended_at"] = timestamps.parse(chunk["ended_at"], date_format)
+    if "duration_seconds" in chunk:
+        columns["duration_seconds"] = parse_numbers(chunk["duration_seconds"])
+    else:
+        seconds, valid = timestamps.duration_seconds(chunk["started_at"], chunk["ended_at"], date_format)
+        columns["duration_seconds"] = np.where(valid, seconds, np.nan)
+    for name in ["bike_id", "start_station_id", "end_station_id", "birth_year"]:
+        if name in chunk:
+            columns[name] = parse_numbers(chunk[name]).astype("Int64")
+    for name in ["start_lat", "start_lng", "end_lat", "end_lng"]:
+        if name in chunk:
+            columns[name] = parse_numbers(chunk[name])
+    columns["start_station_name"] = chunk["start_station_name"]
+    columns["end_station_name"] = chunk["end_station_name"]
+    columns["user_type"] = chunk["user_type"].map(USER_TYPES)
+    if "gender" in chunk:
+        columns["gender"] = chunk["gender"]
+
+    arrays = []
+    for field in SCHEMA:
+        values = columns.get(field.name)
+        if values is None:
+            arrays.append(pa.nulls(len(chunk), field.type))
+        elif isinstance(values, pa.ChunkedArray):
+            arrays.append(values.combine_chunks().cast(field.type))
+        elif isinstance(values, pa.Array):
+            arrays.append(values.cast(field.type))
+        else:
+            arrays.append(pa.array(values, from_pandas=True).cast(field.type))
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def ingest_csv(csv_path: str, output_path: str, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Escribe un trimestre en Parquet, un row group por trozo del CSV.
+    Returns:
+        int: Filas escritas.
+    """
+    rows = 0
+    schema = date_format = None
+    temporary = output_path + ".tmp"
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    #todo se lee como texto: los tipos los pone canonical_chunk, igual para todos los trimestres
+    reader = pd.read_csv(csv_path, dtype=str, chunksize=chunk_rows, keep_default_na=False, na_values=[""])
+    with pq.ParquetWriter(temporary, SCHEMA, compression="zstd") as writer:
+        for chunk in reader:
+            if schema is None:
+                schema = detect_schema(chunk.columns)
+                started_at = next(column for column, name in RENAMES[schema].items() if name == "started_at")
+                date_format = timestamps.detect_format(chunk[started_at])
+            writer.write_table(canonical_chunk(chunk, schema, date_format))
+            rows += len(chunk)
+    os.replace(temporary, output_path)
+    return rows
+
+
+def load_state() -> dict:
+    path = os.path.join(store_dir, STATE_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_state(state: dict):
+    with open(os.path.join(store_dir, STATE_NAME), "w", encoding="utf-8") as file:
+        json.dump(state, file, indent=2)
+
+
+def ingest(download_dir: str = download_dir, force: bool = False) -> dict:
+    """Ingiere los CSV nuevos o cambiados (por tamaño y fecha) de la carpeta de descargas.
+    Returns:
+        dict: trimestre -> filas escritas, solo de los ingeridos en esta llamada.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    state = {} if force else load_state()
+    written = {}
+    for csv_name in sorted(os.listdir(download_dir)):
+        if not csv_name.lower().endswith(".csv"):
+            continue
+        csv_path = os.path.join(download_dir, csv_name)
+        quarter = Path(csv_name).stem.replace("Divvy_Trips_", "")
+        status = os.stat(csv_path)
+        signature = {"size": status.st_size, "mtime": status.st_mtime}
+        output_path = os.path.join(store_dir, f"quarter={quarter}", "part-0.parquet")
+        if state.get(quarter, {}).get("source") == signature and os.path.exists(output_path):
+            continue
+        rows = ingest_csv(csv_path, output_path)
+        state[quarter] = {"source": signature, "rows": rows}
+        save_state(state)
+        written[quarter] = rows
+        print(f"{csv_name}: {rows} viajes -> {output_path}")
+    return written
+
+
+def read_trips(columns: list[str] = None, quarters: list[str] = None) -> pd.DataFrame:
+    """Lee del almacen solo las columnas (y trimestres) pedidos."""
+    dataset = ds.dataset(store_dir, format="parquet", partitioning="hive", exclude_invalid_files=True)
+    expression = ds.field("quarter").isin(quarters) if quarters else None
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingiere los CSV de Divvy en un almacen Parquet tipado.")
+    parser.add_argument("--force", action="store_true", help="Volver a ingerir todos los trimestres.")
+    args = parser.parse_args()
+    written = ingest(force=args.force)
+    if not written:
+        print("Nada nuevo que ingerir.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,186 @@
 import os
-import pandas as pd
+import argparse
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-base_dir = r"D:\USJ_2025_2026\Ingenieria de Datos\Git\ingenieria_de_datos\Ejercicio1"
+#pandas y matplotlib se importan solo cuando hacen falta: `--help` no carga nada
+#y una ejecucion que solo escribe el CSV no carga matplotlib (ni openpyxl para el Excel)
+if TYPE_CHECKING:
+    import pandas as pd
+
+#la carpeta del propio script (antes era la ruta absoluta del equipo del autor)
+base_dir = os.path.dirname(os.path.abspath(__file__))
 download_dir = os.path.join(base_dir, "downloads")
 processed_dir = os.path.join(base_dir, "processed")
-os.makedirs(processed_dir, exist_ok=True)
+
+
+#columnas de las que sale la duracion, segun el esquema del trimestre
+DURATION_COLUMNS = [["tripduration"], ["01 - Rental Details Duration In Seconds Uncapped"], ["started_at", "ended_at"]]
+CHUNK_ROWS = 250_000  #filas por trozo: la memoria depende de esto, no del tamaño de los CSV
+WORKERS = 4  #trimestres procesados a la vez, cada uno en su proceso
+
 
 #cargar CSVs como (nombre, df)
-frames = []
-for csv_name in os.listdir(download_dir):
-    if csv_name.lower().endswith(".csv"):
-        path = os.path.join(download_dir, csv_name)
-        df = pd.read_csv(path)
-        name = Path(csv_name).stem
-        frames.append((name, df))
+def load_frames(download_dir: str) -> list[tuple[str, "pd.DataFrame"]]:
+    import pandas as pd
+
+    frames = []
+    for csv_name in os.listdir(download_dir):
+        if csv_name.lower().endswith(".csv"):
+            path = os.path.join(download_dir, csv_name)
+            df = pd.read_csv(path)
+            name = Path(csv_name).stem
+            frames.append((name, df))
+    return frames
+
+
+#duracion en minutos de cada viaje valido (la de Divvy o, en 2020, fin - inicio sin las negativas)
+#formats guarda el formato de fecha detectado para cada esquema, asi con un CSV leido
+#por trozos se detecta en el primero y no en todos
+def trip_minutes(df: "pd.DataFrame", formats: dict | None = None) -> "pd.Series | None":
+    import pandas as pd
 
-#función para calcular duración media en minutos
-def mean_trip_minutes(df: pd.DataFrame) -> float | None:
     if "tripduration" in df.columns:
-        return (pd.to_numeric(df["tripduration"], errors="coerce") / 60).mean()
+        return pd.to_numeric(df["tripduration"], errors="coerce") / 60
 
     col_alt = "01 - Rental Details Duration In Seconds Uncapped"
     if col_alt in df.columns:
-        return (pd.to_numeric(df[col_alt], errors="coerce") / 60).mean()
+        return pd.to_numeric(df[col_alt], errors="coerce") / 60
 
     if {"started_at", "ended_at"}.issubset(df.columns):
-        start = pd.to_datetime(df["started_at"], errors="coerce")
-        end   = pd.to_datetime(df["ended_at"], errors="coerce")
-        mins = (end - start).dt.total_seconds() / 60
-        return mins[mins >= 0].mean()
+        import timestamps
+
+        formats = {} if formats is None else formats
+        schema = ("started_at", "ended_at")
+        if schema not in formats:
+            formats[schema] = timestamps.detect_format(df["started_at"])
+        #segundos enteros, sin pasar por Timedelta; las filas sin alguna de las fechas no cuentan
+        seconds, valid = timestamps.duration_seconds(df["started_at"], df["ended_at"], formats[schema])
+        keep = valid & (seconds >= 0)
+        return pd.Series(seconds[keep] / 60, index=df.index[keep])
 
     return None
 
-#construir el DataFrame de resultados
-results = []
-for name, df in frames:
-    mean_min = mean_trip_minutes(df)
-    results.append({"dataset": name, "mean_duracion_min": mean_min})
 
-results_df = pd.DataFrame(results).sort_values("dataset")
+#función para calcular duración media en minutos
+def mean_trip_minutes(df: "pd.DataFrame") -> float | None:
+    mins = trip_minutes(df)
+    return None if mins is None else mins.mean()
+
+
+#resultados de un trimestre leyendo el CSV por trozos
+def aggregate_quarter(path: str, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """Returns:
+        dict: mean (la media como la calculaba mean_trip_minutes con el CSV entero,
+        igual bit a bit), partial (recuento, min/max, cuantiles), rows y nulls (nulos
+        por columna, como df.isnull().sum()).
+    """
+    import pandas as pd
+    import aggregates
+
+    header = pd.read_csv(path, nrows=0).columns
+    has_duration = any(set(cols).issubset(header) for cols in DURATION_COLUMNS)
+    partial = aggregates.Partial() if has_duration else None
+    spilled = aggregates.SpilledSum()
+    formats = {}  #un trimestre tiene un solo esquema: el formato de fecha se detecta una vez
+    rows = 0
+    nulls = pd.Series(0, index=header)
+    try:
+        #como texto: un trozo con un "1,234.0" no cambia el tipo de la columna, to_numeric decide igual en todos
+        for chunk in pd.read_csv(path, dtype=str, chunksize=chunk_rows):
+            rows += len(chunk)
+            nulls += chunk.isnull().sum()
+            if has_duration:
+                minutes = trip_minutes(chunk, formats).to_numpy(dtype="float64")
+                partial.add(minutes)
+                spilled.add(minutes)
+        mean = None
+        if has_duration:
+            mean = spilled.total(chunk_rows) / partial.count if partial.count else float("nan")
+    finally:
+        spilled.close()
+    return {"mean": mean, "partial": partial, "rows": rows, "nulls": nulls.to_dict()}
 
-#guardar en Excel y CSV
-excel_path = os.path.join(processed_dir, "mean_trip_time.xlsx")
-csv_path   = os.path.join(processed_dir, "mean_trip_time.csv")
 
-results_df.to_excel(excel_path, index=False)
-results_df.to_csv(csv_path, index=False)
+#resultados de todos los trimestres: los que ya estan en la cache no se vuelven a leer
+def quarter_results(download_dir: str, chunk_rows: int = CHUNK_ROWS, workers: int = WORKERS) -> dict[str, dict]:
+    from concurrent.futures import ProcessPoolExecutor
+    from quarter_cache import QuarterCache
+
+    paths = {
+        Path(csv_name).stem: os.path.join(download_dir, csv_name)
+        for csv_name in sorted(os.listdir(download_dir))
+        if csv_name.lower().endswith(".csv")
+    }
+    cache = QuarterCache()
+    results = {name: cache.get(name, path) for name, path in paths.items()}
+    missing = [name for name, result in results.items() if result is None]
+    if missing:
+        print(f"Procesando {len(missing)} trimestres nuevos o cambiados ({len(paths) - len(missing)} en cache)")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            computed = executor.map(aggregate_quarter, [paths[name] for name in missing], [chunk_rows] * len(missing))
+            for name, result in zip(missing, computed):
+                cache.put(name, paths[name], result)
+                results[name] = result
+    return results
+
+
+#construir el DataFrame de resultados
+def build_results(
+    download_dir: str, chunk_rows: int = CHUNK_ROWS, workers: int = WORKERS
+) -> tuple["pd.DataFrame", "pd.DataFrame"]:
+    import pandas as pd
+
+    results, stats = [], []
+    for name, result in quarter_results(download_dir, chunk_rows, workers).items():
+        results.append({"dataset": name, "mean_duracion_min": result["mean"]})
+        if result["partial"] is not None:
+            stats.append({"dataset": name, "rows": result["rows"], **result["partial"].summary()})
+    return pd.DataFrame(results).sort_values("dataset"), pd.DataFrame(stats).sort_values("dataset")
 
-print("Guardado Excel:", excel_path)
-print("Guardado CSV:", csv_path)
 
 #gráfico
-import matplotlib.pyplot as plt
-
-results_df.plot(x="dataset", y="mean_duracion_min", marker="o", legend=False)
-plt.xticks(rotation=45)
-plt.ylabel("Duración media (min)")
-plt.title("Evolución de la duración media por trimestre")
-plt.tight_layout()
-plt.show()
+def plot_results(results_df: "pd.DataFrame"):
+    import matplotlib.pyplot as plt
+
+    results_df.plot(x="dataset", y="mean_duracion_min", marker="o", legend=False)
+    plt.xticks(rotation=45)
+    plt.ylabel("Duración media (min)")
+    plt.title("Evolución de la duración media por trimestre")
+    plt.tight_layout()
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Duración media de los viajes de cada trimestre.")
+    parser.add_argument(
+        "--formats", nargs="+", choices=["csv", "xlsx"], default=["xlsx", "csv"], help="Ficheros de salida."
+    )
+    parser.add_argument("--no-plot", action="store_true", help="No mostrar el gráfico (no importa matplotlib).")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Filas leidas de cada vez.")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Trimestres procesados a la vez.")
+    args = parser.parse_args()
+
+    os.makedirs(processed_dir, exist_ok=True)
+    results_df, stats_df = build_results(download_dir, args.chunk_rows, args.workers)
+
+    #guardar en Excel y CSV
+    if "xlsx" in args.formats:
+        excel_path = os.path.join(processed_dir, "mean_trip_time.xlsx")
+        results_df.to_excel(excel_path, index=False)
+        print("Guardado Excel:", excel_path)
+    if "csv" in args.formats:
+        csv_path = os.path.join(processed_dir, "mean_trip_time.csv")
+        results_df.to_csv(csv_path, index=False)
+        print("Guardado CSV:", csv_path)
+        #recuento, minimo, maximo y cuantiles aproximados (error < 1%) de cada trimestre
+        stats_path = os.path.join(processed_dir, "trip_stats.csv")
+        stats_df.to_csv(stats_path, index=False)
+        print("Guardado CSV:", stats_path)
+
+    if not args.no_plot:
+        plot_results(results_df)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import os
+import json
+import math
+import argparse
+import tempfile
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import ingest
+import timestamps
+from quarter_cache import QuarterCache, cache_dir
+
+#perfil de calidad de los CSV de Divvy: cada fichero se lee una sola vez por trozos,
+#con un presupuesto de memoria fijo, y se cuentan por columna nulos, valores distintos
+#(HyperLogLog), minimo/maximo y valores invalidos, ademas de duraciones invalidas,
+#viajes negativos, fechas fuera del trimestre y trip_id repetidos. Los trimestres se
+#perfilan en paralelo y el informe se guarda en JSON:
+#
+#    python profiler.py --memory-mb 256
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+download_dir = os.path.join(base_dir, "downloads")
+report_path = os.path.join(base_dir, "processed", "quality_report.json")
+MEMORY_MB = 256  #por trimestre (cada proceso)
+WORKERS = 4
+HLL_PRECISION = 14  #2^14 registros de 1 byte: error tipico ~0.8%
+DUPLICATE_BUCKETS = 64  #los hashes de trip_id se reparten en ficheros; se comprueba uno a uno
+
+#tipo de cada columna canonica (ver ingest.RENAMES), para saber que es un valor invalido
+NUMERIC = {"bike_id", "duration_seconds", "start_station_id", "end_station_id", "birth_year",
+           "start_lat", "start_lng", "end_lat", "end_lng"}
+TIMESTAMPS = {"started_at", "ended_at"}
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    return pd.util.hash_array(values.to_numpy(dtype=object), categorize=False)
+
+
+class HyperLogLog:
+    """Numero aproximado de valores distintos con memoria fija (2^precision bytes).
+    Dos sketches se combinan con el maximo de cada registro."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        #posicion del primer 1 en los 64-p bits restantes (frexp da el exponente del bit mas alto)
+        highest = np.frexp(rest.astype(np.float64))[1]
+        rank = np.where(rest == 0, 64 - self.precision + 1, 64 - self.precision - highest + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  #pocos valores: conteo lineal
+        return round(estimate)
+
+
+class ColumnProfile:
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.nulls = 0
+        self.invalid = 0
+        self.min = None
+        self.max = None
+        self.distinct = HyperLogLog()
+
+    def add(self, values: pd.Series, parsed: pd.Series | np.ndarray | None = None):
+        present = values.notna()
+        self.nulls += int((~present).sum())
+        self.distinct.add_hashes(hash_values(values[present]))
+        if parsed is None:
+            return
+        parsed = pd.Series(np.asarray(parsed), index=values.index)
+        self.invalid += int((present & parsed.isna()).sum())
+        valid = parsed.dropna()
+        if len(valid):
+            low, high = valid.min(), valid.max()
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+
+    def report(self) -> dict:
+        result = {"kind": self.kind, "nulls": self.nulls, "distinct": self.distinct.count()}
+        if self.kind != "text":
+            result["invalid"] = self.invalid
+            result["min"] = None if self.min is None else str(self.min)
+            result["max"] = None if self.max is None else str(self.max)
+        return result
+
+
+class DuplicateCounter:
+    """trip_id repetidos, exacto y con memoria acotada: los hashes de 64 bits se reparten
+    en DUPLICATE_BUCKETS ficheros temporales y al final se cargan de uno en uno."""
+
+    def __init__(self, buckets: int = DUPLICATE_BUCKETS):
+        self.files = [tempfile.TemporaryFile() for _ in range(buckets)]
+
+    def add_hashes(self, hashes: np.ndarray):
+        bucket = (hashes % np.uint64(len(self.files))).astype(np.intp)
+        order = np.argsort(bucket, kind="stable")
+        bounds = np.searchsorted(bucket[order], np.arange(len(self.files) + 1))
+        for number, file in enumerate(self.files):
+            hashes[order[bounds[number]:bounds[number + 1]]].tofile(file)
+
+    def count(self) -> int:
+        duplicates = 0
+        for file in self.files:
+            file.seek(0)
+            hashes = np.fromfile(file, dtype=np.uint64)
+            duplicates += len(hashes) - len(np.unique(hashes))
+            file.close()
+        return duplicates
+
+
+def quarter_bounds(name: str) -> tuple[pd.Timestamp, pd.Timestamp] | None:
+    #Divvy_Trips_2019_Q2 -> [2019-04-01, 2019-07-01)
+    try:
+        year, quarter = name.split("_")[-2:]
+        start = pd.Timestamp(int(year), 3 * (int(quarter[1]) - 1) + 1, 1)
+    except (ValueError, IndexError):
+        return None
+    return start, start + pd.DateOffset(months=3)
+
+
+def chunk_rows_for(path: str, memory_mb: int) -> int:
+    #filas por trozo para no pasar del presupuesto, con lo que ocupa una muestra
+    sample = pd.read_csv(path, dtype=str, nrows=1000)
+    bytes_per_row = max(sample.memory_usage(deep=True).sum() / max(len(sample), 1), 1)
+    #un trozo se tiene en memoria unas cuantas veces (texto, valores convertidos, hashes)
+    return max(1000, int(memory_mb * 1024 * 1024 / (bytes_per_row * 4)))
+
+
+def profile_quarter(path: str, memory_mb: int = MEMORY_MB) -> dict:
+    """Perfila un CSV de una pasada.
+    Returns:
+        dict: filas, columnas y comprobaciones del trimestre.
+    """
+    name = Path(path).stem
+    header = pd.read_csv(path, nrows=0).columns
+    schema = ingest.detect_schema(header)
+    canonical = ingest.RENAMES[schema]
+    columns = {
+        column: ColumnProfile(
+            "numeric" if canonical.get(column) in NUMERIC else
+            "timestamp" if canonical.get(column) in TIMESTAMPS else "text"
+        )
+        for column in header
+    }
+    source = {canonical_name: column for column, canonical_name in canonical.items()}
+    bounds = quarter_bounds(name)
+    checks = {"duration_thousands_separator": 0, "duration_unparseable": 0, "negative_trips": 0,
+              "out_of_quarter_starts": 0}
+    duplicates = DuplicateCounter()
+    date_format = None
+    rows = 0
+
+    for chunk in pd.read_csv(path, dtype=str, chunksize=chunk_rows_for(path, memory_mb)):
+        rows += len(chunk)
+        if date_format is None:
+            date_format = timestamps.detect_format(chunk[source["started_at"]])
+        started = ended = None
+        for column, profile in columns.items():
+            values = chunk[column]
+            if profile.kind == "numeric":
+                profile.add(values, ingest.parse_numbers(values))
+            elif profile.kind == "timestamp":
+                #con el indice del trozo, para compararlo con el resto de columnas
+                parsed = timestamps.parse(values, date_format).to_numpy(zero_copy_only=False)
+                parsed = pd.Series(parsed, index=chunk.index)
+                profile.add(values, parsed)
+                started, ended = (parsed, ended) if canonical[column] == "started_at" else (started, parsed)
+            else:
+                profile.add(values)
+
+        if "duration_seconds" in source:
+            durations = chunk[source["duration_seconds"]]
+            checks["duration_thousands_separator"] += int(durations.str.contains(",", regex=False).sum())
+            checks["duration_unparseable"] += int((durations.notna() & ingest.parse_numbers(durations).isna()).sum())
+            checks["negative_trips"] += int((ingest.parse_numbers(durations) < 0).sum())
+        else:
+            checks["negative_trips"] += int((ended < started).sum())
+        if bounds is not None:
+            outside = started.notna() & ((started < bounds[0]) | (started >= bounds[1]))
+            checks["out_of_quarter_starts"] += int(outside.sum())
+        ids = chunk[source["trip_id"]].dropna()
+        duplicates.add_hashes(hash_values(ids))
+
+    checks["duplicate_trip_ids"] = duplicates.count()
+    return {
+        "file": os.path.basename(path),
+        "schema": schema,
+        "rows": rows,
+        "checks": checks,
+        "columns": {column: profile.report() for column, profile in columns.items()},
+    }
+
+
+def profile_all(download_dir: str = download_dir, memory_mb: int = MEMORY_MB, workers: int = WORKERS) -> dict:
+    """Perfiles de todos los CSV; los que no han cambiado salen de la cache."""
+    paths = {
+        Path(csv_name).stem: os.path.join(download_dir, csv_name)
+        for csv_name in sorted(os.listdir(download_dir))
+        if csv_name.lower().endswith(".csv")
+    }
+    cache = QuarterCache(os.path.join(cache_dir, "quality"), code_files=["profiler.py", "ingest.py", "timestamps.py"])
+    profiles = {name: cache.get(name, path) for name, path in paths.items()}
+    missing = [name for name, profile in profiles.items() if profile is None]
+    if missing:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            computed = executor.map(profile_quarter, [paths[name] for name in missing], [memory_mb] * len(missing))
+            for name, profile in zip(missing, computed):
+                cache.put(name, paths[name], profile)
+                profiles[name] = profile
+    return profiles
+
+
+def write_report(profiles: dict, path: str = report_path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(profiles, file, indent=2, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def print_summary(profiles: dict):
+    for name, profile in profiles.items():
+        problems = {check: count for check, count in profile["checks"].items() if count}
+        nulls = {column: stats["nulls"] for column, stats in profile["columns"].items() if stats["nulls"]}
+        print(f"{name}: {profile['rows']} filas")
+        for check, count in problems.items():
+            print(f"  {check}: {count}")
+        for column, count in nulls.items():
+            print(f"  nulos en {column}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de calidad de los CSV de Divvy.")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_MB, help="Memoria maxima por trimestre.")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Trimestres perfilados a la vez.")
+    parser.add_argument("--output", default=report_path, help="Informe JSON.")
+    args = parser.parse_args()
+
+    profiles = profile_all(download_dir, args.memory_mb, args.workers)
+    write_report(profiles, args.output)
+    print_summary(profiles)
+    print("Guardado informe:", args.output)
+
+
+if __name__ == "__main__":
+    main()
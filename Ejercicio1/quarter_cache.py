@@ -0,0 +1,79 @@
+import os
+import json
+import pickle
+import hashlib
+from functools import cache
+
+#resultados de cada trimestre (media, agregados, nulos y filas) guardados en
+#processed/cache: un trimestre solo se vuelve a procesar si cambia su CSV (sha256)
+#o el codigo que calcula los resultados. Añadir un trimestre cuesta lo que ese trimestre.
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+cache_dir = os.path.join(base_dir, "processed", "cache")
+#si cambia alguno de estos ficheros, todo lo guardado deja de valer
+CODE_FILES = ["processor.py", "aggregates.py", "timestamps.py"]
+CHECKSUMS_NAME = "_checksums.json"  #tamaño y fecha -> sha256, para no releer los CSV que no cambian
+CHUNK_SIZE = 1024 * 1024
+
+
+@cache
+def code_version(code_files: tuple[str, ...] = tuple(CODE_FILES)) -> str:
+    digest = hashlib.sha256()
+    for name in code_files:
+        with open(os.path.join(base_dir, name), "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:12]
+
+
+class QuarterCache:
+    """Resultados por trimestre, con la clave <sha256 del CSV>-<version del codigo>.
+    Args:
+        directory (str): Carpeta de las entradas.
+        code_files (list[str]): Ficheros del codigo que calcula los resultados.
+    """
+
+    def __init__(self, directory: str = cache_dir, code_files: list[str] = CODE_FILES):
+        self.directory = directory
+        self.code_files = tuple(code_files)
+        os.makedirs(directory, exist_ok=True)
+        self.checksums_path = os.path.join(directory, CHECKSUMS_NAME)
+        self.checksums = {}
+        if os.path.exists(self.checksums_path):
+            with open(self.checksums_path, encoding="utf-8") as file:
+                self.checksums = json.load(file)
+
+    def checksum(self, path: str) -> str:
+        status = os.stat(path)
+        known = self.checksums.get(os.path.abspath(path))
+        if known and known["size"] == status.st_size and known["mtime"] == status.st_mtime:
+            return known["sha256"]
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        self.checksums[os.path.abspath(path)] = {
+            "size": status.st_size, "mtime": status.st_mtime, "sha256": digest.hexdigest()
+        }
+        with open(self.checksums_path, "w", encoding="utf-8") as file:
+            json.dump(self.checksums, file, indent=2)
+        return digest.hexdigest()
+
+    def _entry_path(self, name: str, path: str) -> str:
+        return os.path.join(self.directory, f"{name}-{self.checksum(path)[:16]}-{code_version(self.code_files)}.pickle")
+
+    def get(self, name: str, path: str) -> dict | None:
+        entry = self._entry_path(name, path)
+        if not os.path.exists(entry):
+            return None
+        with open(entry, "rb") as file:
+            return pickle.load(file)
+
+    def put(self, name: str, path: str, result: dict):
+        entry = self._entry_path(name, path)
+        with open(entry + ".tmp", "wb") as file:
+            pickle.dump(result, file)
+        os.replace(entry + ".tmp", entry)
+        #las entradas viejas del mismo trimestre ya no se van a usar
+        for old in os.listdir(self.directory):
+            if old.startswith(f"{name}-") and old.endswith(".pickle") and os.path.join(self.directory, old) != entry:
+                os.remove(os.path.join(self.directory, old))
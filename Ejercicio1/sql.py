@@ -0,0 +1,116 @@
+import os
+import sys
+import glob
+import time
+import argparse
+from pathlib import Path
+
+import ingest
+from processor import DURATION_COLUMNS
+
+#consultas SQL sobre los datos descargados con duckdb (embebido, sin servidor). Las
+#vistas leen los ficheros en cada consulta, solo las columnas y los trimestres que
+#hacen falta (proyeccion y filtros se empujan al escaneo del Parquet/CSV):
+#
+#    python sql.py "SELECT quarter, user_type, count(*) FROM trips GROUP BY ALL ORDER BY ALL"
+#    python sql.py "SELECT * FROM mean_trip_minutes"
+#    python sql.py --explain "SELECT avg(duration_seconds) FROM trips WHERE quarter = '2019_Q3'"
+#
+#vistas:
+# - trips: el almacen Parquet de ingest.py (esquema canonico, columna quarter)
+# - raw_<trimestre>: cada CSV tal cual, todo como texto
+# - mean_trip_minutes: la media de processor.mean_trip_minutes por trimestre, con la
+#   misma semantica: lo que no se puede convertir (p.ej. "1,234.0") no cuenta (TRY_CAST,
+#   como pd.to_numeric(errors="coerce")) y en 2020 se descartan las duraciones negativas
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+download_dir = os.path.join(base_dir, "downloads")
+
+
+def _quote(path: str) -> str:
+    return "'" + path.replace("'", "''") + "'"
+
+
+def _legacy_minutes(dataset: str, columns: list[str]) -> str | None:
+    #el SELECT de mean_trip_minutes para un CSV, segun sus columnas
+    view = f'"raw_{dataset}"'
+    if ["started_at", "ended_at"] == next((cols for cols in DURATION_COLUMNS if set(cols).issubset(columns)), None):
+        minutes = "date_diff('second', TRY_CAST(started_at AS TIMESTAMP), TRY_CAST(ended_at AS TIMESTAMP)) / 60"
+        return f"SELECT {_quote(dataset)} AS dataset, avg(minutes) AS mean_duracion_min FROM " \
+               f"(SELECT {minutes} AS minutes FROM {view}) WHERE minutes >= 0"
+    for cols in DURATION_COLUMNS[:2]:
+        if set(cols).issubset(columns):
+            return f'SELECT {_quote(dataset)} AS dataset, avg(TRY_CAST("{cols[0]}" AS DOUBLE) / 60) ' \
+                   f"AS mean_duracion_min FROM {view}"
+    return None
+
+
+def connect(download_dir: str = download_dir, store_dir: str = ingest.store_dir):
+    """Conexion duckdb en memoria con las vistas sobre los ficheros.
+    Returns:
+        duckdb.DuckDBPyConnection: La conexion.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        sys.exit("Las consultas SQL necesitan duckdb: pip install duckdb")
+
+    connection = duckdb.connect()
+    if glob.glob(os.path.join(store_dir, "quarter=*", "*.parquet")):
+        pattern = os.path.join(store_dir, "quarter=*", "*.parquet")
+        connection.execute(
+            f"CREATE VIEW trips AS SELECT * FROM read_parquet({_quote(pattern)}, hive_partitioning = true)"
+        )
+
+    legacy = []
+    for csv_path in sorted(glob.glob(os.path.join(download_dir, "*.csv"))):
+        dataset = Path(csv_path).stem
+        connection.execute(
+            f'CREATE VIEW "raw_{dataset}" AS SELECT * FROM read_csv({_quote(csv_path)}, all_varchar = true, header = true)'
+        )
+        columns = [row[0] for row in connection.execute(f'DESCRIBE "raw_{dataset}"').fetchall()]
+        select = _legacy_minutes(dataset, columns)
+        if select is not None:
+            legacy.append(select)
+    if legacy:
+        connection.execute(f"CREATE VIEW mean_trip_minutes AS {' UNION ALL '.join(legacy)}")
+    return connection
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas SQL sobre los viajes de Divvy descargados.")
+    parser.add_argument("query", nargs="?", help="Consulta SQL (o --file).")
+    parser.add_argument("--file", help="Fichero con la consulta.")
+    parser.add_argument("--explain", action="store_true", help="Mostrar el plan (filtros y columnas empujados al escaneo).")
+    parser.add_argument("--output", help="Guardar el resultado en CSV en vez de mostrarlo.")
+    parser.add_argument("--views", action="store_true", help="Listar las vistas disponibles.")
+    args = parser.parse_args()
+
+    connection = connect()
+    if args.views:
+        for (name,) in connection.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY 1").fetchall():
+            print(name)
+        return
+    if args.file:
+        with open(args.file, encoding="utf-8") as file:
+            args.query = file.read()
+    if not args.query:
+        parser.error("falta la consulta")
+
+    if args.explain:
+        for _, plan in connection.execute(f"EXPLAIN {args.query}").fetchall():
+            print(plan)
+        return
+    start = time.perf_counter()
+    result = connection.execute(args.query).df()
+    elapsed = time.perf_counter() - start
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print("Guardado CSV:", args.output)
+    else:
+        print(result.to_string(index=False))
+    print(f"{len(result)} filas en {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
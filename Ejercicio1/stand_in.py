@@ -0,0 +1,92 @@
+import sys
+import time
+import hashlib
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import synthetic
+
+#servidor HTTP local que hace de S3 de Divvy con zips sinteticos, para probar y
+#medir el descargador sin red:
+#
+#    python stand_in.py --rows 200000 --workers 4
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self._send(body=False)
+
+    def do_GET(self):
+        self._send(body=True)
+
+    def _send(self, body: bool):
+        data = self.server.files.get(self.path.lstrip("/"))
+        if data is None:
+            self.send_error(404)  #como S3 con un trimestre que no existe
+            return
+        self.send_response(200)
+        #como en S3: el ETag de un fichero subido de una vez es su md5
+        self.send_header("ETag", f'"{hashlib.md5(data).hexdigest()}"')
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if not body:
+            return
+        chunk = 64 * 1024
+        for offset in range(0, len(data), chunk):
+            self.wfile.write(data[offset : offset + chunk])
+            if self.server.rate:
+                time.sleep(chunk / self.server.rate)  #limite de velocidad por conexion
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalDivvy:
+    """Sirve los zips mientras el contexto esta abierto.
+    Args:
+        files (dict): nombre del zip -> contenido.
+        rate (float): Bytes por segundo de cada conexion (0 = sin limite).
+    """
+
+    def __init__(self, files: dict[str, bytes], rate: float = 0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.files = files
+        self.server.rate = rate
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    import argparse
+    import downloader
+
+    parser = argparse.ArgumentParser(description="Mide el descargador con un S3 local de zips sinteticos.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Viajes de cada trimestre.")
+    parser.add_argument("--workers", type=int, default=downloader.WORKERS, help="Descargas simultaneas.")
+    parser.add_argument("--rate", type=float, default=20e6, help="Bytes/s de cada conexion (0 = sin limite).")
+    args = parser.parse_args()
+
+    files = {f"{name}.zip": synthetic.quarter_zip(name, args.rows) for name in synthetic.QUARTERS}
+    with LocalDivvy(files, rate=args.rate) as server, tempfile.TemporaryDirectory() as directory:
+        urls = [f"{server.url}/{name}" for name in files] + [f"{server.url}/Divvy_Trips_2220_Q1.zip"]
+        print("Primera descarga:")
+        downloader.download_all(urls, directory, workers=args.workers)
+        print("Segunda ejecucion (todo deberia saltarse):")
+        results = downloader.download_all(urls, directory, workers=args.workers)
+        if not all(result["skipped"] for result in results):
+            sys.exit("Se ha vuelto a descargar algun zip")
+
+
+if __name__ == "__main__":
+    main()
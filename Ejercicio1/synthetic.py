@@ -0,0 +1,106 @@
+import io
+import csv
+import random
+import zipfile
+import datetime
+
+#trimestres de Divvy sinteticos, con los tres esquemas de los ficheros reales, para
+#probar y medir la descarga y el procesado sin bajar cientos de MB de S3
+
+#esquema de cada trimestre real
+QUARTERS = {
+    "Divvy_Trips_2018_Q4": "tripduration",
+    "Divvy_Trips_2019_Q1": "tripduration",
+    "Divvy_Trips_2019_Q2": "rental_details",
+    "Divvy_Trips_2019_Q3": "tripduration",
+    "Divvy_Trips_2019_Q4": "tripduration",
+    "Divvy_Trips_2020_Q1": "started_at",
+}
+
+COLUMNS = {
+    "tripduration": [
+        "trip_id", "start_time", "end_time", "bikeid", "tripduration", "from_station_id",
+        "from_station_name", "to_station_id", "to_station_name", "usertype", "gender", "birthyear",
+    ],
+    "rental_details": [
+        "01 - Rental Details Rental ID", "01 - Rental Details Local Start Time",
+        "01 - Rental Details Local End Time", "01 - Rental Details Bike ID",
+        "01 - Rental Details Duration In Seconds Uncapped", "03 - Rental Start Station ID",
+        "03 - Rental Start Station Name", "02 - Rental End Station ID", "02 - Rental End Station Name",
+        "User Type", "Member Gender", "05 - Member Details Member Birthday Year",
+    ],
+    "started_at": [
+        "ride_id", "rideable_type", "started_at", "ended_at", "start_station_name", "start_station_id",
+        "end_station_name", "end_station_id", "start_lat", "start_lng", "end_lat", "end_lng", "member_casual",
+    ],
+}
+
+STATIONS = [(number, f"Station {number} & Main St") for number in range(1, 613)]
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def quarter_start(name: str) -> datetime.datetime:
+    #Divvy_Trips_2019_Q2 -> 2019-04-01
+    year, quarter = name.split("_")[-2:]
+    return datetime.datetime(int(year), 3 * (int(quarter[1]) - 1) + 1, 1)
+
+
+def format_duration(seconds: float) -> str:
+    #como en los ficheros reales: "390.0", "1,234.0" (con separador de miles)
+    return f"{seconds:,.1f}"
+
+
+def write_quarter(file, name: str, rows: int, seed: int = 0):
+    """Escribe un trimestre sintetico en formato CSV.
+    Args:
+        file: Fichero de texto abierto para escribir.
+        name (str): Nombre del trimestre, define el esquema (ver QUARTERS).
+        rows (int): Numero de viajes.
+        seed (int): Semilla, el mismo trimestre sale siempre igual.
+    """
+    schema = QUARTERS.get(name, "tripduration")
+    rng = random.Random(f"{name}-{seed}")
+    start = quarter_start(name)
+    writer = csv.writer(file, lineterminator="\n")
+    writer.writerow(COLUMNS[schema])
+
+    for number in range(rows):
+        began = start + datetime.timedelta(seconds=rng.randrange(90 * 24 * 3600))
+        seconds = round(rng.lognormvariate(6.4, 0.8))
+        ended = began + datetime.timedelta(seconds=seconds)
+        origin, destination = rng.choice(STATIONS), rng.choice(STATIONS)
+        member = rng.random() < 0.8
+
+        if schema == "started_at":
+            if rng.random() < 0.001:
+                ended = began - datetime.timedelta(seconds=rng.randrange(1, 600))  #duraciones negativas, como en 2020
+            writer.writerow([
+                f"{rng.getrandbits(64):016X}", "docked_bike", began.strftime(TIME_FORMAT),
+                ended.strftime(TIME_FORMAT), origin[1], origin[0], destination[1], destination[0],
+                f"{41.8 + rng.random() / 5:.4f}", f"{-87.7 + rng.random() / 5:.4f}",
+                f"{41.8 + rng.random() / 5:.4f}", f"{-87.7 + rng.random() / 5:.4f}",
+                "member" if member else "casual",
+            ])
+        else:
+            gender = rng.choice(["Male", "Male", "Female", ""]) if member else ""
+            birthyear = str(rng.randrange(1940, 2004)) if member and rng.random() < 0.95 else ""
+            writer.writerow([
+                20000000 + number, began.strftime(TIME_FORMAT), ended.strftime(TIME_FORMAT),
+                rng.randrange(1, 6500), format_duration(seconds), origin[0], origin[1],
+                destination[0], destination[1], "Subscriber" if member else "Customer", gender, birthyear,
+            ])
+
+
+def quarter_csv(name: str, rows: int, seed: int = 0) -> bytes:
+    text = io.StringIO()
+    write_quarter(text, name, rows, seed)
+    return text.getvalue().encode("utf-8")
+
+
+def quarter_zip(name: str, rows: int, seed: int = 0) -> bytes:
+    """Zip de un trimestre, con el CSV y la carpeta __MACOSX que traen los originales."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(f"{name}.csv", quarter_csv(name, rows, seed))
+        archive.writestr(f"__MACOSX/._{name}.csv", b"\x00\x05\x16\x07")
+    return buffer.getvalue()
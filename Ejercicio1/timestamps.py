@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+#fechas de inicio/fin de los viajes: el formato se detecta una vez por trimestre con
+#una muestra y despues cada columna se convierte entera con pyarrow (sin objetos
+#datetime/Timedelta de Python ni adivinar el formato fila a fila). Las duraciones
+#salen en segundos como int64.
+
+#formatos de fecha conocidos; se prueban en este orden
+FORMATS = ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M"]
+SAMPLE_ROWS = 100
+
+
+def _strings(values) -> pa.Array | pa.ChunkedArray:
+    #las columnas de texto de pandas 3 ya son de pyarrow: esto no copia
+    return pa.array(values, type=pa.large_string(), from_pandas=True)
+
+
+def detect_format(values) -> str | None:
+    """El primer formato de FORMATS que sirve para toda la muestra, o None si ninguno."""
+    sample = pc.drop_null(_strings(values)[:SAMPLE_ROWS * 10])[:SAMPLE_ROWS]
+    for date_format in FORMATS:
+        parsed = pc.strptime(sample, format=date_format, unit="s", error_is_null=True)
+        if parsed.null_count == 0:
+            return date_format
+    return None
+
+
+def parse(values, date_format: str | None) -> pa.Array | pa.ChunkedArray:
+    """Convierte una columna a timestamp[s]; lo que no encaja con el formato queda nulo."""
+    if date_format is None:
+        #formato desconocido: pandas lo adivina (mas lento)
+        return pa.array(pd.to_datetime(values, format="mixed", errors="coerce"), from_pandas=True).cast(pa.timestamp("s"))
+    return pc.strptime(_strings(values), format=date_format, unit="s", error_is_null=True)
+
+
+def duration_seconds(start, end, date_format: str | None) -> tuple[np.ndarray, np.ndarray]:
+    """Duracion de cada viaje.
+    Returns:
+        tuple: Los segundos (int64, 0 si falta alguna fecha) y que filas tienen las dos fechas.
+    """
+    seconds = pc.subtract(parse(end, date_format).cast(pa.int64()), parse(start, date_format).cast(pa.int64()))
+    if isinstance(seconds, pa.ChunkedArray):
+        seconds = seconds.combine_chunks()
+    valid = seconds.is_valid().to_numpy(zero_copy_only=False)
+    return pc.fill_null(seconds, 0).to_numpy(), valid
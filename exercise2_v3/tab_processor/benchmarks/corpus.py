@@ -0,0 +1,151 @@
+""" Deterministic synthetic corpus for the benchmarks.
+Generates raw tabs and lacuerda-like HTML pages (artist index, artist page and
+song page with a `<pre>`). The same seed always produces the same corpus, so
+results of different commits can be compared. """
+
+import random
+from dataclasses import dataclass, field
+
+# --- Vocabulary ---
+CHORDS = ["DO", "RE", "MI", "FA", "SOL", "LA", "SI", "LAm", "MIm", "REm", "SIm", "FA#m", "SOL7", "Am", "G", "C", "D/F#"]
+WORDS = (
+    "la noche cae sobre el mar y yo te espero sin saber si volveras "
+    "cuando llueve en la ciudad el corazon se queda solo cantando "
+    "quiero ver tu sonrisa otra vez bajo la luna de enero amor"
+).split()
+NOISE = [
+    "Nota: esta cancion la saque de oido, cualquier correccion bienvenida",
+    "www.lacuerda.net",
+    "saludos a todos los que visitan la pagina",
+    "Si teneis dudas escribid a juan.perez@correo.com.",
+    "INTRO:",
+    "CEJILLA 2",
+    "*** Letra y acordes ***",
+    "espero les guste",
+]
+NAMES = "abel amaral bunbury carlos duncan estopa fito hombres izal jarabe kase los mecano nena ojos pereza quique rosendo sabina tequila".split()
+
+
+@dataclass
+class TabMix:
+    """Proportion of each kind of line in a generated tab.
+
+    Attributes:
+        lines (int): Number of lines of the tab.
+        chord_ratio (float): Share of chord lines.
+        noise_ratio (float): Share of lines the cleaner should remove (notes, urls, emails...).
+    """
+
+    lines: int = 40
+    chord_ratio: float = 0.4
+    noise_ratio: float = 0.1
+
+
+@dataclass
+class Site:
+    """A generated site: pages by path plus the expected catalog."""
+
+    pages: dict[str, str] = field(default_factory=dict)
+    artists: dict[str, list[str]] = field(default_factory=dict)  # artist slug -> song slugs
+    tabs: dict[str, str] = field(default_factory=dict)  # song page path -> raw tab
+
+
+def generate_chord_line(rng: random.Random) -> str:
+    """Generates a chord line with chords spread over the columns."""
+    line = ""
+    for _ in range(rng.randint(1, 5)):
+        line += " " * rng.randint(1 if line else 0, 12) + rng.choice(CHORDS)
+    return line
+
+
+def generate_lyric_line(rng: random.Random) -> str:
+    """Generates a lyric line."""
+    words = rng.choices(WORDS, k=rng.randint(4, 10))
+    return " ".join(words).capitalize()
+
+
+def generate_tab(rng: random.Random, mix: TabMix = TabMix()) -> str:
+    """Generates a raw tab text with the given mix of lines."""
+    lines = []
+    for _ in range(mix.lines):
+        kind = rng.random()
+        if kind < mix.noise_ratio:
+            lines.append(rng.choice(NOISE))
+        elif kind < mix.noise_ratio + mix.chord_ratio:
+            lines.append(generate_chord_line(rng))
+        else:
+            lines.append(generate_lyric_line(rng))
+    return "\n".join(lines) + "\n"
+
+
+def generate_tabs(count: int, seed: int = 0, mix: TabMix = TabMix()) -> list[str]:
+    """Generates a list of raw tabs."""
+    rng = random.Random(seed)
+    return [generate_tab(rng, mix) for _ in range(count)]
+
+
+def _page(title: str, body: str) -> str:
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{title}</title></head><body>"
+        "<div id='menu'><a href='/'>Inicio</a> <a href='/tabs/'>Artistas</a></div>"
+        f"{body}"
+        "<div id='footer'><p>lacuerda.net &copy; synthetic</p></div>"
+        "</body></html>"
+    )
+
+
+def artist_index_page(artists: list[str]) -> str:
+    """Letter index: a <ul> with one <li><a> per artist."""
+    items = "".join(f"<li><a href='/{slug}'>{slug.replace('_', ' ')}</a></li>" for slug in artists)
+    return _page("Artistas", f"<h1>Artistas</h1><ul>{items}</ul>")
+
+
+def artist_page(artist: str, songs: list[str]) -> str:
+    """Artist page: relative song links inside <li>, plus some absolute links that must be ignored."""
+    items = "".join(f"<li id='r{i}'><a href='{song}'>{song.replace('_', ' ')}</a></li>" for i, song in enumerate(songs))
+    extra = "<ul><li><a href='https://www.example.com/ads'>Publicidad</a></li></ul>"
+    return _page(artist, f"<h1>{artist}</h1><ul>{items}</ul>{extra}")
+
+
+def song_page(artist: str, song: str, tab: str) -> str:
+    """Song page: the tab is inside a <pre>, with some inline markup like the real site."""
+    escaped = tab.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    marked = escaped.replace("LAm", "<b>LAm</b>")
+    return _page(f"{song} - {artist}", f"<h1>{song}</h1><div id='t_body'><pre>{marked}</pre></div>")
+
+
+def generate_site(
+    seed: int = 0,
+    letters: str = "abc",
+    artists_per_letter: int = 5,
+    songs_per_artist: int = 10,
+    mix: TabMix = TabMix(),
+) -> Site:
+    """Generates a complete lacuerda-like site.
+    Args:
+        seed (int): Seed of the generator.
+        letters (str): Letters of the artist index.
+        artists_per_letter (int): Artists under each letter.
+        songs_per_artist (int): Songs of every artist.
+        mix (TabMix): Mix of lines of every tab.
+    Returns:
+        Site: The pages by path and the expected catalog.
+    """
+    rng = random.Random(seed)
+    site = Site()
+    for letter in letters:
+        artists = []
+        for number in range(artists_per_letter):
+            slug = f"{letter}{rng.choice(NAMES)}_{number}"
+            artists.append(slug)
+            songs = [f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{i}" for i in range(songs_per_artist)]
+            site.artists[slug] = songs
+            site.pages[f"/{slug}"] = artist_page(slug, songs)
+            for song in songs:
+                tab = generate_tab(rng, mix)
+                path = f"/{slug}/{song}.shtml"
+                site.tabs[path] = tab
+                site.pages[path] = song_page(slug, song, tab)
+        site.pages[f"/tabs/{letter}"] = artist_index_page(artists)
+    return site
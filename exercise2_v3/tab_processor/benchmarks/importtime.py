@@ -0,0 +1,79 @@
+""" Import time of every subcommand of cli.py, measured with `python -X importtime`.
+Short incremental runs should not be dominated by interpreter and import
+startup, so every subcommand has an import budget; the modules the interpreter
+imports by itself (`python -c pass`) are not counted. Exits with an error if a
+subcommand goes over its budget:
+
+    python benchmarks/importtime.py --budget-ms 150
+"""
+
+import re
+import sys
+import click
+import subprocess
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from common.stages import TAB_PROCESSOR_DIRECTORY
+from cli import COMMANDS
+
+# --- Configuration ---
+BUDGET_MS = 150
+# Subcommands that can not run without a heavy dependency
+COMMAND_BUDGETS_MS = {"export": 400}  # pyarrow
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(output: str) -> dict[str, int]:
+    """Cumulative microseconds of every top-level import in a -X importtime report."""
+    imports = {}
+    for line in output.splitlines():
+        match = LINE.match(line)
+        if match and len(match.group(3)) == 1:  # Nested imports are indented further
+            imports[match.group(4)] = int(match.group(2))
+    return imports
+
+
+def import_times(*args: str) -> dict[str, int]:
+    """Top-level imports (microseconds) of a Python run with the given arguments."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=TAB_PROCESSOR_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def command_import_times() -> dict[str, dict[str, int]]:
+    """Imports of `cli.py <command> --help` for every subcommand, without the interpreter's own."""
+    baseline = import_times("-c", "pass")
+    times = {}
+    for command in COMMANDS:
+        imports = import_times("cli.py", command, "--help")
+        times[command] = {module: us for module, us in imports.items() if module not in baseline}
+    return times
+
+
+@click.command()
+@click.option("--budget-ms", default=BUDGET_MS, help="Maximum import time of a subcommand (see COMMAND_BUDGETS_MS).")
+@click.option("--top", default=3, help="Slowest imports shown per subcommand.")
+def main(budget_ms, top):
+    over_budget = []
+    for command, imports in command_import_times().items():
+        total_ms = sum(imports.values()) / 1000
+        slowest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:top]
+        details = ", ".join(f"{module} {us / 1000:.1f}" for module, us in slowest)
+        print(f"{command:<10} {total_ms:7.1f} ms  ({details})")
+        if total_ms > COMMAND_BUDGETS_MS.get(command, budget_ms):
+            over_budget.append(command)
+
+    if over_budget:
+        print(f"Over the import budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
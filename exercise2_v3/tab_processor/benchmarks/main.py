@@ -0,0 +1,528 @@
+import io
+import os
+import sys
+import json
+import time
+import click
+import shutil
+import platform
+import datetime
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+from dataclasses import dataclass, asdict, field
+from contextlib import redirect_stdout, redirect_stderr, contextmanager
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from common.stages import TAB_PROCESSOR_DIRECTORY, load_module
+from benchmarks.corpus import TabMix, generate_site, generate_tabs
+from benchmarks.server import LocalSite
+
+# -- Configuration ---
+RESULTS_DIRECTORY = Path(__file__).resolve().parent / "results"
+BENCHMARKS = {}
+
+
+@dataclass
+class Context:
+    """Everything a benchmark may need: the synthetic corpus and a local site."""
+
+    workdir: Path
+    site: LocalSite
+    tabs: list[str]
+    letters: str
+    pages: list[str]  # Song pages for the parser benchmarks
+    cleanup: list = field(default_factory=list)  # Extra servers to stop at the end
+    workers: int = 3  # Worker processes of the sharded crawl
+
+
+@dataclass
+class Case:
+    """A prepared benchmark. `setup` runs before every round and is not timed."""
+
+    run: callable
+    items: int
+    setup: callable = None
+
+
+def benchmark(name: str):
+    """Registers a benchmark under the given name."""
+
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+@contextmanager
+def working_directory(path: Path):
+    """Runs the block inside the given directory (the stages write relative to it)."""
+    previous = os.getcwd()
+    path.mkdir(parents=True, exist_ok=True)
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def write_catalog(site: LocalSite, output_directory: Path):
+    """Writes the catalog of the local site where get_songs expects it."""
+    catalog = []
+    song_id = 0
+    for artist, songs in site.site.artists.items():
+        catalog.append(
+            {
+                "name": artist,
+                "url": f"{site.url}/{artist}",
+                "songs": [
+                    {
+                        "id": (song_id := song_id + 1),
+                        "song_title": song,
+                        "song_url": f"{site.url}/{artist}/{song}.shtml",
+                        "lyrics_path": f"./files/songs/{artist}/{song}.txt",
+                    }
+                    for song in songs
+                ],
+            }
+        )
+    path = output_directory / "files" / "catalogs" / "catalog.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(catalog), encoding="utf-8")
+    return sum(len(artist["songs"]) for artist in catalog)
+
+
+def reset_controller(songs=None):
+    """Starts every round with a fresh adaptive controller (concurrency 1)."""
+    songs = songs or load_module("scrapper", "utils.songs")
+    bs = songs.bs  # The instance used by get_songs
+    bs.CONTROLLER = bs.crawler.AdaptiveController(max_concurrency=bs.CONTROLLER.max_concurrency)
+
+
+# --- Benchmarks ---
+@benchmark("get_catalog")
+def bench_get_catalog(ctx: Context) -> Case:
+    songs = load_module("scrapper", "utils.songs")
+    songs.ROOT = ctx.site.url
+    songs.URL_ARTIST_INDEX = f"{ctx.site.url}/tabs/"
+    songs.Artist.fetch_metadata = lambda self: None  # MusicBrainz is not part of the benchmark
+    total = sum(len(s) for s in ctx.site.site.artists.values())
+    return Case(run=lambda: songs.get_catalog("./files/", ctx.letters[0], ctx.letters[-1]), items=total)
+
+
+@benchmark("refresh_catalog")
+def bench_refresh_catalog(ctx: Context) -> Case:
+    """Incremental refresh of a known catalog where a single artist added a song."""
+    catalogs = load_module("scrapper", "utils.catalog")
+    songs = catalogs.songs  # Its own copy of the scrapper modules
+    songs.ROOT = ctx.site.url
+    songs.URL_ARTIST_INDEX = f"{ctx.site.url}/tabs/"
+    songs.Artist.fetch_metadata = lambda self: None  # MusicBrainz is not part of the benchmark
+    directory = ctx.workdir / "refresh_catalog"
+    pages = ctx.site.site.pages
+    artist = next(iter(ctx.site.site.artists))
+    original = pages[f"/{artist}"]
+    changed = original.replace("</ul>", "<li><a href='new_song'>new song</a></li></ul>", 1)
+
+    def setup():
+        pages[f"/{artist}"] = original
+        shutil.rmtree(directory, ignore_errors=True)
+        with working_directory(directory), redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            catalogs.refresh_catalog("./files/", ctx.letters[0], ctx.letters[-1])  # First run: full catalog
+        pages[f"/{artist}"] = changed
+        reset_controller(songs)
+
+    def run():
+        try:
+            with working_directory(directory), redirect_stdout(io.StringIO()):
+                delta = catalogs.refresh_catalog("./files/", ctx.letters[0], ctx.letters[-1])
+        finally:
+            pages[f"/{artist}"] = original
+        if len(delta["added_songs"]) != 1:
+            raise RuntimeError(f"Refresh found {len(delta['added_songs'])} new songs instead of 1")
+
+    return Case(run=run, items=len(ctx.site.site.artists), setup=setup)
+
+
+@benchmark("get_songs")
+def bench_get_songs(ctx: Context) -> Case:
+    songs = load_module("scrapper", "utils.songs")
+    directory = ctx.workdir / "get_songs"
+
+    def setup():
+        shutil.rmtree(directory, ignore_errors=True)
+        write_catalog(ctx.site, directory)
+        reset_controller()
+
+    def run():
+        with working_directory(directory):
+            songs.get_songs("./files/")
+
+    total = sum(len(s) for s in ctx.site.site.artists.values())
+    return Case(run=run, items=total, setup=setup)
+
+
+@benchmark("get_songs_throttled")
+def bench_get_songs_throttled(ctx: Context) -> Case:
+    """get_songs against a site that is slow, fails 5% of the time and throttles above 4 requests."""
+    songs = load_module("scrapper", "utils.songs")
+    directory = ctx.workdir / "get_songs_throttled"
+    server = LocalSite(ctx.site.site, latency=0.02, fail_rate=0.05, max_concurrent=4, retry_after=1)
+    server.__enter__()
+    ctx.cleanup.append(server)
+
+    def setup():
+        shutil.rmtree(directory, ignore_errors=True)
+        write_catalog(server, directory)
+        reset_controller()
+
+    def run():
+        with working_directory(directory):
+            songs.get_songs("./files/")
+
+    total = sum(len(s) for s in ctx.site.site.artists.values())
+    return Case(run=run, items=total, setup=setup)
+
+
+@benchmark("sharded_get_songs")
+def bench_sharded_get_songs(ctx: Context) -> Case:
+    """Several scrapper processes sharing the catalog through the work queue, then merged."""
+    directory = ctx.workdir / "sharded"
+    scrapper = str(TAB_PROCESSOR_DIRECTORY / "scrapper" / "main.py")
+    total = sum(len(s) for s in ctx.site.site.artists.values())
+
+    def setup():
+        shutil.rmtree(directory, ignore_errors=True)
+        write_catalog(ctx.site, directory)
+
+    def run():
+        workers = [
+            subprocess.Popen(
+                [sys.executable, scrapper, "--shard-mode", "hash", "--shards", "8", "--worker-id", f"worker{number}"],
+                cwd=directory,
+                stdout=subprocess.DEVNULL,
+            )
+            for number in range(ctx.workers)
+        ]
+        if any(worker.wait() for worker in workers):
+            raise RuntimeError("A worker of the sharded crawl failed")
+        subprocess.run([sys.executable, scrapper, "--merge"], cwd=directory, check=True, stdout=subprocess.DEVNULL)
+
+        merged = json.loads((directory / "files" / "catalogs" / "downloads.json").read_text(encoding="utf-8"))
+        urls = [song["song_url"] for song in merged]
+        if len(urls) != total or len(set(urls)) != total:
+            raise RuntimeError(f"Sharded crawl merged {len(set(urls))} of {total} songs")
+
+    return Case(run=run, items=total, setup=setup)
+
+
+@benchmark("replay_get_songs")
+def bench_replay_get_songs(ctx: Context) -> Case:
+    """get_songs re-parsing every song from the raw response archive, without the network."""
+    songs = load_module("scrapper", "utils.songs")
+    directory = ctx.workdir / "replay_get_songs"
+    site = ctx.site.site
+
+    def setup():
+        shutil.rmtree(directory, ignore_errors=True)
+        write_catalog(ctx.site, directory)
+        archive = songs.bs.archive.Archive(directory / "archive")
+        for path, page in site.pages.items():
+            archive.put(f"{ctx.site.url}{path}", page.encode("utf-8"), encoding="utf-8")
+
+    def run():
+        songs.bs.ARCHIVE = songs.bs.archive.Archive(directory / "archive")
+        songs.bs.REPLAY = True
+        try:
+            with working_directory(directory), redirect_stdout(io.StringIO()):
+                songs.get_songs("./files/", overwrite=True)
+        finally:
+            songs.bs.ARCHIVE, songs.bs.REPLAY = None, False
+
+    total = sum(len(s) for s in site.artists.values())
+    return Case(run=run, items=total, setup=setup)
+
+
+@benchmark("parse_song_pages")
+def bench_parse_song_pages(ctx: Context) -> Case:
+    parsers = load_module("scrapper", "utils.parsers")
+    return Case(run=lambda: [parsers.extract_pre_text(page) for page in ctx.pages], items=len(ctx.pages))
+
+
+@benchmark("parse_song_pages_soup")
+def bench_parse_song_pages_soup(ctx: Context) -> Case:
+    """Previous extraction (full html.parser tree + re-serialized <pre>), kept as a reference."""
+    import re
+    from bs4 import BeautifulSoup
+
+    def run():
+        for page in ctx.pages:
+            for pre in BeautifulSoup(page, "html.parser").find_all("pre"):
+                if re.sub("<.*?>", "", str(pre)).strip():
+                    break
+
+    return Case(run=run, items=len(ctx.pages))
+
+
+@benchmark("apply_format_rules")
+def bench_apply_format_rules(ctx: Context) -> Case:
+    cleaner = load_module("tab_cleaner")
+    return Case(run=lambda: [cleaner.apply_format_rules(tab) for tab in ctx.tabs], items=len(ctx.tabs))
+
+
+@benchmark("validate_song_format")
+def bench_validate_song_format(ctx: Context) -> Case:
+    validator = load_module("tab_validator")
+    return Case(run=lambda: [validator.validate_song_format(tab) for tab in ctx.tabs], items=len(ctx.tabs))
+
+
+@benchmark("remove_chords")
+def bench_remove_chords(ctx: Context) -> Case:
+    lyrics = load_module(".", "lyrics")
+    return Case(run=lambda: [lyrics.remove_chords(tab) for tab in ctx.tabs], items=len(ctx.tabs))
+
+
+@benchmark("transpose_corpus")
+def bench_transpose_corpus(ctx: Context) -> Case:
+    transpose = load_module("tab_cleaner", "utils.transpose")
+    return Case(
+        run=lambda: transpose.transpose_corpus(ctx.tabs, 2),
+        items=len(ctx.tabs),
+        setup=transpose.clear_cache,
+    )
+
+
+@benchmark("pipeline")
+def bench_pipeline(ctx: Context) -> Case:
+    directory = ctx.workdir / "pipeline"
+    env = dict(os.environ)
+    total = sum(len(s) for s in ctx.site.site.artists.values())
+
+    def setup():
+        shutil.rmtree(directory, ignore_errors=True)
+        write_catalog(ctx.site, directory)
+
+    def run():
+        subprocess.run(
+            [sys.executable, str(TAB_PROCESSOR_DIRECTORY / "pipeline.py")],
+            cwd=directory,
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    return Case(run=run, items=total, setup=setup)
+
+
+@benchmark("export")
+def bench_export(ctx: Context) -> Case:
+    """Full columnar export of a validated corpus (every round starts without an export)."""
+    import export  # Needs pyarrow, only imported when this benchmark runs
+    directory = ctx.workdir / "export"
+
+    def setup():
+        shutil.rmtree(directory, ignore_errors=True)
+        for number, tab in enumerate(ctx.tabs):
+            key = f"songs/artist_{number % 20}/song_{number}.txt"
+            verdict = "ok" if number % 3 else "ko"
+            for path in (directory / "files" / "cleaned" / key, directory / "files" / "validations" / verdict / key):
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(tab, encoding="utf-8")
+
+    def run():
+        with working_directory(directory), redirect_stdout(io.StringIO()):
+            export.export_corpus()
+
+    return Case(run=run, items=len(ctx.tabs), setup=setup)
+
+
+@benchmark("watch")
+def bench_watch(ctx: Context) -> Case:
+    """Time from writing the songs until watch.py has validated all of them."""
+    directory = ctx.workdir / "watch"
+    songs_directory = directory / "files" / "songs"
+    validations = directory / "files" / "validations"
+    state = {}
+
+    def setup():
+        shutil.rmtree(directory, ignore_errors=True)
+        songs_directory.mkdir(parents=True)
+        state["process"] = subprocess.Popen(
+            [sys.executable, str(TAB_PROCESSOR_DIRECTORY / "watch.py"), "--debounce", "0.1", "-q"],
+            cwd=directory,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        state["process"].stdout.readline()  # "Watching ..." once it is ready
+
+    def validated() -> int:
+        return sum(
+            1 for _, _, names in os.walk(validations) for name in names if not name.endswith("_lyrics.txt")
+        )
+
+    def run():
+        process = state["process"]
+        try:
+            for number, tab in enumerate(ctx.tabs):
+                artist = songs_directory / f"artist_{number % 20}"
+                artist.mkdir(exist_ok=True)
+                (artist / f"song_{number}.txt").write_text(tab, encoding="utf-8")
+            deadline = time.monotonic() + 60
+            while validated() < len(ctx.tabs):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"watch.py validated {validated()} of {len(ctx.tabs)} songs")
+                time.sleep(0.01)
+        finally:
+            process.terminate()
+            process.wait()
+
+    return Case(run=run, items=len(ctx.tabs), setup=setup)
+
+
+@benchmark("startup")
+def bench_startup(ctx: Context) -> Case:
+    """Interpreter and import startup of every subcommand of cli.py (`<command> --help`).
+    See benchmarks/importtime.py for the breakdown by module."""
+    from cli import COMMANDS
+
+    def run():
+        for command in COMMANDS:
+            subprocess.run(
+                [sys.executable, str(TAB_PROCESSOR_DIRECTORY / "cli.py"), command, "--help"],
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+
+    return Case(run=run, items=len(COMMANDS))
+
+
+# --- Runner ---
+def run_case(case: Case, repeat: int) -> dict:
+    """Runs a case `repeat` times and returns its timings."""
+    timings = []
+    for _ in range(repeat):
+        if case.setup:
+            case.setup()
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            case.run()
+            timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "items": case.items,
+        "rounds": repeat,
+        "seconds_best": best,
+        "seconds_median": statistics.median(timings),
+        "items_per_second": case.items / best if best else None,
+    }
+
+
+def git_commit() -> str:
+    """Short hash of the current commit, with a '+' if the tree has changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True).stdout.strip()
+        return commit + ("+" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_pages(directory: str) -> list[str]:
+    """Loads recorded pages (*.html, *.shtml) from a directory."""
+    paths = sorted(p for p in Path(directory).rglob("*") if p.suffix in (".html", ".shtml"))
+    return [p.read_text(encoding="utf-8", errors="ignore") for p in paths]
+
+
+def save_results(results: dict) -> Path:
+    """Stores a run under benchmarks/results, named by date and commit."""
+    RESULTS_DIRECTORY.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = RESULTS_DIRECTORY / f"{stamp}_{results['commit'].replace('+', '-dirty')}.json"
+    path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return path
+
+
+def compare(current: dict, previous: dict):
+    """Prints the speed-up of every benchmark against a previous run."""
+    print(f"\nCompared with {previous['commit']} ({previous['date']}):")
+    for name, result in current["results"].items():
+        before = previous["results"].get(name)
+        if not before:
+            continue
+        ratio = before["seconds_best"] / result["seconds_best"] if result["seconds_best"] else 0
+        print(f"  {name:<22} {before['seconds_best']:.4f}s -> {result['seconds_best']:.4f}s  (x{ratio:.2f})")
+
+
+@click.command()
+@click.option("--only", "-o", multiple=True, type=click.Choice(list(BENCHMARKS)), help="Benchmarks to run (all by default).")
+@click.option("--seed", default=0, help="Seed of the synthetic corpus.")
+@click.option("--tabs", default=2000, help="Number of synthetic tabs for the text benchmarks.")
+@click.option("--lines", default=40, help="Lines of every synthetic tab.")
+@click.option("--chord-ratio", default=0.4, help="Share of chord lines in the tabs.")
+@click.option("--noise-ratio", default=0.1, help="Share of noise lines (notes, urls, emails...) in the tabs.")
+@click.option("--letters", default="abc", help="Letters of the synthetic site.")
+@click.option("--artists", default=5, help="Artists per letter in the synthetic site.")
+@click.option("--songs", default=10, help="Songs per artist in the synthetic site.")
+@click.option("--pages-dir", type=click.Path(exists=True, file_okay=False), default=None, help="Recorded song pages for the parser benchmarks (default: the synthetic ones).")
+@click.option("--workers", default=3, help="Worker processes of the sharded crawl.")
+@click.option("--repeat", "-r", default=3, help="Rounds of every benchmark (the best one is kept).")
+@click.option("--compare-with", type=click.Path(exists=True), default=None, help="Results file to compare with (default: the previous run).")
+@click.option("--no-save", is_flag=True, default=False, help="Do not store the results.")
+def main(only, seed, tabs, lines, chord_ratio, noise_ratio, letters, artists, songs, pages_dir, workers, repeat, compare_with, no_save):
+    """Runs the benchmarks on a synthetic corpus and a local stand-in of the site."""
+    mix = TabMix(lines=lines, chord_ratio=chord_ratio, noise_ratio=noise_ratio)
+    config = {
+        "seed": seed,
+        "tabs": tabs,
+        "mix": asdict(mix),
+        "letters": letters,
+        "artists_per_letter": artists,
+        "songs_per_artist": songs,
+        "pages_dir": pages_dir,
+        "workers": workers,
+    }
+    results = {
+        "commit": git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": config,
+        "results": {},
+    }
+
+    site = generate_site(seed, letters, artists, songs, mix)
+    corpus = generate_tabs(tabs, seed, mix)
+    if pages_dir:
+        pages = load_pages(pages_dir)
+    else:
+        pages = [page for path, page in site.pages.items() if path.endswith(".shtml")]
+
+    with tempfile.TemporaryDirectory() as workdir, LocalSite(site) as local_site:
+        ctx = Context(workdir=Path(workdir), site=local_site, tabs=corpus, letters=letters, pages=pages, workers=workers)
+        with working_directory(ctx.workdir):
+            for name in only or BENCHMARKS:
+                result = run_case(BENCHMARKS[name](ctx), repeat)
+                results["results"][name] = result
+                print(
+                    f"{name:<22} best {result['seconds_best']:.4f}s  "
+                    f"median {result['seconds_median']:.4f}s  "
+                    f"{result['items_per_second']:.1f} items/s"
+                )
+        for server in ctx.cleanup:
+            server.__exit__(None, None, None)
+
+    previous_runs = sorted(RESULTS_DIRECTORY.glob("*.json")) if RESULTS_DIRECTORY.exists() else []
+    previous_path = Path(compare_with) if compare_with else (previous_runs[-1] if previous_runs else None)
+    if previous_path:
+        compare(results, json.loads(previous_path.read_text(encoding="utf-8")))
+
+    if not no_save:
+        print(f"\nResults saved to {save_results(results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+""" Local HTTP stand-in for lacuerda.net.
+Serves the pages of a generated `Site` from memory on 127.0.0.1, in a
+background thread, so the scrapper can be benchmarked without the network:
+
+    with LocalSite(generate_site()) as site:
+        songs.ROOT = site.url
+"""
+
+import re
+import time
+import hashlib
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from benchmarks.corpus import Site
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves the pages of the site attached to the server."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            server.in_flight += 1
+            overloaded = server.max_concurrent and server.in_flight > server.max_concurrent
+            failing = server.rng.random() < server.fail_rate
+        try:
+            if overloaded:
+                server.throttled += 1
+                self.send_response(429)
+                self.send_header("Retry-After", str(server.retry_after))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if failing:
+                self.send_error(503)
+                return
+            if server.latency:
+                time.sleep(server.latency)
+            self._send_page()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send_page(self):
+        path = re.sub("/+", "/", self.path.split("?")[0])
+        if path != "/" and path.endswith("/"):
+            path = path[:-1]
+        page = self.server.site.pages.get(path)
+        if page is None:
+            self.send_error(404)
+            return
+        body = page.encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep the benchmark output clean
+
+
+class LocalSite:
+    """Runs the stand-in server while the context is open.
+    Pages carry an ETag and conditional requests are answered with 304.
+    It can behave like a loaded site: slow answers (`latency`), random 503
+    errors (`fail_rate`) and 429 + Retry-After above `max_concurrent` requests.
+
+    Attributes:
+        site (Site): The served site.
+        url (str): Root URL of the server, e.g. http://127.0.0.1:45678
+    """
+
+    def __init__(
+        self,
+        site: Site,
+        port: int = 0,
+        latency: float = 0.0,
+        fail_rate: float = 0.0,
+        max_concurrent: int = 0,
+        retry_after: int = 1,
+        seed: int = 0,
+    ):
+        self.site = site
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.server.daemon_threads = True
+        self.server.site = site
+        self.server.hits = 0
+        self.server.throttled = 0
+        self.server.in_flight = 0
+        self.server.latency = latency
+        self.server.fail_rate = fail_rate
+        self.server.max_concurrent = max_concurrent
+        self.server.retry_after = retry_after
+        self.server.rng = random.Random(seed)
+        self.server.lock = threading.Lock()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def hits(self) -> int:
+        """Number of requests served."""
+        return self.server.hits
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,62 @@
+""" Single entry point for every stage and tool of the tab processor:
+
+    python cli.py scrape -v
+    python cli.py clean
+    python cli.py --help
+
+A subcommand is only imported when it runs, so the help, or a short stage, does
+not pay for the dependencies of the others (requests, bs4, pyarrow...). The
+stage scripts can still be run directly. """
+
+import click
+import importlib
+
+# --- Configuration ---
+# Subcommand -> (stage directory, None for the scripts of this directory; module; help)
+COMMANDS = {
+    "scrape": ("scrapper", "main", "Download the catalog and the songs (scrapper/main.py)."),
+    "clean": ("tab_cleaner", "main", "Clean the downloaded tabs (tab_cleaner/main.py)."),
+    "transpose": ("tab_cleaner", "transpose", "Transpose the cleaned tabs (tab_cleaner/transpose.py)."),
+    "validate": ("tab_validator", "main", "Validate the cleaned tabs (tab_validator/main.py)."),
+    "results": (None, "results", "Count the files of every stage (results.py)."),
+    "lyrics": (None, "lyrics", "Extract the lyrics of the valid tabs (lyrics.py)."),
+    "pipeline": (None, "pipeline", "Run every stage in order (pipeline.py)."),
+    "watch": (None, "watch", "Process the songs as soon as they are downloaded (watch.py)."),
+    "export": (None, "export", "Export the corpus as Parquet or Arrow (export.py)."),
+    "metrics": (None, "metrics", "Show the run history and check for regressions (metrics.py)."),
+    "timeline": (None, "timeline", "Merge the per-song traces (timeline.py)."),
+    "benchmark": ("benchmarks", "main", "Run the benchmarks (benchmarks/main.py)."),
+}
+
+
+def load_command(name: str) -> click.Command:
+    """Imports the module of a subcommand and returns its click command."""
+    stage, module, _ = COMMANDS[name]
+    if stage is None:
+        return importlib.import_module(module).main
+    # Every stage has its own utils package, they are kept apart
+    from common.stages import load_module
+
+    return load_module(stage, module).main
+
+
+class LazyGroup(click.Group):
+    """Group whose subcommands are imported when they are invoked."""
+
+    def list_commands(self, ctx):
+        return list(COMMANDS)
+
+    def get_command(self, ctx, name):
+        return load_command(name) if name in COMMANDS else None
+
+    def format_commands(self, ctx, formatter):
+        # The help is built from COMMANDS, without importing any subcommand
+        with formatter.section("Commands"):
+            formatter.write_dl([(name, help_text) for name, (_, _, help_text) in COMMANDS.items()])
+
+
+cli = LazyGroup(help="Tab processor: scrape, clean, validate and export the lacuerda.net tabs.")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,181 @@
+""" Content-addressed store behind the writers of the cleaner, the validator and
+the lyrics extraction. Every content is stored once as `files/blobs/ab/<sha256>`
+and the output paths are hard links to it, so the cleaned tab copied unchanged
+to `validations/ok`, the identical `_lyrics` of two versions of a song or a song
+uploaded under two artists take the space of one file and writing them again is
+only a link. The reference count of a blob is its link count: removing an
+output path releases its reference, and `collect_garbage()` removes the blobs
+no path uses anymore.
+
+Outputs are always replaced through a new link, never written in place (that
+would change every path sharing the blob). Set TAB_PROCESSOR_DEDUP=0 to write
+plain files instead. """
+
+import os
+import hashlib
+import threading
+import logging as log
+
+from common import instrumentation
+
+# --- Configuration ---
+BLOBS_DIRECTORY = "./files/blobs/"
+ENABLED = os.environ.get("TAB_PROCESSOR_DEDUP", "1") != "0"
+LINK_ATTEMPTS = 3  # Times a blob is stored again if collect_garbage() removes it before it is linked
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """Stores every content once and links the output paths to it.
+
+    Attributes:
+        directory (str): Root of the blobs.
+    """
+
+    def __init__(self, directory: str = BLOBS_DIRECTORY):
+        self.directory = directory
+        self._linkable = True  # False once the file system refused a hard link
+
+    def blob_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _temporary(self, path: str) -> str:
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def put(self, data: bytes) -> str:
+        """Stores a content if it is not stored yet.
+        Returns:
+            str: The key (sha256) of the content.
+        """
+        stats = instrumentation.current()
+        key = digest(data)
+        blob = self.blob_path(key)
+        if os.path.exists(blob):
+            stats.count("blobs_reused")
+            return key
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        temporary = self._temporary(blob)
+        with open(temporary, "wb") as file:
+            file.write(data)
+        try:
+            # Fails if another writer stored the same content meanwhile, every path keeps sharing one blob
+            os.link(temporary, blob)
+            stats.count("blobs_written")
+            stats.count("blob_bytes_written", len(data))
+        except FileExistsError:
+            stats.count("blobs_reused")
+        except OSError:
+            os.replace(temporary, blob)  # No hard links on this file system
+            return key
+        os.remove(temporary)
+        return key
+
+    def same_content(self, path: str, key: str) -> bool:
+        """True if the path is already a link to the blob: a stat, the file is not read."""
+        try:
+            return os.path.samefile(path, self.blob_path(key))
+        except FileNotFoundError:
+            return False
+
+    def write(self, path: str, text: str) -> str:
+        """Writes a text to a path through the store.
+        Args:
+            path (str): The output file, replaced if it exists.
+            text (str): Its content.
+        Returns:
+            str: The key of the content.
+        """
+        data = text.encode("utf-8")
+        key = self.put(data)
+        blob = self.blob_path(key)
+        if self.same_content(path, key):
+            instrumentation.current().count("writes_unchanged")
+            os.utime(blob)  # Still counts as written now (watch compares modification times)
+            return key
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temporary = self._temporary(path)
+        if self._linkable:
+            try:
+                self._link(blob, data, temporary)
+                os.utime(blob)
+                os.replace(temporary, path)  # Atomic, the old content (and its reference) goes away
+                return key
+            except FileNotFoundError as e:
+                log.warning(f"Blob {key} kept disappearing before it was linked ({e}), writing a copy of {path}")
+            except OSError as e:
+                log.warning(f"Hard links not available in {os.path.dirname(path)} ({e}), writing copies")
+                self._linkable = False
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+        return key
+
+    def _link(self, blob: str, data: bytes, temporary: str):
+        """Links a blob to a new path. A blob with no other link may be removed by a
+        collect_garbage() running at the same time (validator --init): it is stored again."""
+        for _ in range(LINK_ATTEMPTS - 1):
+            try:
+                os.link(blob, temporary)
+                return
+            except FileNotFoundError:
+                instrumentation.current().count("blobs_collected_while_writing")
+                self.put(data)
+        os.link(blob, temporary)
+
+    def references(self, key: str) -> int:
+        """Number of output paths linked to a blob."""
+        return os.stat(self.blob_path(key)).st_nlink - 1
+
+    def blobs(self):
+        """Yields the path of every blob."""
+        for directory, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".tmp"):
+                    yield os.path.join(directory, name)
+
+    def collect_garbage(self) -> int:
+        """Removes the blobs no output path links to.
+        Returns:
+            int: Number of blobs removed.
+        """
+        removed = 0
+        for blob in self.blobs():
+            if os.stat(blob).st_nlink == 1:
+                os.remove(blob)
+                removed += 1
+        return removed
+
+    def usage(self) -> dict:
+        """Blobs, bytes stored and bytes the linked paths would take as plain files."""
+        blobs = stored = logical = links = 0
+        for blob in self.blobs():
+            status = os.stat(blob)
+            blobs += 1
+            stored += status.st_size
+            links += status.st_nlink - 1
+            logical += status.st_size * (status.st_nlink - 1)
+        return {"blobs": blobs, "links": links, "stored_bytes": stored, "logical_bytes": logical}
+
+
+_store = BlobStore()
+
+
+def write_text(path: str, text: str):
+    """Writes an output of a stage: through the store, or as a plain file if dedup is disabled."""
+    if ENABLED:
+        _store.write(path, text)
+        return
+    # Replaced, not written in place: the old file may still be a link to a blob
+    temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(temporary, path)
+
+
+def store() -> BlobStore:
+    """The store used by write_text."""
+    return _store
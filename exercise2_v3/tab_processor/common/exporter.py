@@ -0,0 +1,163 @@
+""" Exports the metrics of every run for monitoring.
+`Instrumentation.finish()` passes the run summary here. It is written as a
+Prometheus text file (for the node_exporter textfile collector: point it to
+`logs/metrics/prometheus` or set TAB_PROCESSOR_TEXTFILE_DIR) and appended to
+`logs/metrics/history.jsonl`, which `metrics.py` uses to spot throughput
+regressions. All values describe the last run of each stage, so they are
+exported as gauges. """
+
+import os
+import json
+import time
+
+# --- Configuration ---
+METRICS_DIRECTORY = "./logs/metrics/"
+TEXTFILE_DIRECTORY = os.environ.get("TAB_PROCESSOR_TEXTFILE_DIR", f"{METRICS_DIRECTORY}prometheus/")
+HISTORY_FILE = f"{METRICS_DIRECTORY}history.jsonl"
+PREFIX = "tab_processor"
+
+# Counter that measures the work done by each stage, for the items/s metric
+THROUGHPUT_COUNTERS = {
+    "scrapper": ("songs_downloaded",),
+    "cleaner": ("files_cleaned",),
+    "validator": ("files_ok", "files_ko"),
+    "lyrics": ("files_processed",),
+    "export": ("rows_written",),
+    "watch": ("songs_ok", "songs_ko"),
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class TextFile:
+    """Builds a file in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.lines = []
+        self._declared = set()
+
+    def add(self, name: str, value: float, help_text: str, **labels):
+        name = f"{PREFIX}_{name}"
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} gauge")
+        self.lines.append(f"{name}{_labels(labels)} {float(value)!r}")
+
+    def write(self, path: str):
+        """Writes the file atomically, the collector must never read half a file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write("\n".join(self.lines) + "\n")
+        os.replace(temporary, path)
+
+
+def derived_metrics(summary: dict) -> dict:
+    """Throughput and ratios computed from the raw counters of a run."""
+    counters = summary["counters"]
+    duration = summary["duration_seconds"] or 0.0
+    items = sum(counters.get(name, 0) for name in THROUGHPUT_COUNTERS.get(summary["stage"], ()))
+    derived = {
+        "items": items,
+        "items_per_second": items / duration if duration > 0 else 0.0,
+    }
+    if "bytes_downloaded" in counters and duration > 0:
+        derived["bytes_per_second"] = counters["bytes_downloaded"] / duration
+    validated = counters.get("files_ok", 0) + counters.get("files_ko", 0)
+    if validated:
+        derived["ok_ratio"] = counters.get("files_ok", 0) / validated
+    return derived
+
+
+def prometheus_text(summary: dict, derived: dict) -> TextFile:
+    """The metrics of a stage run as a Prometheus text file."""
+    stage = summary["stage"]
+    text = TextFile()
+    text.add("stage_last_run_timestamp_seconds", time.time(), "When the stage last finished.", stage=stage)
+    text.add("stage_duration_seconds", summary["duration_seconds"], "Duration of the last run.", stage=stage)
+    text.add("stage_items", derived["items"], "Items processed by the last run.", stage=stage)
+    text.add("stage_items_per_second", derived["items_per_second"], "Throughput of the last run.", stage=stage)
+    if "bytes_per_second" in derived:
+        text.add("bytes_per_second", derived["bytes_per_second"], "Download throughput of the last run.", stage=stage)
+    if "ok_ratio" in derived:
+        text.add("validation_ok_ratio", derived["ok_ratio"], "Share of valid songs in the last run.", stage=stage)
+
+    for phase, values in summary["phases"].items():
+        text.add("phase_seconds", values["seconds"], "Seconds spent in each phase.", stage=stage, phase=phase)
+    for name, value in summary["counters"].items():
+        if name.startswith("http_"):
+            text.add(
+                "http_responses", value, "HTTP responses by status in the last run.", stage=stage, code=name[5:]
+            )
+        else:
+            text.add("events", value, "Events counted in the last run.", stage=stage, event=name)
+    for kind, values in summary["latencies"].items():
+        for key, value in values.items():
+            if key.startswith("p"):
+                text.add(
+                    "item_latency_seconds",
+                    value,
+                    "Latency percentiles of the items of the last run.",
+                    stage=stage,
+                    kind=kind,
+                    quantile=f"0.{key[1:]}",
+                )
+    return text
+
+
+def export_run(summary: dict):
+    """Writes the Prometheus file of the stage and appends the run to the history."""
+    derived = derived_metrics(summary)
+    prometheus_text(summary, derived).write(os.path.join(TEXTFILE_DIRECTORY, f"{PREFIX}_{summary['stage']}.prom"))
+    append_history(
+        {
+            "stage": summary["stage"],
+            "started_at": summary["started_at"],
+            "duration_seconds": summary["duration_seconds"],
+            **derived,
+            "counters": summary["counters"],
+        }
+    )
+
+
+def export_pipeline(stages: dict[str, float], success: bool, failed: str = None):
+    """Writes the metrics of a pipeline.py run (duration of every stage run as a subprocess)."""
+    text = TextFile()
+    text.add("pipeline_last_run_timestamp_seconds", time.time(), "When the pipeline last finished.")
+    text.add("pipeline_success", int(success), "1 if the last pipeline run succeeded.")
+    for stage, seconds in stages.items():
+        text.add("pipeline_stage_seconds", seconds, "Wall time of every stage in the last pipeline run.", stage=stage)
+    text.write(os.path.join(TEXTFILE_DIRECTORY, f"{PREFIX}_pipeline.prom"))
+    append_history(
+        {
+            "stage": "pipeline",
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "duration_seconds": sum(stages.values()),
+            "success": success,
+            "failed_stage": failed,
+            "stages": stages,
+        }
+    )
+
+
+def append_history(record: dict):
+    os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+    with open(HISTORY_FILE, "a", encoding="utf-8") as file:
+        file.write(json.dumps(record) + "\n")
+
+
+def load_history() -> list[dict]:
+    """Every run recorded in the history, oldest first."""
+    if not os.path.exists(HISTORY_FILE):
+        return []
+    with open(HISTORY_FILE, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
@@ -0,0 +1,225 @@
+""" Instrumentation shared by every stage of the tab processor.
+A stage starts a run with `start(stage)`, wraps its work in phases
+(discover/read/transform/write/network/print), counts events and records
+per-file latencies. `finish()` writes everything as JSON under `logs/metrics`
+so runs can be compared. With `profile=True` the run is also captured with
+cProfile and tracemalloc, and with `trace=True` every item and phase is also
+recorded as a span of a per-song timeline (see common/tracing.py). """
+
+import os
+import json
+import time
+import datetime
+import threading
+import tracemalloc
+import logging as log
+from contextlib import contextmanager
+
+from common import exporter, tracing
+
+# --- Configuration ---
+METRICS_DIRECTORY = "./logs/metrics/"
+PERCENTILES = (50, 90, 95, 99)
+PROFILE_TOP = 25
+TRACEMALLOC_TOP = 10
+
+
+def percentile(samples: list[float], rank: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, round(rank / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+class Instrumentation:
+    """Collects timers, counters and latency samples for a single stage run.
+
+    Attributes:
+        stage (str): Name of the stage (scrapper, cleaner, validator...).
+        profile (bool): If True, cProfile and tracemalloc are enabled.
+        tracer (Tracer | None): Per-song spans, if the run is traced.
+        phases (dict): Accumulated seconds and calls per phase.
+        counters (dict): Event counters.
+        latencies (dict): Latency samples (seconds) per kind of item.
+    """
+
+    def __init__(
+        self, stage: str, profile: bool = False, output_directory: str = METRICS_DIRECTORY, trace: bool = False
+    ):
+        self.stage = stage
+        self.profile = profile
+        self.tracer = tracing.Tracer(stage) if trace else None
+        self.output_directory = output_directory
+        self.phases = {}
+        self.counters = {}
+        self.latencies = {}
+        self.started_at = datetime.datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._profiler = None
+
+    # --- Collection ---
+    @contextmanager
+    def phase(self, name: str, span: str = None):
+        """Times the block and adds it to the given phase.
+        Args:
+            name (str): The phase (discover, read, transform, write, network, print...).
+            span (str, optional): Name of the span in the trace, if more specific than the phase.
+        """
+        start = time.perf_counter()
+        try:
+            if self.tracer:
+                with self.tracer.span(span or name):
+                    yield
+            else:
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                phase = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0})
+                phase["seconds"] += elapsed
+                phase["calls"] += 1
+
+    @contextmanager
+    def item(self, kind: str = "file", song=None):
+        """Times the processing of a single item (file, song...) as a latency sample.
+        Args:
+            kind (str): Kind of item, each kind has its own percentiles.
+            song (int | str, optional): Catalog id or path of the song, its track in the trace.
+        """
+        start = time.perf_counter()
+        try:
+            if self.tracer and song is not None:
+                with self.tracer.song(song):
+                    yield
+            else:
+                yield
+        finally:
+            self.observe(kind, time.perf_counter() - start)
+
+    def count(self, name: str, value: int = 1):
+        """Increments a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, kind: str, seconds: float):
+        """Adds a latency sample."""
+        with self._lock:
+            self.latencies.setdefault(kind, []).append(seconds)
+
+    # --- Profiling ---
+    def start_profiling(self):
+        """Enables cProfile and tracemalloc if the run was started with profile=True."""
+        if not self.profile:
+            return
+        import cProfile  # Only profiled runs pay for the import
+
+        tracemalloc.start()
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def _stop_profiling(self) -> dict:
+        """Stops the profilers and returns their summary."""
+        if not self._profiler:
+            return {}
+        self._profiler.disable()
+
+        import pstats
+
+        stats = pstats.Stats(self._profiler)
+        functions = []
+        for (file_name, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            functions.append(
+                {
+                    "function": f"{file_name}:{line}({function})",
+                    "calls": calls,
+                    "own_seconds": own,
+                    "cumulative_seconds": cumulative,
+                }
+            )
+        functions.sort(key=lambda f: f["cumulative_seconds"], reverse=True)
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        allocations = [
+            {"location": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]
+        ]
+
+        return {
+            "cprofile": functions[:PROFILE_TOP],
+            "tracemalloc": {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top_allocations": allocations,
+            },
+        }
+
+    # --- Output ---
+    def summary(self) -> dict:
+        """Returns the collected data as a JSON-serializable dictionary."""
+        latencies = {}
+        for kind, samples in self.latencies.items():
+            ordered = sorted(samples)
+            latencies[kind] = {
+                "count": len(ordered),
+                "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+                "max": ordered[-1] if ordered else 0.0,
+                **{f"p{rank}": percentile(ordered, rank) for rank in PERCENTILES},
+            }
+        return {
+            "stage": self.stage,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "duration_seconds": time.perf_counter() - self._start,
+            "phases": self.phases,
+            "counters": self.counters,
+            "latencies": latencies,
+        }
+
+    def finish(self) -> str:
+        """Stops the run and writes its JSON file.
+        Returns:
+            str: The path of the written file.
+        """
+        data = self.summary()
+        data.update(self._stop_profiling())
+
+        os.makedirs(self.output_directory, exist_ok=True)
+        file_name = f"{self.stage}-{self.started_at.strftime('%Y%m%d-%H%M%S')}.json"
+        file_path = os.path.join(self.output_directory, file_name)
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+
+        if self._profiler:
+            self._profiler.dump_stats(file_path.replace(".json", ".prof"))
+
+        # Prometheus text file and history, for monitoring
+        exporter.export_run(data)
+
+        if self.tracer:
+            trace_path = self.tracer.write(started_at=self.started_at.strftime("%Y%m%d-%H%M%S"))
+            log.info(f"Trace saved to {trace_path}")
+
+        log.info(f"Run metrics saved to {file_path}")
+        return file_path
+
+
+# --- Current run ---
+# Helpers deep inside the stages (get_soup, write_string_to_file...) use the
+# instance of the running stage without it being passed around.
+_current = Instrumentation("default")
+
+
+def start(stage: str, profile: bool = False, trace: bool = False) -> Instrumentation:
+    """Starts the instrumentation of a stage and makes it the current run."""
+    global _current
+    _current = Instrumentation(stage, profile=profile, trace=trace)
+    _current.start_profiling()
+    return _current
+
+
+def current() -> Instrumentation:
+    """Returns the instrumentation of the running stage."""
+    return _current
@@ -0,0 +1,141 @@
+""" Logging and progress reporting shared by every stage of the tab processor.
+Log records are put on a queue and written to the log file (and the terminal)
+by a background thread, so the stages never wait for disk or terminal I/O.
+Instead of a line per file, a `Progress` prints a summary line at most once per
+interval. Per-file messages are logged at DEBUG level and only shown with -v.
+
+Verbosity levels:
+    -q   errors only, no progress
+    (0)  warnings and progress on the terminal, INFO in the log file
+    -v   INFO on the terminal, per-file (DEBUG) messages in the log file
+    -vv  per-file messages on the terminal too
+"""
+
+import os
+import sys
+import time
+import queue
+import atexit
+import click
+import threading
+import logging as log
+from logging.handlers import QueueHandler, QueueListener
+
+# --- Configuration ---
+LOGS_DIRECTORY = "./logs/"
+LOG_FORMAT = "%(asctime)s %(levelname)-8s %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+PROGRESS_INTERVAL = 1.0  # Seconds between progress lines
+
+_listener = None
+_verbosity = 0
+
+
+def verbosity_options(function):
+    """Adds the -v/--verbose and -q/--quiet options to a click command."""
+    function = click.option(
+        "-q", "--quiet", is_flag=True, default=False, help="Only show errors, no progress."
+    )(function)
+    return click.option(
+        "-v", "--verbose", count=True, help="Show more messages (-vv for a message per file)."
+    )(function)
+
+
+def verbosity_args(verbose: int, quiet: bool) -> list[str]:
+    """The options to pass the same verbosity to a stage run as a subprocess."""
+    if quiet:
+        return ["-q"]
+    return ["-v"] * verbose
+
+
+def setup(log_name: str, verbose: int = 0, quiet: bool = False, log_format: str = LOG_FORMAT):
+    """Sends every log record through a queue to the log file and the terminal.
+    Args:
+        log_name (str): Name of the file inside logs/, e.g. "cleaner.log".
+        verbose (int): Number of -v given.
+        quiet (bool): If True, only errors are shown.
+        log_format (str): Format of the records in the log file.
+    """
+    global _listener, _verbosity
+    stop()
+    _verbosity = -1 if quiet else verbose
+
+    os.makedirs(LOGS_DIRECTORY, exist_ok=True)
+    file_handler = log.FileHandler(os.path.join(LOGS_DIRECTORY, log_name), mode="w", encoding="utf-8")
+    file_handler.setFormatter(log.Formatter(log_format, datefmt=DATE_FORMAT))
+    file_handler.setLevel(log.WARNING if quiet else log.DEBUG if verbose else log.INFO)
+
+    console_handler = log.StreamHandler(sys.stderr)
+    console_handler.setFormatter(log.Formatter("%(levelname)s: %(message)s"))
+    console_handler.setLevel(
+        log.ERROR if quiet else {0: log.WARNING, 1: log.INFO}.get(verbose, log.DEBUG)
+    )
+
+    records = queue.SimpleQueue()
+    root = log.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(records))
+    root.setLevel(min(file_handler.level, console_handler.level))
+
+    _listener = QueueListener(records, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def stop():
+    """Writes the pending records and stops the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop)
+
+
+class Progress:
+    """Rate-limited progress of a stage: one summary line per interval.
+
+    Attributes:
+        label (str): What is being processed, e.g. "Cleaner".
+        total (int): Number of items expected (0 if unknown).
+        done (int): Items processed so far.
+    """
+
+    def __init__(self, label: str, total: int = 0, interval: float = PROGRESS_INTERVAL):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.interval = interval
+        self.enabled = _verbosity >= 0
+        self._tty = sys.stdout.isatty()
+        self._start = time.monotonic()
+        self._last = self._start  # The first line comes after one interval
+        self._lock = threading.Lock()
+
+    def update(self, count: int = 1):
+        """Adds processed items. Prints at most one line per interval."""
+        with self._lock:
+            self.done += count
+            now = time.monotonic()
+            if self.enabled and now - self._last >= self.interval:
+                self._last = now
+                self._print(now)
+
+    def _print(self, now: float, end: str = None):
+        elapsed = now - self._start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        of_total = f"/{self.total}" if self.total else ""
+        line = f"{self.label}: {self.done}{of_total} ({rate:.0f}/s)"
+        if self._tty:
+            sys.stdout.write(f"\r{line}" + (end or ""))
+        else:
+            sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+    def close(self):
+        """Prints the final line."""
+        if self.enabled:
+            self._print(time.monotonic(), end="\n")
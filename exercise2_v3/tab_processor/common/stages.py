@@ -0,0 +1,46 @@
+""" Helpers to import the code of a stage from outside of it.
+Every stage has its own `utils` package and its own `main.py`, so they can not be
+imported side by side with a plain `import`. `load_module` imports a module with
+the stage directory first in the path and keeps the result apart, so the
+scrapper, the cleaner and the validator can be used from the same process. """
+
+import sys
+import importlib
+from pathlib import Path
+
+# --- Configuration ---
+TAB_PROCESSOR_DIRECTORY = Path(__file__).resolve().parents[1]
+
+_loaded = {}
+
+
+def load_module(stage: str, module: str = "main"):
+    """Imports a module of a stage.
+    Args:
+        stage (str): The stage directory (scrapper, tab_cleaner, tab_validator).
+        module (str): The module inside the stage, e.g. "main" or "utils.songs".
+    Returns:
+        module: The imported module. Repeated calls return the same object.
+    """
+    key = (stage, module)
+    if key in _loaded:
+        return _loaded[key]
+
+    top_level = module.split(".")[0]
+
+    def shadowed(name):
+        return name in (top_level, "utils") or name.startswith((f"{top_level}.", "utils."))
+
+    saved = {name: sys.modules.pop(name) for name in list(sys.modules) if shadowed(name)}
+    stage_directory = str(TAB_PROCESSOR_DIRECTORY / stage)
+    sys.path.insert(0, stage_directory)
+    try:
+        loaded = importlib.import_module(module)
+    finally:
+        sys.path.remove(stage_directory)
+        for name in [name for name in sys.modules if shadowed(name)]:
+            del sys.modules[name]
+        sys.modules.update(saved)
+
+    _loaded[key] = loaded
+    return loaded
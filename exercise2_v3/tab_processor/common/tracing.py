@@ -0,0 +1,190 @@
+""" Per-song trace of a stage run, in the Chrome trace event format.
+With tracing enabled (`--trace` in every stage and in pipeline.py) each song
+processed by a stage gets a span on its own track, keyed by the catalog
+`Song.id`, with the phases run for it (fetch, parse, write, clean rules,
+validate, lyrics...) as nested spans. Every run writes `logs/traces/<stage>-<ts>.json`;
+the files of several stages can be merged (`python timeline.py` or `cli.py timeline`) into a single
+timeline where every song shows how long each stage took for it. Open the files
+with https://ui.perfetto.dev or chrome://tracing. """
+
+import os
+import json
+import time
+import zlib
+import threading
+from pathlib import Path
+
+# --- Configuration ---
+TRACES_DIRECTORY = "./logs/traces/"
+CATALOG_FILE = "./files/catalogs/catalog.json"
+PID = 1  # Every stage shares the process, so a song keeps its track across stages
+STAGE_TID = 0  # Track of the work not done for a single song (discover, catalog...)
+
+
+def song_key(path) -> str:
+    """The songs/<artist>/<song>.txt part of any path of the pipeline."""
+    parts = Path(path).parts
+    return "/".join(parts[parts.index("songs") :]) if "songs" in parts else Path(path).name
+
+
+def load_song_ids(catalog_file: str = CATALOG_FILE) -> dict[str, int]:
+    """The catalog id of every song, by song key."""
+    if not os.path.exists(catalog_file):
+        return {}
+    with open(catalog_file, encoding="utf-8") as file:
+        catalog = json.load(file)
+    return {
+        song_key(song["lyrics_path"]): song["id"]
+        for artist in catalog
+        for song in artist["songs"]
+        if song.get("id") is not None and song.get("lyrics_path")
+    }
+
+
+class Tracer:
+    """Collects the spans of a stage run.
+
+    Attributes:
+        stage (str): Name of the stage, used as the category of its spans.
+        events (list): Trace events recorded so far.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.events = []
+        self._local = threading.local()
+        self._song_ids = None
+        self._named = set()
+        self._lock = threading.Lock()
+
+    def _track(self, song) -> tuple[int, dict]:
+        """Track id and arguments of a song, given its id or one of its paths."""
+        if isinstance(song, int):
+            return song, {"song_id": song}
+        key = song_key(song)
+        with self._lock:
+            if self._song_ids is None:
+                self._song_ids = load_song_ids()
+        song_id = self._song_ids.get(key)
+        if song_id is None:
+            # Not in the catalog: a stable track derived from the path
+            return zlib.crc32(key.encode()) | 1 << 31, {"path": key}
+        return song_id, {"song_id": song_id, "path": key}
+
+    def _name_track(self, tid: int, args: dict):
+        with self._lock:
+            if tid in self._named:
+                return
+            self._named.add(tid)
+        label = f"song {args['song_id']}" if "song_id" in args else "song"
+        if "path" in args:
+            label += f" {args['path']}"
+        self.events.append({"name": "thread_name", "ph": "M", "pid": PID, "tid": tid, "args": {"name": label}})
+
+    def _add(self, name: str, start_ns: int, end_ns: int, tid: int, args: dict = None):
+        event = {
+            "name": name,
+            "cat": self.stage,
+            "ph": "X",
+            "ts": start_ns / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": PID,
+            "tid": tid,
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)  # list.append is atomic, no lock needed
+
+    def song(self, song):
+        """Context manager: the spans inside go to the track of the song.
+        Args:
+            song (int | str): The catalog id of the song or any of its paths.
+        """
+        return _SongSpan(self, song)
+
+    def span(self, name: str):
+        """Context manager: records a span on the track of the current song."""
+        return _Span(self, name)
+
+    def write(self, directory: str = TRACES_DIRECTORY, started_at: str = None) -> str:
+        """Writes the trace of the run.
+        Returns:
+            str: The path of the written file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, f"{self.stage}-{started_at or time.strftime('%Y%m%d-%H%M%S')}.json")
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, file)
+        return file_path
+
+
+class _Span:
+    def __init__(self, tracer: Tracer, name: str):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time_ns()
+        return self
+
+    def __exit__(self, *_):
+        tid = getattr(self.tracer._local, "tid", STAGE_TID)
+        self.tracer._add(self.name, self.start, time.time_ns(), tid)
+
+
+class _SongSpan:
+    def __init__(self, tracer: Tracer, song):
+        self.tracer = tracer
+        self.tid, self.args = tracer._track(song)
+
+    def __enter__(self):
+        self.tracer._name_track(self.tid, self.args)
+        self.previous = getattr(self.tracer._local, "tid", STAGE_TID)
+        self.tracer._local.tid = self.tid
+        self.start = time.time_ns()
+        return self
+
+    def __exit__(self, *_):
+        self.tracer._add(self.tracer.stage, self.start, time.time_ns(), self.tid, self.args)
+        self.tracer._local.tid = self.previous
+
+
+def merge(paths: list[str], output_path: str) -> int:
+    """Merges the traces of several stage runs into a single timeline.
+    Returns:
+        int: Number of events written.
+    """
+    events, labels = [], {}
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            for event in json.load(file)["traceEvents"]:
+                if event["ph"] != "M":
+                    events.append(event)
+                elif len(event["args"]["name"]) > len(labels.get(event["tid"], "")):
+                    labels[event["tid"]] = event["args"]["name"]  # The most descriptive name (id and path)
+    names = [
+        {"name": "thread_name", "ph": "M", "pid": PID, "tid": tid, "args": {"name": label}}
+        for tid, label in labels.items()
+    ]
+    events = names + events
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+    return len(events)
+
+
+def slowest(paths: list[str], top: int = 10) -> list[tuple[float, str, str, str]]:
+    """The longest spans recorded for single songs in some traces.
+    Returns:
+        list[tuple]: (milliseconds, stage, span name, song) of the `top` longest spans.
+    """
+    spans, tracks = [], {}
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            for event in json.load(file)["traceEvents"]:
+                if event["ph"] == "M":
+                    tracks[event["tid"]] = event["args"]["name"]
+                elif event["tid"] != STAGE_TID:
+                    spans.append((event["dur"] / 1000, event["cat"], event["name"], event["tid"]))
+    spans.sort(key=lambda span: span[0], reverse=True)
+    return [(ms, stage, name, tracks.get(tid, str(tid))) for ms, stage, name, tid in spans[:top]]
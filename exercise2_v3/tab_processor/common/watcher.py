@@ -0,0 +1,159 @@
+""" Watches a directory tree for new or changed files.
+On Linux the kernel notifies the changes (inotify, through ctypes, no extra
+dependency); elsewhere, or if inotify is not available, the tree is polled and
+compared by modification time and size. Both watchers call `callback(path)` for
+every file that was written, and watch the directories created later on. """
+
+import os
+import sys
+import time
+import errno
+import select
+import ctypes
+import struct
+import logging as log
+
+# --- Configuration ---
+# inotify constants (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def walk_files(root: str):
+    """Yields every file under a directory, with '/' as separator."""
+    for directory, _, file_names in os.walk(root):
+        for name in file_names:
+            yield os.path.join(directory, name).replace("\\", "/")
+
+
+class PollingWatcher:
+    """Finds changes by scanning the tree every `interval` seconds."""
+
+    def __init__(self, root: str, callback, interval: float = 2.0):
+        self.root = root
+        self.callback = callback
+        self.interval = interval
+        self.running = False
+        self._seen = self._scan()  # Files already there are not reported
+
+    def _scan(self) -> dict:
+        seen = {}
+        for path in walk_files(self.root):
+            try:
+                status = os.stat(path)
+            except FileNotFoundError:
+                continue
+            seen[path] = (status.st_mtime_ns, status.st_size)
+        return seen
+
+    def run(self):
+        """Polls until `stop()` is called."""
+        self.running = True
+        while self.running:
+            time.sleep(self.interval)
+            current = self._scan()
+            for path, signature in current.items():
+                if self._seen.get(path) != signature:
+                    self.callback(path)
+            self._seen = current
+
+    def stop(self):
+        self.running = False
+
+
+class InotifyWatcher:
+    """Receives the changes from the kernel. Raises OSError if inotify is not available."""
+
+    def __init__(self, root: str, callback, interval: float = 1.0):
+        self.root = root
+        self.callback = callback
+        self.interval = interval  # Max seconds between checks of `running`
+        self.running = False
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories = {}  # watch descriptor -> directory
+        self._add_tree(root, report=False)
+
+    def _add_watch(self, directory: str) -> bool:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                log.warning("inotify watch limit reached (fs.inotify.max_user_watches)")
+            return False
+        self._directories[wd] = directory
+        return True
+
+    def _add_tree(self, root: str, report: bool = True):
+        """Watches a directory and its subdirectories. With `report`, the files
+        already inside (written before the watch was added) are reported."""
+        for directory, _, file_names in os.walk(root):
+            self._add_watch(directory.replace("\\", "/"))
+            if report:
+                for name in file_names:
+                    self.callback(os.path.join(directory, name).replace("\\", "/"))
+
+    def run(self):
+        """Reads the kernel events until `stop()` is called."""
+        self.running = True
+        while self.running:
+            readable, _, _ = select.select([self._fd], [], [], self.interval)
+            if not readable:
+                continue
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            self._dispatch(buffer)
+        os.close(self._fd)
+
+    def _dispatch(self, buffer: bytes):
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + EVENT_HEADER.size : offset + EVENT_HEADER.size + length]
+            offset += EVENT_HEADER.size + length
+            name = os.fsdecode(name.rstrip(b"\0"))
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: report every file so nothing is missed
+                log.warning("inotify queue overflow, rescanning the tree")
+                for path in walk_files(self.root):
+                    self.callback(path)
+                continue
+            if mask & IN_IGNORED:
+                self._directories.pop(wd, None)
+                continue
+            directory = self._directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = f"{directory}/{name}"
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self.callback(path)
+
+    def stop(self):
+        self.running = False
+
+
+def create_watcher(root: str, callback, poll: bool = False, interval: float = 2.0):
+    """Returns an inotify watcher, or a polling one if asked for or if inotify is not available."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, callback)
+        except (OSError, AttributeError) as e:
+            log.warning(f"inotify not available ({e}), polling every {interval}s")
+    return PollingWatcher(root, callback, interval)
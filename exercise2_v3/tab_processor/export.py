@@ -0,0 +1,263 @@
+""" Columnar export of the validated corpus.
+Every validated song (ok and ko) is written as a row with its catalog metadata,
+cleaned text, lyrics, chords and verdict, partitioned by artist letter and
+artist (hive style: `letter=a/artist_slug=abel_pintos/part-<run>.parquet`), so the
+corpus can be read and filtered by column without opening every small file:
+
+    import pyarrow.dataset as ds
+    corpus = ds.dataset("files/export", format="parquet", partitioning="hive")
+
+Runs are incremental: only the songs added, changed or removed since the last
+export are read, and only the partitions they belong to are rewritten. """
+
+import os
+import json
+import time
+import click
+import logging as log
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
+from pathlib import Path
+
+from common import instrumentation, reporting
+from common.stages import load_module
+
+# --- Configuration ---
+INPUT_DIRECTORY = "./files/"
+CATALOG_FILE = f"{INPUT_DIRECTORY}catalogs/catalog.json"
+CLEANED_DIRECTORY = f"{INPUT_DIRECTORY}cleaned"
+VALIDATIONS = {"ok": f"{INPUT_DIRECTORY}validations/ok", "ko": f"{INPUT_DIRECTORY}validations/ko"}
+OUTPUT_DIRECTORY = f"{INPUT_DIRECTORY}export"
+STATE_FILE = "_state.json"
+LYRICS_SUFFIX = "_lyrics"
+
+SCHEMA = pa.schema(
+    [
+        ("song_id", pa.int64()),
+        ("artist", pa.string()),
+        ("artist_url", pa.string()),
+        ("title", pa.string()),
+        ("url", pa.string()),
+        ("genres", pa.list_(pa.string())),
+        ("albums", pa.list_(pa.string())),
+        ("cleaned_text", pa.string()),
+        ("lyrics_text", pa.string()),
+        ("chords", pa.list_(pa.string())),
+        ("verdict", pa.string()),
+        ("path", pa.string()),  # Relative to the validation directory, e.g. songs/artist/song.txt
+        ("run", pa.string()),
+    ]
+)
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def relative_key(path: str) -> str:
+    """The songs/<artist>/<song>.txt part of any path of the pipeline."""
+    parts = Path(path).parts
+    return "/".join(parts[parts.index("songs") :]) if "songs" in parts else Path(path).name
+
+
+def load_catalog() -> dict:
+    """Catalog metadata of every song, by relative key."""
+    if not os.path.exists(CATALOG_FILE):
+        return {}
+    with open(CATALOG_FILE, encoding="utf-8") as file:
+        catalog = json.load(file)
+    songs = {}
+    for artist in catalog:
+        for song in artist["songs"]:
+            songs[relative_key(song["lyrics_path"])] = {
+                "song_id": song.get("id"),
+                "artist": artist["name"],
+                "artist_url": artist["url"],
+                "title": song["song_title"],
+                "url": song["song_url"],
+                "genres": artist.get("genres", []),
+                "albums": artist.get("albums", []),
+            }
+    return songs
+
+
+def partition_of(key: str) -> str:
+    """letter=<l>/artist_slug=<slug> of a song, from its artist directory."""
+    parts = key.split("/")
+    artist = parts[1] if len(parts) > 2 else "unknown"
+    letter = artist[:1].lower()
+    return f"letter={letter if 'a' <= letter <= 'z' else '_'}/artist_slug={artist}"
+
+
+def discover() -> dict:
+    """Every validated song, by relative key, with its verdict and modification time."""
+    found = {}
+    for verdict, directory in VALIDATIONS.items():
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if Path(name).stem.endswith(LYRICS_SUFFIX):
+                    continue
+                path = os.path.join(root, name).replace("\\", "/")
+                found[relative_key(path)] = {"verdict": verdict, "path": path, "mtime": os.path.getmtime(path)}
+    return found
+
+
+def read_text(path: str) -> str | None:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8", errors="ignore") as file:
+        return file.read()
+
+
+def build_row(key: str, song: dict, metadata: dict, transpose, run: str) -> dict:
+    """Builds the row of a song from its files and the catalog."""
+    validated = read_text(song["path"])
+    cleaned = read_text(f"{CLEANED_DIRECTORY}/{key}") or validated
+    lyrics_text = None
+    if song["verdict"] == "ok":
+        root, ext = os.path.splitext(song["path"])
+        lyrics_text = read_text(root + LYRICS_SUFFIX + ext)
+    chords = [chord for line in transpose.tokenize(cleaned) if isinstance(line, tuple) for _, chord in line]
+    parts = key.split("/")
+    return {
+        "song_id": metadata.get("song_id"),
+        "artist": metadata.get("artist", parts[1].replace("_", " ").title() if len(parts) > 2 else None),
+        "artist_url": metadata.get("artist_url"),
+        "title": metadata.get("title", Path(key).stem.replace("_", " ").title()),
+        "url": metadata.get("url"),
+        "genres": metadata.get("genres", []),
+        "albums": metadata.get("albums", []),
+        "cleaned_text": cleaned,
+        "lyrics_text": lyrics_text,
+        "chords": chords,
+        "verdict": song["verdict"],
+        "path": key,
+        "run": run,
+    }
+
+
+def read_partition(directory: Path) -> pa.Table | None:
+    """Reads every part file of a partition."""
+    tables = []
+    for part in sorted(directory.glob("part-*")):
+        if part.suffix == FORMATS["parquet"]:
+            tables.append(pq.read_table(part, schema=SCHEMA))
+        else:
+            tables.append(feather.read_table(part))
+    return pa.concat_tables(tables) if tables else None
+
+
+def write_partition(directory: Path, table: pa.Table, run: str, output_format: str):
+    """Replaces the part files of a partition by a single one."""
+    old_parts = list(directory.glob("part-*"))
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"part-{run}{FORMATS[output_format]}"
+    if len(table):
+        if output_format == "parquet":
+            pq.write_table(table, path)
+        else:
+            # Uncompressed Arrow IPC can be memory-mapped without copies
+            feather.write_feather(table, path, compression="uncompressed")
+    for part in old_parts:
+        if part != path:
+            part.unlink()
+
+
+def export_corpus(output_directory: str = OUTPUT_DIRECTORY, output_format: str = "parquet", full: bool = False) -> dict:
+    """Exports the songs added, changed or removed since the last export.
+    Args:
+        output_directory (str): Root of the partitioned dataset.
+        output_format (str): 'parquet' or 'arrow' (uncompressed IPC, memory-mappable).
+        full (bool): Rewrite every partition, ignoring the previous state.
+    Returns:
+        dict: Number of rows written and removed, and partitions rewritten.
+    """
+    stats = instrumentation.current()
+    transpose = load_module("tab_cleaner", "utils.transpose")
+    output = Path(output_directory)
+    state_path = output / STATE_FILE
+    run = time.strftime("%Y%m%d%H%M%S")
+
+    with stats.phase("discover"):
+        state = {} if full or not state_path.exists() else json.loads(state_path.read_text(encoding="utf-8"))
+        if state.get("format", output_format) != output_format:
+            full, state = True, {}  # A format change rewrites everything
+        exported = state.get("songs", {})
+        current = discover()
+        catalog = load_catalog()
+
+    changed = {
+        key: song
+        for key, song in current.items()
+        if exported.get(key, {}).get("mtime") != song["mtime"] or exported[key]["verdict"] != song["verdict"]
+    }
+    removed = [key for key in exported if key not in current]
+    if full:
+        for part in output.glob("letter=*/artist_slug=*/part-*"):
+            part.unlink()
+
+    rows = {}
+    progress = reporting.Progress("Export", total=len(changed))
+    for key, song in changed.items():
+        with stats.item("song"), stats.phase("transform"):
+            rows.setdefault(partition_of(key), []).append(build_row(key, song, catalog.get(key, {}), transpose, run))
+        progress.update()
+    progress.close()
+
+    partitions = set(rows) | {exported[key]["partition"] for key in removed}
+    for partition in sorted(partitions):
+        directory = output / partition
+        with stats.phase("write"):
+            new_rows = pa.Table.from_pylist(rows.get(partition, []), schema=SCHEMA)
+            existing = read_partition(directory)
+            if existing is not None:
+                # Rows of songs that changed or disappeared are replaced
+                replaced = pa.array([row["path"] for row in rows.get(partition, [])] + removed, pa.string())
+                keep = pc.invert(pc.is_in(existing["path"], value_set=replaced))
+                new_rows = pa.concat_tables([existing.filter(keep), new_rows])
+            write_partition(directory, new_rows, run, output_format)
+
+    for key in removed:
+        del exported[key]
+    for key, song in changed.items():
+        exported[key] = {"mtime": song["mtime"], "verdict": song["verdict"], "partition": partition_of(key)}
+    output.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps({"format": output_format, "songs": exported}), encoding="utf-8")
+
+    stats.count("rows_written", len(changed))
+    stats.count("rows_removed", len(removed))
+    stats.count("partitions_written", len(partitions))
+    log.info(f"Export: {len(changed)} songs written, {len(removed)} removed, {len(partitions)} partitions")
+    return {"written": len(changed), "removed": len(removed), "partitions": len(partitions)}
+
+
+@click.command()
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(list(FORMATS)),
+    default="parquet",
+    help="Parquet (compressed) or Arrow IPC (uncompressed, memory-mappable).",
+)
+@click.option("--output", "-o", default=OUTPUT_DIRECTORY, help="Directory of the partitioned dataset.")
+@click.option("--full", is_flag=True, default=False, help="Export every song again instead of only the changes.")
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Capture the run with cProfile and tracemalloc.",
+)
+@reporting.verbosity_options
+def main(output_format, output, full, profile, verbose, quiet):
+    reporting.setup("export.log", verbose, quiet)
+    print("Starting export...")
+    stats = instrumentation.start("export", profile=profile)
+    result = export_corpus(output, output_format, full)
+    stats.finish()
+    print(
+        f"Export finished: {result['written']} songs written, {result['removed']} removed, "
+        f"{result['partitions']} partitions in {output}."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 # lyrics.py
 import os
 import re
+import click
+import logging as log
+from common import blobs, instrumentation, reporting
 
 # Base directory containing the validated OK files
 INPUT_DIRECTORY = "./files/"
@@ -36,38 +39,80 @@ def remove_chords(text: str) -> str:
     return "\n".join(lyric_lines) + "\n"
 
 
-def main():
-    print("Starting lyrics processor...\n")
-
-    files = list_files_recursive(OK_DIRECTORY)
-    processed = 0
-
-    for file_path in files:
-        # Read original validated file
-        try:
+def extract_lyrics(file_path: str) -> str | None:
+    """Writes the lyrics of a validated tab next to it, as <name>_lyrics.<ext>.
+    Args:
+        file_path (str): The validated tab.
+    Returns:
+        str | None: The path of the lyrics file, None if it could not be read or written.
+    """
+    stats = instrumentation.current()
+    # Read original validated file
+    try:
+        with stats.phase("read"):
             with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
                 text = f.read()
-        except Exception as e:
-            print(f"[ERROR] Could not read {file_path}: {e}")
-            continue
+    except Exception as e:
+        log.error(f"Could not read {file_path}: {e}")
+        stats.count("read_errors")
+        return None
 
-        # Remove chords (simple heuristic)
+    # Remove chords (simple heuristic)
+    with stats.phase("transform", span="lyrics"):
         lyrics_only = remove_chords(text)
 
-        # Save the lyrics version next to the original file
-        root, ext = os.path.splitext(file_path)
-        output_path = root + "_lyrics" + ext
+    # Save the lyrics version next to the original file
+    root, ext = os.path.splitext(file_path)
+    output_path = root + "_lyrics" + ext
+
+    try:
+        with stats.phase("write"):
+            blobs.write_text(output_path, lyrics_only)
+    except Exception as e:
+        log.error(f"Could not write {output_path}: {e}")
+        stats.count("write_errors")
+        return None
+    stats.count("files_processed")
+    return output_path
+
+
+@click.command()
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Capture the run with cProfile and tracemalloc.",
+)
+@click.option(
+    "--trace",
+    is_flag=True,
+    default=False,
+    help="Record a per-song trace of the run in logs/traces (Chrome trace format).",
+)
+@reporting.verbosity_options
+def main(profile, trace, verbose, quiet):
+    reporting.setup("lyrics.log", verbose, quiet)
+    print("Starting lyrics processor...\n")
+    stats = instrumentation.start("lyrics", profile=profile, trace=trace)
+
+    with stats.phase("discover"):
+        files = list_files_recursive(OK_DIRECTORY)
+    processed = 0
+    progress = reporting.Progress("Lyrics", total=len(files))
 
-        try:
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(lyrics_only)
+    for file_path in files:
+        progress.update()
+        with stats.item("file", song=file_path):
+            output_path = extract_lyrics(file_path)
+            if output_path is None:
+                continue
             processed += 1
-            print(f"{processed} -- {output_path} CREATED")
-        except Exception as e:
-            print(f"[ERROR] Could not write {output_path}: {e}")
-            continue
+            with stats.phase("print"):
+                log.debug(f"{processed} -- {output_path} CREATED")
 
+    progress.close()
     print(f"\nLyrics processor finished. Total processed: {processed}")
+    stats.finish()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+""" Report of the run history written by every stage (logs/metrics/history.jsonl).
+Shows the last runs of every stage and, with --check, exits with an error if the
+throughput of the last run of a stage dropped compared with its previous runs,
+so a scheduled pipeline can alert on regressions:
+
+    python pipeline.py && python metrics.py --check
+"""
+
+import sys
+import click
+import statistics
+
+from common import exporter
+
+# --- Configuration ---
+MIN_DURATION = 1.0  # Shorter runs are too noisy to compare throughput
+
+
+def runs_by_stage(history: list[dict]) -> dict[str, list[dict]]:
+    stages = {}
+    for run in history:
+        stages.setdefault(run["stage"], []).append(run)
+    return stages
+
+
+def check_regressions(history: list[dict], window: int = 10, tolerance: float = 0.2) -> list[str]:
+    """Compares the last run of every stage with the median of its previous runs.
+    Args:
+        history (list[dict]): The runs, oldest first.
+        window (int): Previous runs used as reference.
+        tolerance (float): Allowed drop of throughput (0.2 = 20%).
+    Returns:
+        list[str]: A message per stage whose throughput dropped more than allowed.
+    """
+    regressions = []
+    for stage, runs in runs_by_stage(history).items():
+        rates = [
+            run["items_per_second"] for run in runs if run.get("items") and run["duration_seconds"] >= MIN_DURATION
+        ]
+        if len(rates) < 2:
+            continue
+        reference = statistics.median(rates[-window - 1 : -1])
+        if rates[-1] < reference * (1 - tolerance):
+            regressions.append(
+                f"{stage}: {rates[-1]:.1f} items/s, {1 - rates[-1] / reference:.0%} below the median of "
+                f"the previous runs ({reference:.1f} items/s)"
+            )
+    return regressions
+
+
+@click.command()
+@click.option("--last", "-n", default=5, help="Runs shown per stage.")
+@click.option("--check", is_flag=True, default=False, help="Exit with error if a stage got slower.")
+@click.option("--window", default=10, help="Previous runs used as reference by --check.")
+@click.option("--tolerance", default=0.2, help="Allowed throughput drop for --check (0.2 = 20%).")
+def main(last, check, window, tolerance):
+    history = exporter.load_history()
+    if not history:
+        print(f"No runs recorded in {exporter.HISTORY_FILE}")
+        return
+
+    for stage, runs in sorted(runs_by_stage(history).items()):
+        print(stage)
+        for run in runs[-last:]:
+            line = f"  {run['started_at']}  {run['duration_seconds']:8.2f}s"
+            if "items" in run:
+                line += f"  {run['items']:>7} items  {run['items_per_second']:9.1f}/s"
+            if "ok_ratio" in run:
+                line += f"  ok {run['ok_ratio']:.0%}"
+            if "success" in run:
+                line += "  ok" if run["success"] else f"  FAILED at {run['failed_stage']}"
+            print(line)
+
+    if check:
+        regressions = check_regressions(history, window, tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No throughput regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,77 @@
 import os
 import sys
+import click
 import logging as log
+import time
 import subprocess
+from common import exporter, reporting, tracing
+
+# Stage scripts are found next to this file, outputs go to the working directory
+SCRIPTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
 
 # --- Logging setup ---
-LOGS_DIRECTORY = "./logs/"
-os.makedirs(LOGS_DIRECTORY, exist_ok=True)
-
-PIPELINE_LOG = os.path.join(LOGS_DIRECTORY, "pipeline.log")
-
-log.basicConfig(
-    filename=PIPELINE_LOG,
-    filemode="w",
-    encoding="utf-8",
-    format="%(asctime)s %(levelname)s: %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    level=log.INFO,
-)
+# Configured in main() through common.reporting (queue-based, see -v/-q)
+PIPELINE_LOG = "pipeline.log"
+PIPELINE_LOG_FORMAT = "%(asctime)s %(levelname)s: %(message)s"
+
+# Wall time of every stage of this run, exported at the end
+durations = {}
 
-def run_script(script):
+
+def run_script(script, *args):
+    stage = script.split("/")[0].replace(".py", "")
+    start = time.perf_counter()
     try:
         log.info(f"Running {script}")
-        subprocess.run([sys.executable, script], check=True)
+        subprocess.run(
+            [sys.executable, os.path.join(SCRIPTS_DIRECTORY, script), *args], check=True
+        )
+        durations[stage] = time.perf_counter() - start
         log.info(f"SUCCESS: {script}")
     except Exception as e:
+        durations[stage] = time.perf_counter() - start
         log.error(f"FAILED: {script} | Error: {e}")
+        exporter.export_pipeline(durations, success=False, failed=stage)
         print(f"Pipeline failed executing {script}. Check pipeline.log")
         sys.exit(1)
 
-def main():
+@click.command()
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Capture every stage with cProfile and tracemalloc.",
+)
+@click.option(
+    "--trace",
+    is_flag=True,
+    default=False,
+    help="Record a per-song trace of every stage and merge them in logs/traces/timeline.json.",
+)
+@reporting.verbosity_options
+def main(profile, trace, verbose, quiet):
+    reporting.setup(PIPELINE_LOG, verbose, quiet, log_format=PIPELINE_LOG_FORMAT)
+    args = (["--profile"] if profile else []) + (["--trace"] if trace else [])
+    args += reporting.verbosity_args(verbose, quiet)
+    started = time.time()
 
-    run_script("scrapper/main.py")
-    run_script("tab_cleaner/main.py")
-    run_script("tab_validator/main.py")
-    run_script("results.py")
-    run_script("lyrics.py")
+    run_script("scrapper/main.py", *args)
+    run_script("tab_cleaner/main.py", *args)
+    run_script("tab_validator/main.py", *args)
+    run_script("results.py", *args)
+    run_script("lyrics.py", *args)
 
+    exporter.export_pipeline(durations, success=True)
+    if trace:
+        # The traces written by the stages of this run, in a single timeline
+        traces = [
+            os.path.join(tracing.TRACES_DIRECTORY, name)
+            for name in os.listdir(tracing.TRACES_DIRECTORY)
+            if os.path.getmtime(os.path.join(tracing.TRACES_DIRECTORY, name)) >= started
+        ]
+        timeline = os.path.join(tracing.TRACES_DIRECTORY, "timeline.json")
+        tracing.merge(sorted(traces, key=os.path.getmtime), timeline)
+        log.info(f"Timeline of the run saved to {timeline}")
     print("Pipeline finished successfully!")
     log.info("Pipeline finished successfully")
 
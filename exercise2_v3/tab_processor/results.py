@@ -1,4 +1,6 @@
 import os
+import click
+from common import blobs, instrumentation, reporting
 
 INPUT_DIRECTORY = "./files/"
 DOWNLOADED_DIRECTORY = f"{INPUT_DIRECTORY}songs"
@@ -16,17 +18,44 @@ def count_files(path):
     return total
 
 
-def main():
+@click.command()
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Capture the run with cProfile and tracemalloc.",
+)
+@click.option(
+    "--trace",
+    is_flag=True,
+    default=False,
+    help="Record a per-song trace of the run in logs/traces (Chrome trace format).",
+)
+@reporting.verbosity_options
+def main(profile, trace, verbose, quiet):
+    reporting.setup("results.log", verbose, quiet)
     print("RESULTS")
-    songs = count_files(DOWNLOADED_DIRECTORY)
-    cleaned = count_files(CLEANED_DIRECTORY)
-    ok = count_files(OUTPUT_DIRECTORY_OK)
-    ko = count_files(OUTPUT_DIRECTORY_KO)
+    stats = instrumentation.start("results", profile=profile, trace=trace)
+    with stats.phase("discover"):
+        songs = count_files(DOWNLOADED_DIRECTORY)
+        cleaned = count_files(CLEANED_DIRECTORY)
+        ok = count_files(OUTPUT_DIRECTORY_OK)
+        ko = count_files(OUTPUT_DIRECTORY_KO)
+        usage = blobs.store().usage()
+    stats.count("songs", songs)
+    stats.count("cleaned", cleaned)
+    stats.count("ok", ok)
+    stats.count("ko", ko)
 
     print(f"DOWNLOADED:{songs}")
     print(f"CLEANED:{cleaned}")
     print(f"VALIDATIONS/OK: {ok}")
     print(f"VALIDATIONS/KO: {ko}")
+    print(
+        f"BLOBS: {usage['blobs']} ({usage['stored_bytes'] / 1e6:.1f} MB stored for "
+        f"{usage['links']} outputs of {usage['logical_bytes'] / 1e6:.1f} MB)"
+    )
+    stats.finish()
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,18 @@
 import datetime
+import sys
 import click
 import logging as log
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
 import utils.files as files
 import utils.songs as songs
+import utils.shards as sharding
+import utils.catalog as catalogs
+import utils.archive as archive
 import os
+from common import instrumentation, reporting
 
 # -- Configuration ---
 OUTPUT_DIRECTORY = "./files/"
@@ -14,17 +23,9 @@ SONG_VERSION = None
 INDEX = "abcdefghijklmnopqrstuvwxyz"
 
 # --- Logging config---
+# Configured in main() through common.reporting (queue-based, see -v/-q)
 logger = log.getLogger(__name__)
 
-log.basicConfig(
-    filename=f"{LOGS_DIRECTORY}scrapper.log",
-    filemode="w",
-    encoding="utf-8",
-    format="%(asctime)s %(levelname)-8s %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    level=log.INFO,
-)
-
 
 # --- Logic --------------------
 @click.command()
@@ -42,19 +43,100 @@ log.basicConfig(
     default=False,
     help="Regenerates the catalog.",
 )
+@click.option(
+    "--refresh",
+    is_flag=True,
+    default=False,
+    help="Refresh the catalog, re-scraping only the artists whose page changed, and write the delta.",
+)
+@click.option(
+    "--delta",
+    is_flag=True,
+    default=False,
+    help="Only download the songs added by the last catalog refresh.",
+)
 @click.option(
     "--start_char", "-sc", default="a", help="Starting letter for updating the catalog."
 )
 @click.option(
     "--end_char", "-ec", default="z", help="Ending letter for updating the catalog."
 )
-def main(reset, update_catalog, start_char, end_char):
+@click.option(
+    "--shard-mode",
+    type=click.Choice(["letter", "hash"]),
+    default=None,
+    help="Sharded crawl: claim shards of the catalog from the work queue until it is empty.",
+)
+@click.option(
+    "--shards", default=8, help="Number of shards when sharding by hashed artist URL."
+)
+@click.option(
+    "--queue",
+    default=f"{OUTPUT_DIRECTORY}catalogs/work_queue.sqlite",
+    help="Work queue of the sharded crawl. Must be on storage shared by every worker.",
+)
+@click.option("--worker-id", default=None, help="Id of this worker (host-pid by default).")
+@click.option(
+    "--merge",
+    is_flag=True,
+    default=False,
+    help="Merge the manifests of every shard into catalogs/downloads.json.",
+)
+@click.option(
+    "--archive",
+    "archive_directory",
+    envvar="LACUERDA_ARCHIVE",
+    default=None,
+    help="Archive every raw response in this directory (or LACUERDA_ARCHIVE).",
+)
+@click.option(
+    "--replay",
+    is_flag=True,
+    default=False,
+    help="Read the pages from the archive instead of the network and parse every song again.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Capture the run with cProfile and tracemalloc.",
+)
+@click.option(
+    "--trace",
+    is_flag=True,
+    default=False,
+    help="Record a per-song trace of the run in logs/traces (Chrome trace format).",
+)
+@reporting.verbosity_options
+def main(
+    reset,
+    update_catalog,
+    refresh,
+    delta,
+    start_char,
+    end_char,
+    shard_mode,
+    shards,
+    queue,
+    worker_id,
+    merge,
+    archive_directory,
+    replay,
+    profile,
+    trace,
+    verbose,
+    quiet,
+):
     """Main function to run the scrapper. Can reset data, update catalog, or fetch songs."""
+    reporting.setup("scrapper.log", verbose, quiet)
+    if delta and (shard_mode or merge):
+        raise click.UsageError("--delta can't be used with --shard-mode or --merge.")
     print("Starting scrapper...")
 
     # Start time tracking
     start_time = datetime.datetime.now()
     log.info(f"Scrapper started at {start_time}")
+    stats = instrumentation.start("scrapper", profile=profile, trace=trace)
 
     # Reset data if required
     if reset:
@@ -74,12 +156,52 @@ def main(reset, update_catalog, start_char, end_char):
 
     #     return 200
 
+    if archive_directory:
+        songs.bs.ARCHIVE = archive.Archive(archive_directory)
+    if replay:
+        if songs.bs.ARCHIVE is None:
+            raise click.UsageError("--replay needs --archive (or LACUERDA_ARCHIVE).")
+        log.info(f"Replaying pages from the archive {archive_directory}")
+        songs.bs.REPLAY = True
+
+    if refresh:
+        log.info("Refreshing catalog...")
+        catalogs.refresh_catalog(OUTPUT_DIRECTORY, start_char=start_char, end_char=end_char)
+
     # Get songs lyrics
-    log.info(f"Starting to download lyrics...")
-    songs.get_songs(OUTPUT_DIRECTORY, version=SONG_VERSION)
+    if merge:
+        sharding.merge_shards(OUTPUT_DIRECTORY)
+    elif shard_mode:
+        log.info(f"Starting sharded download ({shard_mode})...")
+        sharding.run_worker(
+            OUTPUT_DIRECTORY,
+            queue,
+            mode=shard_mode,
+            shards=shards,
+            worker=worker_id,
+            start_char=start_char,
+            end_char=end_char,
+        )
+    else:
+        catalog_delta = None
+        if delta:
+            # Without a delta the download would silently be a full one
+            catalog_delta = catalogs.load_delta(OUTPUT_DIRECTORY)
+            if catalog_delta is None:
+                raise click.UsageError("--delta needs the delta of a previous --refresh (catalogs/delta.json).")
+        log.info(f"Starting to download lyrics...")
+        songs.get_songs(
+            OUTPUT_DIRECTORY,
+            version=SONG_VERSION,
+            start_char=start_char,
+            end_char=end_char,
+            delta=catalog_delta,
+            overwrite=replay,
+        )
 
     duration = datetime.datetime.now() - start_time
     log.info(f"Total duration: {duration}")
+    stats.finish()
     print(f"Scrapper finished. Duration in seconds: {duration.total_seconds()}.")
 
 
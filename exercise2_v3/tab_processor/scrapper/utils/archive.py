@@ -0,0 +1,107 @@
+""" Archive of the raw responses fetched by the scrapper.
+Every body is stored once, gzipped and named by its SHA-256 (content-addressed),
+and an append-only index (one JSON record per line, like the headers of a WARC
+record) maps every fetched URL to the digest of its body. With the archive, a
+change in the parsers can be applied to every page already fetched, at disk
+speed and without the network (replay mode). """
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+# --- Configuration ---
+BLOBS_DIRECTORY = "blobs"
+INDEX_FILE = "index.jsonl"
+
+
+class Archive:
+    """Content-addressed store of raw responses.
+
+    Attributes:
+        directory (Path): Root of the archive: `blobs/<2 hex>/<digest>.gz` and `index.jsonl`.
+        records (dict): Latest index record of every archived URL.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        (self.directory / BLOBS_DIRECTORY).mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.records = self._load_index()
+
+    def _load_index(self) -> dict:
+        records = {}
+        path = self.directory / INDEX_FILE
+        if path.exists():
+            with open(path, encoding="utf-8") as index:
+                for line in index:
+                    if line.strip():
+                        record = json.loads(line)
+                        records[record["url"]] = record  # The latest fetch wins
+        return records
+
+    def blob_path(self, digest: str) -> Path:
+        return self.directory / BLOBS_DIRECTORY / digest[:2] / f"{digest}.gz"
+
+    def put(self, url: str, body: bytes, status: int = 200, headers: dict = None, encoding: str = None) -> str:
+        """Archives a response. The body is only written if it is not archived yet.
+        Args:
+            url (str): The fetched URL.
+            body (bytes): The raw body of the response.
+            status (int): The HTTP status.
+            headers (dict, optional): Response headers (ETag and Content-Type are kept).
+            encoding (str, optional): Encoding used to decode the body.
+        Returns:
+            str: The SHA-256 digest of the body.
+        """
+        headers = headers or {}
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            temporary = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with gzip.open(temporary, "wb") as blob:
+                blob.write(body)
+            os.replace(temporary, path)  # Atomic: readers never see half a blob
+
+        record = {
+            "url": url,
+            "digest": digest,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "status": status,
+            "length": len(body),
+            "content_type": headers.get("Content-Type"),
+            "etag": headers.get("ETag"),
+            "encoding": encoding,
+        }
+        with self._lock:
+            # One write per record in append mode, so processes sharing the archive do not mix lines
+            with open(self.directory / INDEX_FILE, "a", encoding="utf-8") as index:
+                index.write(json.dumps(record) + "\n")
+            self.records[url] = record
+        return digest
+
+    def record(self, url: str) -> dict | None:
+        """The latest index record of a URL, None if it was never archived."""
+        return self.records.get(url)
+
+    def get(self, url: str) -> str | None:
+        """Returns the archived page of a URL as text, None if it is not archived."""
+        record = self.records.get(url)
+        if record is None:
+            return None
+        with gzip.open(self.blob_path(record["digest"]), "rb") as blob:
+            return blob.read().decode(record.get("encoding") or "utf-8", errors="replace")
+
+    def urls(self, prefix: str = "") -> list[str]:
+        """Archived URLs starting with a prefix."""
+        return [url for url in self.records if url.startswith(prefix)]
+
+
+def open_from_env() -> Archive | None:
+    """Opens the archive set in the LACUERDA_ARCHIVE environment variable, if any."""
+    directory = os.environ.get("LACUERDA_ARCHIVE")
+    return Archive(directory) if directory else None
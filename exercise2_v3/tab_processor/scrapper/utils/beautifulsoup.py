@@ -1,19 +1,120 @@
-import requests
+import os
 import logging as log
-from bs4 import BeautifulSoup
+import utils.crawler as crawler
+import utils.archive as archive
+from typing import NamedTuple, TYPE_CHECKING
+from common import instrumentation
 
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
-def get_soup(url) -> BeautifulSoup | None:
-    """Fetches a URL and returns a BeautifulSoup object.
+# --- Configuration ---
+# Shared by every request so the concurrency follows what the site can handle
+CONTROLLER = crawler.AdaptiveController(
+    max_concurrency=int(os.environ.get("LACUERDA_MAX_CONCURRENCY", 8))
+)
+# Raw responses are archived when set (see utils.archive)
+ARCHIVE = archive.open_from_env()
+# Replay mode: pages are read from the archive, the network is never used
+REPLAY = False
+
+
+def _archive(url, response):
+    if ARCHIVE is not None:
+        ARCHIVE.put(url, response.content, response.status_code, response.headers, response.encoding)
+
+
+def _replay(url) -> str | None:
+    stats = instrumentation.current()
+    with stats.phase("read"):
+        page = ARCHIVE.get(url) if ARCHIVE is not None else None
+    if page is None:
+        log.error(f"{url} is not in the archive")
+        stats.count("replay_misses")
+        return None
+    stats.count("replayed")
+    return page
+
+
+def get_html(url) -> str | None:
+    """Fetches a URL and returns its HTML as text.
+    Transient failures are retried and throttled by the adaptive controller.
     Args:
         url (str): The URL to fetch.
     Returns:
-        BeautifulSoup | None: A BeautifulSoup object if the request is successful, None otherwise.
+        str | None: The text of the page if the request is successful, None otherwise.
+    """
+    if REPLAY:
+        return _replay(url)
+    import requests
+
+    stats = instrumentation.current()
+    try:
+        response = crawler.fetch(url, CONTROLLER)
+        stats.count("requests")
+        stats.count("bytes_downloaded", len(response.content))
+        _archive(url, response)
+        return response.text
+    except (requests.exceptions.RequestException, crawler.CircuitOpenError) as e:
+        log.error(f"Error fetching {url}: {e}")
+        stats.count("request_errors")
+        return None
+
+
+class Page(NamedTuple):
+    """Result of a conditional request."""
+
+    text: str | None  # None when the page was not modified
+    etag: str | None
+    modified: bool
+
+
+def get_page(url, etag: str = None) -> Page | None:
+    """Fetches a URL with If-None-Match, so unchanged pages are not downloaded again.
+    Args:
+        url (str): The URL to fetch.
+        etag (str, optional): The ETag of the copy we already have.
+    Returns:
+        Page | None: The page (without text if not modified), None if the request failed.
     """
+    if REPLAY:
+        record = ARCHIVE.record(url) if ARCHIVE is not None else None
+        if record is not None and etag and record["etag"] == etag:
+            return Page(text=None, etag=etag, modified=False)
+        page = _replay(url)
+        return None if page is None else Page(text=page, etag=record["etag"], modified=True)
+
+    import requests
+
+    stats = instrumentation.current()
+    headers = {"If-None-Match": etag} if etag else None
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-        return BeautifulSoup(response.text, "html.parser")
-    except requests.exceptions.RequestException as e:
+        response = crawler.fetch(url, CONTROLLER, headers=headers)
+    except (requests.exceptions.RequestException, crawler.CircuitOpenError) as e:
         log.error(f"Error fetching {url}: {e}")
+        stats.count("request_errors")
+        return None
+    stats.count("requests")
+    if response.status_code == 304:
+        stats.count("not_modified")
+        return Page(text=None, etag=etag, modified=False)
+    stats.count("bytes_downloaded", len(response.content))
+    _archive(url, response)
+    return Page(text=response.text, etag=response.headers.get("ETag"), modified=True)
+
+
+def get_soup(url) -> "BeautifulSoup | None":
+    """Fetches a URL and returns a BeautifulSoup object.
+    Prefer get_html and the functions of utils.parsers when only a few elements are needed.
+    Args:
+        url (str): The URL to fetch.
+    Returns:
+        BeautifulSoup | None: A BeautifulSoup object if the request is successful, None otherwise.
+    """
+    from bs4 import BeautifulSoup  # Only the pages that need a full soup pay for the import
+
+    page = get_html(url)
+    if page is None:
         return None
+    with instrumentation.current().phase("parse"):
+        return BeautifulSoup(page, "html.parser")
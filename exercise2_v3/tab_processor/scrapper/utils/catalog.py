@@ -0,0 +1,170 @@
+""" Incremental catalog refresh.
+Instead of rebuilding the whole catalog, every artist page is requested with the
+ETag of the previous run (If-None-Match) and fingerprinted with a hash of its
+song links. Only artists whose page changed are re-scraped, and the songs added
+or removed since the last run are written as a delta that `get_songs` can
+download on its own. """
+
+import json
+import time
+import hashlib
+import logging as log
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import utils.songs as songs
+import utils.files as files
+import utils.parsers as parsers
+from common import instrumentation
+
+# --- Configuration ---
+FINGERPRINTS_FILE = "fingerprints.json"
+DELTA_FILE = "delta.json"
+
+
+def fingerprint(links: list[str]) -> str:
+    """Hash of the song links of an artist page, in page order."""
+    return hashlib.sha1("\n".join(links).encode("utf-8")).hexdigest()
+
+
+def load_fingerprints(output_directory: str) -> dict:
+    """ETag and fingerprint of every artist page, by artist URL."""
+    path = Path(f"{output_directory}catalogs/{FINGERPRINTS_FILE}")
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def load_delta(output_directory: str) -> dict | None:
+    """Loads the delta written by the last refresh, None if there is none."""
+    return files.load_from_json(Path(f"{output_directory}catalogs/{DELTA_FILE}"))
+
+
+def _next_ids(catalog: list[dict]):
+    """Moves the id counters past the ids already in the catalog."""
+    artist_ids = [artist.get("id", 0) for artist in catalog]
+    song_ids = [song.get("id", 0) for artist in catalog for song in artist["songs"]]
+    songs.Artist.reset_id_counter(max(artist_ids, default=0) + 1)
+    songs.Song.reset_id_counter(max(song_ids, default=0) + 1)
+
+
+def _in_range(artist: dict, start_char: str, end_char: str) -> bool:
+    letter = songs.artist_letter(artist)
+    return start_char <= letter <= end_char
+
+
+def refresh_catalog(output_directory: str, start_char: str = "a", end_char: str = "z") -> dict:
+    """Updates the saved catalog, re-scraping only the artists whose page changed.
+    Args:
+        output_directory (str): The base directory of the scrapper files.
+        start_char (str): The starting letter of the artists to refresh.
+        end_char (str): The ending letter of the artists to refresh.
+    Returns:
+        dict: The delta: new, changed and removed artists, and added and removed songs.
+    """
+    stats = instrumentation.current()
+    start_char, end_char = start_char.lower(), end_char.lower()
+
+    with stats.phase("discover"):
+        catalog = songs.load_catalog(output_directory)
+        fingerprints = load_fingerprints(output_directory)
+    by_url = {artist["url"]: artist for artist in catalog}
+    _next_ids(catalog)
+
+    index = songs.get_artist_urls(start_char, end_char)
+
+    # Conditional requests in parallel: unchanged pages answer 304 without a body
+    def request(artist):
+        name, url = artist
+        etag = fingerprints.get(url, {}).get("etag") if url in by_url else None
+        return songs.bs.get_page(url, etag)
+
+    with ThreadPoolExecutor(max_workers=songs.bs.CONTROLLER.max_concurrency) as executor:
+        pages = list(executor.map(request, index))
+
+    delta = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "start_char": start_char,
+        "end_char": end_char,
+        "new_artists": [],
+        "changed_artists": [],
+        "removed_artists": [],
+        "added_songs": [],
+        "removed_songs": [],
+    }
+    unchanged = 0
+    for (name, url), page in zip(index, pages):
+        stored = by_url.get(url)
+        if page is None:
+            continue  # Kept as it was, it will be checked again next time
+        if not page.modified:
+            unchanged += 1
+            continue
+
+        with stats.phase("parse"):
+            links = parsers.extract_song_links(page.text)
+        digest = fingerprint(links)
+        previous = fingerprints.get(url, {}).get("fingerprint")
+        fingerprints[url] = {"etag": page.etag, "fingerprint": digest}
+        if stored is not None and previous == digest:
+            unchanged += 1
+            continue
+
+        current = [song.to_dict() for song in songs.build_songs(name, url, links, output_directory)]
+        if stored is None:
+            log.info(f"New artist: {name} ({url})")
+            stored = songs.Artist(name=name, url=url).to_dict()
+            stored["songs"] = current
+            catalog.append(stored)
+            delta["new_artists"].append(url)
+            delta["added_songs"].extend(current)
+            continue
+
+        old = {song["song_url"]: song for song in stored["songs"]}
+        new_urls = {song["song_url"] for song in current}
+        added = [song for song in current if song["song_url"] not in old]
+        removed = [song_url for song_url in old if song_url not in new_urls]
+        if not added and not removed:
+            unchanged += 1
+            continue
+        log.info(f"Changed artist: {name}, {len(added)} songs added, {len(removed)} removed")
+        # Songs already known keep their id and path
+        stored["songs"] = [old.get(song["song_url"], song) for song in current]
+        delta["changed_artists"].append(url)
+        delta["added_songs"].extend(added)
+        delta["removed_songs"].extend(removed)
+
+    # Artists no longer in the index. Letters whose index could not be read are left alone.
+    index_urls = {url for _, url in index}
+    index_letters = {songs.artist_letter({"name": name}) for name, _ in index}
+    for artist in list(catalog):
+        if (
+            artist["url"] not in index_urls
+            and _in_range(artist, start_char, end_char)
+            and songs.artist_letter(artist) in index_letters
+        ):
+            log.info(f"Removed artist: {artist['name']} ({artist['url']})")
+            catalog.remove(artist)
+            fingerprints.pop(artist["url"], None)
+            delta["removed_artists"].append(artist["url"])
+            delta["removed_songs"].extend(song["song_url"] for song in artist["songs"])
+
+    stats.count("artists_unchanged", unchanged)
+    stats.count("artists_changed", len(delta["new_artists"]) + len(delta["changed_artists"]))
+    with stats.phase("write"):
+        save_refresh(output_directory, catalog, fingerprints, delta)
+    log.info(
+        f"Catalog refreshed: {unchanged} artists unchanged, {len(delta['new_artists'])} new, "
+        f"{len(delta['changed_artists'])} changed, {len(delta['removed_artists'])} removed, "
+        f"{len(delta['added_songs'])} songs added"
+    )
+    return delta
+
+
+def save_refresh(output_directory: str, catalog: list[dict], fingerprints: dict, delta: dict):
+    """Saves the catalog, the fingerprints and the delta (also kept under catalogs/deltas)."""
+    directory = f"{output_directory}catalogs"
+    files.save_to_json(catalog, directory, "catalog.json")
+    Path(directory, FINGERPRINTS_FILE).write_text(json.dumps(fingerprints), encoding="utf-8")
+    files.save_to_json(delta, directory, DELTA_FILE)
+    files.save_to_json(delta, f"{directory}/deltas", f"{delta['created_at'].replace(':', '')}.json")
@@ -0,0 +1,262 @@
+""" Adaptive request controller for the scrapper.
+Instead of a fixed sleep between requests, the number of requests in flight is
+adjusted to what the site can handle (AIMD): it grows by one while latencies and
+errors stay healthy and is halved when the site answers 429/5xx or times out, at
+most once per round trip: failures of requests sent before the last decrease were
+caused by the old limit and do not decrease it again.
+Transient failures are retried with jittered exponential backoff, `Retry-After`
+is honoured, and every host has a circuit breaker that stops sending requests
+for a while after repeated failures. """
+
+import time
+import random
+import threading
+import logging as log
+import email.utils
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+from urllib.parse import urlparse
+
+from common import instrumentation
+
+if TYPE_CHECKING:
+    import requests
+
+# --- Configuration ---
+TIMEOUT = 10
+RETRIES = 4
+BACKOFF_BASE = 0.5  # Seconds, doubled on every attempt
+BACKOFF_MAX = 30.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a host is not being contacted because its circuit is open."""
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker.
+    After `threshold` consecutive failures the circuit opens and requests fail
+    fast for `reset_timeout` seconds. Then a single trial request is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Checks if a request can be sent now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout and not self._trial:
+                self._trial = True  # Half-open: one request goes through
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    log.warning("Circuit opened after %d consecutive failures", self.failures)
+                self.opened_at = time.monotonic()
+
+
+class AdaptiveController:
+    """Additive-increase / multiplicative-decrease limit of concurrent requests.
+
+    Attributes:
+        limit (int): Current number of requests allowed in flight.
+        min_concurrency (int): Lower bound of the limit.
+        max_concurrency (int): Upper bound of the limit (also the size of the worker pool).
+        target_latency (float): Latency (seconds) considered healthy.
+        window (int): Successful requests needed before growing the limit.
+    """
+
+    def __init__(
+        self,
+        min_concurrency: int = 1,
+        max_concurrency: int = 8,
+        initial: int = 1,
+        target_latency: float = 2.0,
+        window: int = 10,
+        decrease_factor: float = 0.5,
+    ):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = max(min_concurrency, min(initial, max_concurrency))
+        self.target_latency = target_latency
+        self.window = window
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.issued = 0  # Requests sent so far; each one keeps its number as a ticket
+        self.decreased_at = 0  # Requests sent when the limit was last decreased
+        self.paused_until = 0.0
+        self.circuits = {}
+        self._healthy = []
+        self._condition = threading.Condition()
+
+    # --- Slots ---
+    @contextmanager
+    def slot(self):
+        """Waits for a free slot (and for any Retry-After pause) and holds it.
+        Yields the ticket of the request, to pass to success() and throttled()."""
+        with self._condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause <= 0 and self.in_flight < self.limit:
+                    break
+                self._condition.wait(timeout=pause if pause > 0 else None)
+            self.in_flight += 1
+            self.issued += 1
+            ticket = self.issued
+        try:
+            yield ticket
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def circuit(self, url: str) -> CircuitBreaker:
+        """Returns the circuit breaker of the host of a URL."""
+        host = urlparse(url).netloc
+        with self._condition:
+            return self.circuits.setdefault(host, CircuitBreaker())
+
+    # --- Feedback ---
+    def success(self, latency: float, ticket: int | None = None):
+        """Records a successful request. Grows the limit after a healthy window."""
+        with self._condition:
+            if latency > 2 * self.target_latency:
+                self._decrease("slow response", ticket)
+                return
+            self._healthy.append(latency)
+            if len(self._healthy) >= self.window:
+                average = sum(self._healthy) / len(self._healthy)
+                self._healthy.clear()
+                if average <= self.target_latency and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    instrumentation.current().count("concurrency_increases")
+                    log.info("Concurrency increased to %d", self.limit)
+                    self._condition.notify_all()
+
+    def throttled(self, reason: str, retry_after: float = 0.0, ticket: int | None = None):
+        """Records a 429/5xx/timeout. Halves the limit and pauses if the server asked to."""
+        with self._condition:
+            self._decrease(reason, ticket)
+            if retry_after > 0:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def _decrease(self, reason: str, ticket: int | None = None):
+        # A request sent before the last decrease reports on the old limit: the site has
+        # not seen the new one yet, so it does not decrease again (once per round trip)
+        if ticket is not None and ticket <= self.decreased_at:
+            return
+        self.decreased_at = self.issued
+        self._healthy.clear()
+        new_limit = max(self.min_concurrency, int(self.limit * self.decrease_factor))
+        if new_limit < self.limit:
+            log.info("Concurrency decreased to %d (%s)", new_limit, reason)
+            instrumentation.current().count("concurrency_decreases")
+        self.limit = new_limit
+
+
+def parse_retry_after(value: str | None) -> float:
+    """Parses a Retry-After header (seconds or HTTP date) into seconds."""
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+        return max(0.0, date.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def backoff(attempt: int, retry_after: float = 0.0) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+    return max(delay, retry_after)
+
+
+def fetch(
+    url: str, controller: AdaptiveController, retries: int = RETRIES, headers: dict = None
+) -> "requests.Response":
+    """Fetches a URL under the control of the adaptive controller.
+    Args:
+        url (str): The URL to fetch.
+        controller (AdaptiveController): The controller shared by every request.
+        retries (int): Retries for transient failures (429, 5xx, timeouts, connection errors).
+        headers (dict, optional): Extra request headers (e.g. If-None-Match).
+    Returns:
+        requests.Response: The successful response (304 included for conditional requests).
+    Raises:
+        CircuitOpenError: If the circuit of the host is open.
+        requests.exceptions.RequestException: If the request fails for good.
+    """
+    import requests  # Imported on the first request, runs without network do not pay for it
+
+    stats = instrumentation.current()
+    circuit = controller.circuit(url)
+
+    for attempt in range(retries + 1):
+        if not circuit.allow():
+            stats.count("circuit_open")
+            raise CircuitOpenError(f"Circuit open for {urlparse(url).netloc}")
+
+        retry_after = 0.0
+        error = None
+        with controller.slot() as ticket:
+            start = time.monotonic()
+            try:
+                with stats.phase("network", span="fetch"):
+                    response = requests.get(url, timeout=TIMEOUT, headers=headers)
+                stats.count(f"http_{response.status_code}")
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                response = None
+                error = e
+                stats.count("http_timeout" if isinstance(e, requests.exceptions.Timeout) else "http_connection_error")
+            latency = time.monotonic() - start
+
+        if response is not None and response.status_code not in RETRY_STATUS:
+            if response.ok:
+                circuit.success()
+                controller.success(latency, ticket)
+            else:
+                circuit.success()  # The host answered, it is not unhealthy
+            response.raise_for_status()  # 4xx other than 429 are not retried
+            return response
+
+        # Transient failure: back off and retry
+        circuit.failure()
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            error = requests.exceptions.HTTPError(f"{response.status_code} for {url}", response=response)
+            controller.throttled(f"HTTP {response.status_code}", retry_after, ticket)
+        else:
+            controller.throttled(type(error).__name__, ticket=ticket)
+
+        if attempt == retries:
+            break
+        stats.count("retries")
+        delay = backoff(attempt, retry_after)
+        log.info(f"Retrying {url} in {delay:.2f}s (attempt {attempt + 1}/{retries}): {error}")
+        time.sleep(delay)
+
+    raise error
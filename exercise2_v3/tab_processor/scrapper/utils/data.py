@@ -1,12 +1,20 @@
-import musicbrainzngs
 import utils.files as files
 from dataclasses import dataclass, asdict, field
+from functools import cache
 from pathlib import Path
 
 # --- Config ---
+USER_AGENT = ("MyMusicApp", "1.0", "myemail@example.com")
 
-# Initialize MusicBrainz client
-musicbrainzngs.set_useragent("MyMusicApp", "1.0", "myemail@example.com")
+
+@cache
+def musicbrainz():
+    """Imports and initializes the MusicBrainz client the first time it is needed.
+    Only the catalog update asks MusicBrainz for metadata, the other runs do not pay for the import."""
+    import musicbrainzngs
+
+    musicbrainzngs.set_useragent(*USER_AGENT)
+    return musicbrainzngs
 
 
 # --- Data Structures ---
@@ -116,6 +124,7 @@ class Artist:
     def fetch_metadata(self):
         """Fetch artist metadata like tags (genres), albums, and description."""
         try:
+            musicbrainzngs = musicbrainz()
             results = musicbrainzngs.search_artists(artist=self.name, limit=1)
             if results["artist-list"]:
                 artist_data = results["artist-list"][0]
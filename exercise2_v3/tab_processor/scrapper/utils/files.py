@@ -3,7 +3,7 @@ import sys
 import logging as log
 import json
 from pathlib import Path
-from attrs import asdict
+from dataclasses import asdict
 from typing import Any
 
 
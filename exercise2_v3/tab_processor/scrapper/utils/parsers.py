@@ -0,0 +1,98 @@
+""" Targeted extraction of the few elements the scrapper needs.
+Building a full BeautifulSoup tree for every page is the most expensive part of
+parsing, and only the `<pre>` of song pages and the `li > a` links of artist
+pages are used. These functions find those elements directly in the HTML text
+and return plain text / hrefs without building or re-serializing any tree. """
+
+import re
+import html
+from html.parser import HTMLParser
+
+# --- Patterns ---
+PRE_PATTERN = re.compile(r"<pre\b[^>]*>(.*?)</pre\s*>", re.DOTALL | re.IGNORECASE)
+TAG_PATTERN = re.compile(r"<[^>]*>")
+
+# Tags without closing tag, they do not open a level inside a <li>
+VOID_TAGS = {"br", "img", "hr", "input", "meta", "link", "wbr", "source", "col", "area", "base"}
+
+
+def extract_pre_text(page: str) -> str:
+    """Returns the text of the first non-empty <pre> of a page.
+    Args:
+        page (str): The HTML of the page.
+    Returns:
+        str: The text without tags and with entities decoded, or "" if there is no <pre>.
+    """
+    for match in PRE_PATTERN.finditer(page):
+        text = html.unescape(TAG_PATTERN.sub("", match.group(1))).strip()
+        if text:
+            return text
+    return ""
+
+
+class _LinkParser(HTMLParser):
+    """Streaming parser that collects the href of the <a> tags inside <li> tags.
+
+    With `first_list_only`, only the <li> of the first <ul> are used and the
+    first <a> of every <li> is taken (artist index). Otherwise every <a> that
+    is a direct child of a <li> is taken (same as the `li > a` selector).
+    """
+
+    def __init__(self, first_list_only: bool = False):
+        super().__init__(convert_charrefs=True)
+        self.first_list_only = first_list_only
+        self.links = []
+        self._lists = 0  # Open <ul> tags
+        self._list_done = False
+        self._in_li = False
+        self._depth = 0  # Open tags since the current <li>
+        self._li_has_link = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "ul":
+            self._lists += 1
+        elif tag == "li":
+            self._in_li = True
+            self._depth = 0
+            self._li_has_link = False
+            return
+        if not self._in_li:
+            return
+        if tag == "a" and self._wanted():
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+                self._li_has_link = True
+        if tag not in VOID_TAGS:
+            self._depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == "ul":
+            self._lists = max(0, self._lists - 1)
+            if self.first_list_only and self._lists == 0:
+                self._list_done = True
+        elif tag == "li":
+            self._in_li = False
+        elif self._in_li and tag not in VOID_TAGS:
+            self._depth = max(0, self._depth - 1)
+
+    def _wanted(self) -> bool:
+        if self.first_list_only:
+            return self._lists > 0 and not self._list_done and not self._li_has_link
+        return self._depth == 0
+
+
+def extract_artist_links(page: str) -> list[str]:
+    """Returns the href of the first <a> of every <li> of the first <ul> (artist index)."""
+    parser = _LinkParser(first_list_only=True)
+    parser.feed(page)
+    parser.close()
+    return parser.links
+
+
+def extract_song_links(page: str) -> list[str]:
+    """Returns the href of every <a> that is a direct child of a <li> (artist page)."""
+    parser = _LinkParser()
+    parser.feed(page)
+    parser.close()
+    return parser.links
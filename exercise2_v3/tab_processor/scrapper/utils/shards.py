@@ -0,0 +1,284 @@
+""" Sharded crawl: several scrapper processes (or hosts) share the download.
+The catalog is split into shards, by first letter of the artist or by a hash of
+the artist URL. Workers claim shards from a SQLite work queue stored on shared
+storage, download the songs of the claimed shard and write a manifest per shard.
+Every song URL is reserved in the queue before downloading it, so two workers never
+download the same song. Reservations belong to the shard lease: when a shard is taken
+over from a dead worker, its reservations pass to the new worker, which downloads
+the songs left unfinished and lists in its manifest the ones already on disk. A shard
+with songs that failed, or with artists out of the letter range of the run, stays
+claimable, so a later run downloads them.
+`merge_shards` combines the manifests into a single one. """
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import hashlib
+import threading
+import logging as log
+from pathlib import Path
+
+import utils.files as files
+import utils.songs as songs
+from common import instrumentation
+
+# --- Configuration ---
+LETTERS = "abcdefghijklmnopqrstuvwxyz#"
+LEASE_SECONDS = 3600  # A claimed shard not finished after this is given to another worker
+LOCK_TIMEOUT = 60
+
+
+def default_worker_id() -> str:
+    """Host name and process id, unique across hosts sharing the queue."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def shard_ids(mode: str, shards: int = 8) -> list[str]:
+    """Returns every shard id of a sharding mode ('letter' or 'hash')."""
+    if mode == "letter":
+        return list(LETTERS)
+    return [f"h{number:03d}" for number in range(shards)]
+
+
+def shard_of(artist: dict, mode: str, shards: int = 8) -> str:
+    """Returns the shard of an artist of the catalog."""
+    if mode == "letter":
+        return songs.artist_letter(artist)
+    digest = hashlib.sha1(artist["url"].encode("utf-8")).hexdigest()
+    return f"h{int(digest, 16) % shards:03d}"
+
+
+class WorkQueue:
+    """SQLite-backed queue of shards, safe to share between processes and hosts
+    (as long as the shared file system supports file locks)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # The download threads of a worker share the connection, one at a time
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=LOCK_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS shards ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL DEFAULT 'pending',"
+            " worker TEXT, claimed_at REAL, finished_at REAL, songs INTEGER)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS downloads ("
+            " url TEXT PRIMARY KEY, shard TEXT, worker TEXT, reserved_at REAL)"
+        )
+
+    def _transaction(self, statements):
+        """Runs statements in an exclusive (IMMEDIATE) transaction."""
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(cursor)
+                cursor.execute("COMMIT")
+                return result
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def add_shards(self, ids: list[str]):
+        """Adds the shards to the queue. Existing shards are left untouched."""
+        self._transaction(
+            lambda cursor: cursor.executemany(
+                "INSERT OR IGNORE INTO shards (id) VALUES (?)", [(shard,) for shard in ids]
+            )
+        )
+
+    def claim(self, worker: str, skip: set[str] = frozenset()) -> str | None:
+        """Claims the next pending shard, one with failed songs or one whose lease expired.
+        The reservations of the shard pass to the worker that claims it.
+        Args:
+            worker (str): Id of the worker.
+            skip (set[str]): Shards not to claim (the ones this worker already tried).
+        """
+
+        def claim_next(cursor):
+            now = time.time()
+            rows = cursor.execute(
+                "SELECT id FROM shards WHERE status IN ('pending', 'partial')"
+                " OR (status = 'claimed' AND claimed_at < ?) ORDER BY status = 'partial', id",
+                (now - LEASE_SECONDS,),
+            )
+            shard = next((row[0] for row in rows if row[0] not in skip), None)
+            if shard is None:
+                return None
+            cursor.execute(
+                "UPDATE shards SET status = 'claimed', worker = ?, claimed_at = ? WHERE id = ?",
+                (worker, now, shard),
+            )
+            cursor.execute("UPDATE downloads SET worker = ? WHERE shard = ?", (worker, shard))
+            return shard
+
+        return self._transaction(claim_next)
+
+    def finish(self, shard: str, downloaded: int, complete: bool = True):
+        """Marks a shard as done, or as partial when some songs failed (it can be claimed again)."""
+        self._transaction(
+            lambda cursor: cursor.execute(
+                "UPDATE shards SET status = ?, finished_at = ?, songs = ? WHERE id = ?",
+                ("done" if complete else "partial", time.time(), downloaded, shard),
+            )
+        )
+
+    def reserve(self, url: str, shard: str, worker: str) -> bool:
+        """Reserves a song URL. Returns False if another worker already has it."""
+        with self._lock:
+            # Already reserved by this worker (e.g. passed to it with the shard) counts as reserved
+            cursor = self.connection.execute(
+                "INSERT INTO downloads (url, shard, worker, reserved_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (url) DO UPDATE SET reserved_at = excluded.reserved_at"
+                " WHERE downloads.worker = excluded.worker",
+                (url, shard, worker, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, url: str):
+        """Frees the reservation of a song that could not be downloaded."""
+        with self._lock:
+            self.connection.execute("DELETE FROM downloads WHERE url = ?", (url,))
+
+    def status(self) -> dict:
+        """Number of shards per status."""
+        with self._lock:
+            rows = self.connection.execute("SELECT status, COUNT(*) FROM shards GROUP BY status")
+            return dict(rows.fetchall())
+
+
+def run_worker(
+    output_directory: str,
+    queue_path: str,
+    mode: str = "letter",
+    shards: int = 8,
+    worker: str = None,
+    start_char: str = "a",
+    end_char: str = "z",
+) -> int:
+    """Claims and downloads shards until the queue is empty.
+    Args:
+        output_directory (str): The base directory of the scrapper files.
+        queue_path (str): Path of the SQLite queue, on storage shared by every worker.
+        mode (str): 'letter' or 'hash'.
+        shards (int): Number of shards in 'hash' mode.
+        worker (str): Id of this worker. Defaults to host-pid.
+        start_char (str): First letter of the artists to download.
+        end_char (str): Last letter of the artists to download.
+    Returns:
+        int: Number of songs downloaded by this worker.
+    """
+    worker = worker or default_worker_id()
+    stats = instrumentation.current()
+    queue = WorkQueue(queue_path)
+    ids = shard_ids(mode, shards)
+    if mode == "letter":
+        # Only the letters of the range: the others are left for the runs that download them
+        ids = [letter for letter in ids if songs.letter_in_range(letter, start_char, end_char)]
+    queue.add_shards(ids)
+
+    with stats.phase("discover"):
+        catalog = songs.load_catalog(output_directory)
+    by_shard = {}
+    for artist in catalog:
+        by_shard.setdefault(shard_of(artist, mode, shards), []).append(artist)
+
+    total = 0
+    # Shards out of the range are not claimed, and a shard left partial is retried by a later
+    # run, not again by this one
+    skip = set(shard_ids(mode, shards)) - set(ids)
+    while (shard := queue.claim(worker, skip=skip)) is not None:
+        skip.add(shard)
+        log.info(f"Worker {worker} claimed shard {shard}")
+        shard_artists = by_shard.get(shard, [])
+        shard_songs = songs.select_songs(shard_artists, start_char, end_char)
+        # In hash mode a shard can have artists out of the range of this run
+        selected_urls = {song["song_url"] for song in shard_songs}
+        out_of_range = [song for artist in shard_artists for song in artist["songs"] if song["song_url"] not in selected_urls]
+        reserved = set()
+
+        def reserve(song):
+            if queue.reserve(song["song_url"], shard, worker):
+                reserved.add(song["song_url"])
+                return True
+            return False
+
+        downloaded = songs.download_songs(shard_songs, reserve=reserve)
+
+        # Songs already on disk (e.g. written by the worker that had the shard before) are listed
+        # in the manifest too; the ones that failed are released so a later run can download them
+        downloaded_urls = {song["song_url"] for song in downloaded}
+        manifest, failed = [], 0
+        for song in shard_songs:
+            url = song["song_url"]
+            if url not in reserved:
+                continue
+            if url in downloaded_urls or files.check_file_exists(files.normalize_relative_path(song["lyrics_path"])):
+                manifest.append(song)
+            else:
+                queue.release(url)
+                failed += 1
+        # The ones a run with another range already downloaded stay in the manifest; while any
+        # is missing the shard is not done, so a run with its range downloads it
+        missing = 0
+        for song in out_of_range:
+            if files.check_file_exists(files.normalize_relative_path(song["lyrics_path"])):
+                manifest.append(song)
+            else:
+                missing += 1
+
+        write_manifest(output_directory, shard, worker, manifest)
+        queue.finish(shard, len(manifest), complete=not failed and not missing)
+        if failed:
+            log.warning(f"Worker {worker}: {failed} songs of shard {shard} failed, the shard is left for a later run")
+        if missing:
+            log.info(f"Worker {worker}: {missing} songs of shard {shard} are out of the range, the shard is left for a later run")
+        stats.count("shards_done")
+        total += len(downloaded)
+        log.info(f"Worker {worker} finished shard {shard}: {len(downloaded)} songs")
+
+    log.info(f"Worker {worker} done. Queue status: {queue.status()}")
+    return total
+
+
+def write_manifest(output_directory: str, shard: str, worker: str, downloaded: list[dict]):
+    """Writes the list of songs downloaded for a shard (one file per shard and worker).
+    It replaces the manifests of workers that had the shard before: this one lists their songs too."""
+    path = Path(f"{output_directory}shards/{shard}.{worker}.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps({"shard": shard, "worker": worker, "songs": downloaded}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    for previous in path.parent.glob(f"{shard}.*.json"):
+        if previous != path:
+            previous.unlink(missing_ok=True)
+
+
+def merge_shards(output_directory: str) -> list[dict]:
+    """Merges every shard manifest into catalogs/downloads.json.
+    Returns:
+        list[dict]: The downloaded songs, each one once.
+    """
+    merged = {}
+    duplicates = 0
+    for path in sorted(Path(f"{output_directory}shards").glob("*.json")):
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+        for song in manifest["songs"]:
+            if song["song_url"] in merged:
+                duplicates += 1
+                continue
+            merged[song["song_url"]] = {**song, "shard": manifest["shard"], "worker": manifest["worker"]}
+
+    if duplicates:
+        log.warning(f"{duplicates} songs were downloaded by more than one worker")
+    songs_list = list(merged.values())
+    path = Path(f"{output_directory}catalogs/downloads.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(songs_list, ensure_ascii=False, indent=2), encoding="utf-8")
+    log.info(f"Merged {len(songs_list)} songs from the shard manifests into {path}")
+    return songs_list
@@ -1,18 +1,20 @@
 import logging as log
 import json
-import sys
+import os
 import utils.beautifulsoup as bs
 import utils.files as files
-import re
-import time
+import utils.parsers as parsers
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 from utils.data import Song, Artist
 from pathlib import Path
+from common import instrumentation, reporting
 
 # --- Configuration ---
-ROOT = "https://acordes.lacuerda.net"
-URL_ARTIST_INDEX = "https://acordes.lacuerda.net/tabs/"
+# The site can be overridden (e.g. with a local stand-in for benchmarks)
+ROOT = os.environ.get("LACUERDA_ROOT", "https://acordes.lacuerda.net")
+URL_ARTIST_INDEX = f"{ROOT}/tabs/"
 SONG_VERSION = None
 INDEX = "abcdefghijklmnopqrstuvwxyz"
 
@@ -37,41 +39,99 @@ def get_version(song, version: int = 0):
     return song, song_name
 
 
-def get_artists(start_char: str, end_char: str) -> list[Artist]:
-    """Scrapes artist URLs for a given range of starting letters.
+def get_artist_urls(start_char: str, end_char: str) -> list[tuple[str, str]]:
+    """Scrapes the artist index pages for a given range of starting letters.
     Args:
         start_char (str): The starting letter for artists to catalog (e.g., 'a').
         end_char (str): The ending letter for artists to catalog (e.g., 'z').
     Returns:
-        list[Artist]: A list of Artist objects.
+        list[tuple[str, str]]: The display name and URL of every artist.
     """
-
-    log.info("Starting to build artists catalog...")
     artists = []
     for char_code in range(ord(start_char), ord(end_char) + 1):
         char = chr(char_code)
         artist_index_url = f"{URL_ARTIST_INDEX}/{char}"
         log.info(f"Scraping artist index: {artist_index_url}")
 
-        soup = bs.get_soup(artist_index_url)
-        if not soup:
+        page = bs.get_html(artist_index_url)
+        if not page:
             continue
 
-        ul_tag = soup.find("ul")
-        if not ul_tag:
-            log.info(f"No <ul> found on {artist_index_url}", file=sys.stderr)
+        with instrumentation.current().phase("parse"):
+            links = parsers.extract_artist_links(page)
+        if not links:
+            log.info(f"No artist links found on {artist_index_url}")
             continue
 
-        for li in ul_tag.find_all("li"):
-            a_tag = li.find("a")
-            if a_tag and a_tag.get("href"):
-                href = ROOT + a_tag["href"]
-                artist_display_name = Path(href).name.replace("_", " ").title()
-                artists.append(Artist(name=artist_display_name, url=href))
+        for link in links:
+            href = ROOT + link
+            artist_display_name = Path(href).name.replace("_", " ").title()
+            artists.append((artist_display_name, href))
 
     return artists
 
 
+def get_artists(start_char: str, end_char: str) -> list[Artist]:
+    """Scrapes artist URLs for a given range of starting letters.
+    Args:
+        start_char (str): The starting letter for artists to catalog (e.g., 'a').
+        end_char (str): The ending letter for artists to catalog (e.g., 'z').
+    Returns:
+        list[Artist]: A list of Artist objects.
+    """
+
+    log.info("Starting to build artists catalog...")
+    return [Artist(name=name, url=url) for name, url in get_artist_urls(start_char, end_char)]
+
+
+def build_songs(artist_name: str, artist_url: str, links: list[str], output_directory) -> list[Song]:
+    """Builds the songs of an artist from the links of the artist page.
+    Args:
+        artist_name (str): The display name of the artist.
+        artist_url (str): The URL of the artist page.
+        links (list[str]): The hrefs of the artist page.
+        output_directory: The base directory where lyrics would eventually be saved.
+    Returns:
+        list[Song]: One Song per song link.
+    """
+    songs = []
+    for link in links:
+        # Filter for valid song links. lacuerda.net song links are relative
+        # to the artist page and do not typically contain '.shtml' in the <a> href itself
+        # for the first part of the relative path, but they *do* eventually form
+        # artist/song.shtml. The original code looked for 'id="r"' which is too specific.
+        # We'll assume any relative href on an artist page is a potential song link.
+        if not link.startswith("http"):
+
+            song_relative_path = link
+
+            # Construct the full base URL for the song (before adding .shtml or version)
+            # Example: https://acordes.lacuerda.net/artist/song_title
+            # We need to ensure artist_url ends with a '/' if song_relative_path doesn't start with one,
+            # or remove it if song_relative_path starts with one.
+            if not artist_url.endswith("/") and not song_relative_path.startswith("/"):
+                song_base_url_prefix = f"{artist_url}/"
+            else:
+                song_base_url_prefix = artist_url
+
+            url = f"{song_base_url_prefix}{song_relative_path}.shtml"
+            full_song_url, song_filename = get_version(url, SONG_VERSION)
+            song_title = (
+                Path(song_relative_path).stem.replace("_", " ").title()
+            )  # The song title can be derived from the 'stem' of the relative path
+            song_output_dir = f"{output_directory}songs/{artist_name.replace(' ', '_').lower()}/{song_filename}"
+
+            songs.append(
+                Song(
+                    song_title=song_title,
+                    song_url=full_song_url,
+                    genre="",  # Cannot be scraped directly from lacuerda.net
+                    lyrics_path=song_output_dir,
+                )
+            )
+    return songs
+
+
 def get_catalog(
     output_directory: Path,
     start_char: str = "a",
@@ -95,94 +155,153 @@ def get_catalog(
     catalog = get_artists(start_char, end_char)
 
     for artist in catalog:
-        log.info(f"Scraping songs for artist: {artist.name} ({artist.url})")
-        soup = bs.get_soup(artist.url)
-        if not soup:
+        log.debug(f"Scraping songs for artist: {artist.name} ({artist.url})")
+        page = bs.get_html(artist.url)
+        if not page:
             continue
 
-        for a_tag in soup.select("li > a"):
-            # Filter for valid song links. lacuerda.net song links are relative
-            # to the artist page and do not typically contain '.shtml' in the <a> href itself
-            # for the first part of the relative path, but they *do* eventually form
-            # artist/song.shtml. The original code looked for 'id="r"' which is too specific.
-            # We'll assume any relative href on an artist page is a potential song link.
-            if a_tag and a_tag.get("href") and not a_tag["href"].startswith("http"):
-
-                song_relative_path = a_tag["href"]
-
-                # Construct the full base URL for the song (before adding .shtml or version)
-                # Example: https://acordes.lacuerda.net/artist/song_title
-                # We need to ensure artist_url ends with a '/' if song_relative_path doesn't start with one,
-                # or remove it if song_relative_path starts with one.
-                if not artist.url.endswith("/") and not song_relative_path.startswith(
-                    "/"
-                ):
-                    song_base_url_prefix = f"{artist.url}/"
-                else:
-                    song_base_url_prefix = artist.url
-
-                url = f"{song_base_url_prefix}{song_relative_path}.shtml"
-                full_song_url, song_filename = get_version(url, SONG_VERSION)
-                song_title = (
-                    Path(song_relative_path).stem.replace("_", " ").title()
-                )  # The song title can be derived from the 'stem' of the relative path
-                song_output_dir = f"{output_directory}songs/{artist.name.replace(' ', '_').lower()}/{song_filename}"
-
-                artist.songs.append(
-                    Song(
-                        song_title=song_title,
-                        song_url=full_song_url,
-                        genre="",  # Cannot be scraped directly from lacuerda.net
-                        lyrics_path=song_output_dir,
-                    )
-                )
+        with instrumentation.current().phase("parse"):
+            links = parsers.extract_song_links(page)
+
+        artist.songs.extend(build_songs(artist.name, artist.url, links, output_directory))
 
     log.info("Cataloging complete.")
     return catalog
 
 
-def get_song_lyrics(song_name: str, song_url: str, song_file_path: str) -> str:
+def get_song_lyrics(song_name: str, song_url: str, song_file_path: str, overwrite: bool = False) -> str:
     """Fetches the lyrics of a song from its URL.
     Args:
         song_url (str): The URL of the song page.
+        overwrite (bool): Write the file even if it exists (e.g. when replaying the archive).
     Returns:
         str: The lyrics text, or an empty string if not found.
     """
+    stats = instrumentation.current()
     try:
 
         song_file_path = files.normalize_relative_path(song_file_path)
 
-        if files.check_file_exists(song_file_path):
-            log.info(f"File {song_file_path} already exists. Skipping download.")
+        if not overwrite and files.check_file_exists(song_file_path):
+            log.debug(f"File {song_file_path} already exists. Skipping download.")
+            stats.count("songs_skipped")
             return False
 
-        log.info("song --> %s - url --> %s", song_name, song_url)
+        log.debug("song --> %s - url --> %s", song_name, song_url)
 
-        try:
-            lyric = bs.get_soup(song_url).findAll("pre")
-        except Exception as e:
-            log.error(f"Error fetching song from {song_url}: {e}")
+        page = bs.get_html(song_url)
+        if page is None:
+            log.error(f"Error fetching song from {song_url}")
+            stats.count("songs_failed")
             return False
 
-        for p in lyric:
-
-            text = re.sub("<.*?>", "", str(p)).strip()
-            if text:
+        # Only the <pre> is needed: its text is taken directly, without a soup
+        with stats.phase("parse"):
+            text = parsers.extract_pre_text(page)
+        if text:
 
+            with stats.phase("write"):
                 files.write_string_to_file(song_file_path, text=text)
-                print(song_name, "downloaded!")
-                return True
+            with stats.phase("print"):
+                log.debug(f"{song_name} downloaded!")
+            stats.count("songs_downloaded")
+            return True
 
     except Exception as e:
         log.error(f"Error fetching lyrics from {song_url}: {e}")
         raise e
 
 
-def get_songs(output_directory: str, version: int = 0):
+def load_catalog(output_directory: str) -> list[dict]:
+    """Loads the catalog saved by the scrapper.
+    Args:
+        output_directory (str): The base directory of the scrapper files.
+    Returns:
+        list[dict]: The artists of the catalog, with their songs. Empty if there is no catalog.
+    """
+    catalog = files.load_from_json(Path(f"{output_directory}catalogs/catalog.json"))
+    return catalog or []
+
+
+def artist_letter(artist: dict) -> str:
+    """First letter of an artist name, '#' if it does not start with a letter."""
+    letter = artist["name"][:1].lower()
+    return letter if "a" <= letter <= "z" else "#"
+
+
+def select_songs(catalog: list[dict], start_char: str = "a", end_char: str = "z") -> list[dict]:
+    """Returns the songs of the artists whose name starts within a range of letters.
+    Artists not starting with a letter are only selected for the full a-z range.
+    """
+    selected = []
+    for artist in catalog:
+        if letter_in_range(artist_letter(artist), start_char, end_char):
+            selected.extend(artist["songs"])
+    return selected
+
+
+def letter_in_range(letter: str, start_char: str = "a", end_char: str = "z") -> bool:
+    """Whether an artist letter (as returned by artist_letter) is within a range of letters.
+    '#' is only within the full a-z range.
+    """
+    start_char, end_char = start_char.lower(), end_char.lower()
+    if letter == "#":
+        return (start_char, end_char) == ("a", "z")
+    return start_char <= letter <= end_char
+
+
+def download_songs(songs: list[dict], reserve=None, overwrite: bool = False) -> list[dict]:
+    """Downloads a list of catalog songs in parallel.
+    Args:
+        songs (list[dict]): Songs of the catalog (song_title, song_url, lyrics_path).
+        reserve (callable, optional): Called with every song before downloading it. If it
+                                      returns False the song is skipped (already taken).
+        overwrite (bool): Write the files of songs already downloaded again.
+    Returns:
+        list[dict]: The songs that were downloaded.
+    """
+    stats = instrumentation.current()
+    downloaded = []
+    progress = reporting.Progress("Songs", total=len(songs))
+
+    def download(song):
+        if reserve and not reserve(song):
+            stats.count("songs_reserved_elsewhere")
+            return False
+        with stats.item("song", song=song.get("id", song["lyrics_path"])):
+            return get_song_lyrics(song["song_title"], song["song_url"], song["lyrics_path"], overwrite)
+
+    # The pool is as big as the controller allows, the controller decides how
+    # many of the workers actually have a request in flight at any time.
+    with ThreadPoolExecutor(max_workers=bs.CONTROLLER.max_concurrency) as executor:
+        futures = {executor.submit(download, song): song for song in songs}
+        for future in as_completed(futures):
+            try:
+                if future.result():
+                    downloaded.append(futures[future])
+            except Exception as e:
+                log.error(f"Error downloading {futures[future]['song_url']}: {e}")
+            progress.update()
+    progress.close()
+    return downloaded
+
+
+def get_songs(
+    output_directory: str,
+    version: int = 0,
+    start_char: str = "a",
+    end_char: str = "z",
+    delta: dict = None,
+    overwrite: bool = False,
+):
     """Downloads song lyrics from lacuerda.net based on the provided version.
     Args:
         output_directory (str): The base directory where lyrics will be saved.
         version (int, optional): The version number of the song to download. Defaults to 0.
+        start_char (str): Only artists starting from this letter are downloaded.
+        end_char (str): Only artists up to this letter are downloaded.
+        delta (dict, optional): A catalog delta (see utils.catalog). Only its added songs are downloaded.
+        overwrite (bool): Write the files of songs already downloaded again.
     """
     # TODO: Refactor this code to use get_catalog and Song/Artist dataclasses.
     # This function currently duplicates a lot of the logic in get_catalog.
@@ -242,12 +361,11 @@ def get_songs(output_directory: str, version: int = 0):
     #                 continue
     # -------------------- OLD CODE --------------------#
     # -------------------- NEW CODE --------------------#
-   # Override this
-    catalog = files.load_from_json(Path(f"{output_directory}catalogs/catalog.json"))
-    print(catalog)
-    for artist in catalog:
-        for song in artist["songs"]:
-            get_song_lyrics(song["song_title"], song["song_url"], song["lyrics_path"])
-            time.sleep(0.5)
+    if delta is not None:
+        download_songs(delta["added_songs"], overwrite=overwrite)
+        return
+    with instrumentation.current().phase("discover"):
+        catalog = load_catalog(output_directory)
+    download_songs(select_songs(catalog, start_char, end_char), overwrite=overwrite)
     # -------------------- NEW CODE --------------------#
 
@@ -1,14 +1,20 @@
 # Importamos las bibliotecas necesarias
 import os
 import re
+import sys
+import click
 import logging as log
 import datetime
+from pathlib import Path
 from utils.string_mapping import MAPPING
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from common import blobs, instrumentation, reporting
+
 # -- Configuration ---
 INPUT_DIRECTORY = "./files"
 CATALOG_DIRECTORY = f"{INPUT_DIRECTORY}/catalogs/"
-LOGS_DIRECTORY = "./logs/"
 
 OUTPUT_DIRECTORY = f"{INPUT_DIRECTORY}/cleaned/"
 ROOT = "https://acordes.lacuerda.net"
@@ -19,17 +25,8 @@ INDEX = "abcdefghijklmnopqrstuvwxyz#"
 
 
 # === LOGGING ===
-os.makedirs(LOGS_DIRECTORY, exist_ok=True)
-
+# Configured in main() through common.reporting (queue-based, see -v/-q)
 logger = log.getLogger(__name__)
-log.basicConfig(
-    filename=os.path.join(LOGS_DIRECTORY, "cleaner.log"),
-    filemode="w",
-    encoding="utf-8",
-    format="%(asctime)s %(levelname)-8s %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    level=log.INFO,
-)
 
 
 # original code
@@ -51,21 +48,21 @@ log.basicConfig(
 dir_list = list()
 #this function is used to list every file using recursive algorithm
 def list_files_recursive(path=INPUT_DIRECTORY):
-    print(INPUT_DIRECTORY)
+    log.debug(f"Listing {path}")
     if not os.path.exists(path):
         raise FileNotFoundError(f"La carpeta no existe: {path}")
     
-    #prints are for debugging
+    #debug messages are only shown with -vv
     for entry in os.listdir(path):
-        print(entry)
         full_path = os.path.join(path, entry)
-        print(full_path)
+        log.debug(full_path)
 
         # avoid avoiding the catalog we improve the execution time because we dont process the catalog, we do not need the catalog after extracting the songs.
         # avoiding cleaned is used to avoid saving cleaned songs inside de cleaned folder more than once.
-        if entry in ("catalogs", "cleaned"):
-            print("IGNORA ESTAS CARPETAS")
-            print(full_path)
+        # export holds the parquet/arrow files of export.py and blobs the contents of the outputs, not songs.
+        # transposed holds the transposer's copies of the cleaned songs.
+        if entry in ("catalogs", "cleaned", "export", "blobs", "transposed"):
+            log.debug(f"IGNORA ESTAS CARPETAS: {full_path}")
             continue
 
         #this is the logic to go inside the folders until the last one. example cleaned/songs/abelpintos/**3** <- until there
@@ -94,10 +91,63 @@ def apply_format_rules(text: str):
     return formatted_text
 
 
-def main():
+def clean_file(file_path: str) -> str | None:
+    """Cleans a downloaded tab and writes it under the cleaned directory.
+    Args:
+        file_path (str): The downloaded tab, inside INPUT_DIRECTORY.
+    Returns:
+        str | None: The path of the cleaned file, None if the tab was skipped.
+    """
+    stats = instrumentation.current()
+    log.debug(f"Processing file -> {file_path}")
+    try:
+        with stats.phase("read"):
+            with open(file_path, "r", encoding="utf-8") as file:
+                text = file.read()
+    except Exception as e:
+        log.error(f"{file_path} ---> {e}")
+        stats.count("read_errors")
+        return None
+
+    if text.count("\n") < MIN_LINES:
+        log.debug("Empty or too small tab. Skipping...")
+        stats.count("files_skipped")
+        return None
+
+    with stats.phase("transform", span="clean rules"):
+        formatted_text = apply_format_rules(text)
+
+    with stats.phase("write"):
+        output_file = file_path.replace(INPUT_DIRECTORY, OUTPUT_DIRECTORY)
+        dir_path = os.path.dirname(output_file)
+        os.makedirs(dir_path, exist_ok=True)
+
+        blobs.write_text(output_file, formatted_text)
+
+    stats.count("files_cleaned")
+    return output_file
+
+
+@click.command()
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Capture the run with cProfile and tracemalloc.",
+)
+@click.option(
+    "--trace",
+    is_flag=True,
+    default=False,
+    help="Record a per-song trace of the run in logs/traces (Chrome trace format).",
+)
+@reporting.verbosity_options
+def main(profile, trace, verbose, quiet):
+    reporting.setup("cleaner.log", verbose, quiet)
     start_time = datetime.datetime.now()
     log.info(f"Cleaner started at {start_time}")
     print("Starting cleaner...")
+    stats = instrumentation.start("cleaner", profile=profile, trace=trace)
 
     # Crear las carpetas necesarias
     os.makedirs(INPUT_DIRECTORY, exist_ok=True)
@@ -105,35 +155,27 @@ def main():
 
     cleaned = 0
 
-    for file_path in list_files_recursive(INPUT_DIRECTORY):
-        log.info(f"Processing file -> {file_path}")
-        try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                text = file.read()
-        except Exception as e:
-            print(file_path, "---> ", e)
-            continue
-
-        if text.count("\n") < MIN_LINES:
-            log.info("Empty or too small tab. Skipping...")
-            continue
-
-        formatted_text = apply_format_rules(text)
-
-        output_file = file_path.replace(INPUT_DIRECTORY, OUTPUT_DIRECTORY)
-        dir_path = os.path.dirname(output_file)
-        os.makedirs(dir_path, exist_ok=True)
+    with stats.phase("discover"):
+        file_paths = list_files_recursive(INPUT_DIRECTORY)
+    progress = reporting.Progress("Cleaner", total=len(file_paths))
 
-        with open(output_file, "w", encoding="utf-8") as file:
-            file.write(formatted_text)
+    for file_path in file_paths:
+        progress.update()
+        with stats.item("file", song=file_path):
+            output_file = clean_file(file_path)
+            if output_file is None:
+                continue
 
-        cleaned += 1
-        print(f"{cleaned} -- {output_file} CREATED!!")
+            cleaned += 1
+            with stats.phase("print"):
+                log.debug(f"{cleaned} -- {output_file} CREATED!!")
 
+    progress.close()
     end_time = datetime.datetime.now()
     duration = end_time - start_time
     log.info(f"Cleaner ended at {end_time}")
     log.info(f"Total duration: {duration}")
+    stats.finish()
     print(
         f"Cleaner finished. Duration in seconds: {duration.total_seconds():.2f} "
         f"({duration.total_seconds() / 60:.2f} minutes)."
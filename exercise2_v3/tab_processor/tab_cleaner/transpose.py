@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import click
+import logging as log
+import datetime
+from pathlib import Path
+from utils.transpose import transpose_corpus, clear_cache
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from common import reporting
+
+# -- Configuration ---
+INPUT_DIRECTORY = "./files/cleaned/"
+OUTPUT_DIRECTORY = "./files/transposed/"
+BATCH_SIZE = 500
+BENCHMARK_ROUNDS = 3
+
+
+# === LOGGING ===
+# Configured in main() through common.reporting (queue-based, see -v/-q)
+logger = log.getLogger(__name__)
+
+
+def list_song_files(path: str) -> list[str]:
+    """Lists every .txt song under a directory, with '/' as separator."""
+    songs = []
+    for root, _, file_names in os.walk(path):
+        for name in file_names:
+            if name.endswith(".txt"):
+                songs.append(os.path.join(root, name).replace("\\", "/"))
+    return sorted(songs)
+
+
+def read_songs(paths: list[str]) -> list[str]:
+    """Reads a batch of songs."""
+    texts = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="ignore") as file:
+            texts.append(file.read())
+    return texts
+
+
+def benchmark(texts: list[str], semitones: int | None):
+    """Measures songs per second with a cold and with a warm cache."""
+    results = {}
+    for label in ("cold", "warm"):
+        best = None
+        for _ in range(BENCHMARK_ROUNDS):
+            if label == "cold":
+                clear_cache()
+            start = time.perf_counter()
+            transpose_corpus(texts, semitones)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[label] = len(texts) / best if best else float("inf")
+        log.info(f"Benchmark {label}: {results[label]:.0f} songs/s over {len(texts)} songs")
+        print(f"{label} cache: {results[label]:.0f} songs/s ({len(texts)} songs)")
+    return results
+
+
+@click.command()
+@click.option(
+    "--semitones",
+    "-s",
+    type=int,
+    default=None,
+    help="Semitones to transpose. If not set, songs are normalized to C major / A minor.",
+)
+@click.option("--input", "-i", "input_directory", default=INPUT_DIRECTORY, help="Directory with the songs.")
+@click.option("--output", "-o", "output_directory", default=OUTPUT_DIRECTORY, help="Directory for the transposed songs.")
+@click.option(
+    "--benchmark",
+    "-b",
+    "run_benchmark",
+    is_flag=True,
+    default=False,
+    help="Only measure the transposition throughput (songs/s), nothing is written.",
+)
+@reporting.verbosity_options
+def main(semitones, input_directory, output_directory, run_benchmark, verbose, quiet):
+    """Transposes every song of the input directory in batches."""
+    reporting.setup("transposer.log", verbose, quiet)
+    start_time = datetime.datetime.now()
+    log.info(f"Transposer started at {start_time}")
+    print("Starting transposer...")
+
+    paths = list_song_files(input_directory)
+    label = "canonical" if semitones is None else f"{semitones:+d}"
+
+    if run_benchmark:
+        benchmark(read_songs(paths), semitones)
+        return
+
+    transposed = 0
+    for batch_start in range(0, len(paths), BATCH_SIZE):
+        batch = paths[batch_start : batch_start + BATCH_SIZE]
+        for path, text in zip(batch, transpose_corpus(read_songs(batch), semitones)):
+            relative_path = os.path.relpath(path, input_directory)
+            output_file = os.path.join(output_directory, label, relative_path)
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            with open(output_file, "w", encoding="utf-8") as file:
+                file.write(text)
+            transposed += 1
+        log.info(f"Transposed {transposed}/{len(paths)} songs")
+
+    duration = datetime.datetime.now() - start_time
+    log.info(f"Total duration: {duration}")
+    print(
+        f"Transposer finished. {transposed} songs in {duration.total_seconds():.2f} seconds."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+""" Chord transposition engine for song tabs.
+This module builds the transposition lookup tables from `chords_mapping` and
+`chord_variations` once at import time, tokenizes chord lines a single time per
+song and transposes songs (one by one or as a whole corpus) keeping the chord
+columns aligned with the lyric lines below them. """
+
+import re
+from functools import lru_cache
+from typing import Iterable
+
+from utils.chords import chords_mapping, chord_variations
+
+# --- Constants ---
+SEMITONES = 12
+CACHE_SIZE = 4096
+
+# Roots in chromatic order starting at A, as defined in chords_mapping
+ROOTS = list(chords_mapping)
+
+# Suffixes taken from chord_variations ("", "m", "7", "5", "maj") plus the
+# most common extensions found on lacuerda tabs.
+EXTRA_SUFFIXES = ["m7", "maj7", "7M", "m6", "6", "9", "add9", "sus2", "sus4", "dim", "aug", "+"]
+SUFFIXES = sorted(
+    {
+        variation[len(root):]
+        for root, variations in chord_variations.items()
+        for variation in variations
+    }.union(EXTRA_SUFFIXES),
+    key=len,
+)
+
+# Canonical keys used to normalize songs: C major and A minor
+CANONICAL_MAJOR = ROOTS.index("C")
+CANONICAL_MINOR = ROOTS.index("A")
+
+TOKEN_PATTERN = re.compile(r"\S+")
+
+# Roots that are also words ("Si", "La", "A"...): alone on a line they are only taken
+# as a chord when a neighbouring line is a chord line too
+AMBIGUOUS_WORDS = {"a", "do", "re", "mi", "fa", "sol", "la", "si"}
+
+
+# --- Lookup tables ---
+def _spellings() -> list[list[str]]:
+    """Returns every supported spelling of the 12 roots, indexed by semitone.
+    English (A, A#, Bb) and Spanish (La, LA, La#, Si♭, Sib, SIb) notations are
+    derived from chords_mapping so both tables stay in sync.
+    """
+    english_sharp = ROOTS
+    english_flat = [
+        ROOTS[(i + 1) % SEMITONES] + "b" if "#" in root else root
+        for i, root in enumerate(ROOTS)
+    ]
+    spanish = [name.split(" / ") for name in chords_mapping.values()]
+    spanish_sharp = [names[0] for names in spanish]
+    spanish_flat = [names[-1] for names in spanish]
+
+    families = [english_sharp, english_flat]
+    for family in (spanish_sharp, spanish_flat):
+        for variant in (family, [name.upper() for name in family]):
+            families.append(variant)
+            families.append([name.replace("♭", "b") for name in variant])
+    return families
+
+
+def _build_tables() -> tuple[dict[str, tuple[str, ...]], dict[str, tuple[int, str]]]:
+    """Precomputes, for every known chord token, its 12 transpositions
+    (TABLE["Am"][2] == "Bm", TABLE["SOL"][5] == "DO") and its (root, suffix).
+    """
+    table = {}
+    chords = {}
+    for family in _spellings():
+        for index, root in enumerate(family):
+            for suffix in SUFFIXES:
+                token = root + suffix
+                if token in table:
+                    continue
+                table[token] = tuple(
+                    family[(index + shift) % SEMITONES] + suffix
+                    for shift in range(SEMITONES)
+                )
+                chords[token] = (index, suffix)
+    return table, chords
+
+
+TABLE, CHORDS = _build_tables()
+
+
+# --- Tokenizer ---
+def is_chord(token: str) -> bool:
+    """Checks if a token is a chord (slash chords like D/F# included)."""
+    if token in TABLE:
+        return True
+    chord, _, bass = token.partition("/")
+    return bool(bass) and chord in TABLE and bass in TABLE
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def tokenize(text: str) -> tuple:
+    """Splits a song into lines. Chord lines are tokenized into a tuple of
+    (column, chord) pairs, any other line is kept as a plain string.
+    Args:
+        text (str): The song text.
+    Returns:
+        tuple: One item per line, either a str or a tuple of (column, chord).
+    """
+    raw_lines = text.split("\n")
+    lines = []
+    for line in raw_lines:
+        chords = tuple(
+            (match.start(), match.group()) for match in TOKEN_PATTERN.finditer(line)
+        )
+        if chords and all(is_chord(chord) for _, chord in chords):
+            lines.append(chords)
+        else:
+            lines.append(line)
+
+    # A lone ambiguous word is a lyric unless the nearest non-blank line above or below is a chord line
+    for index in [index for index, line in enumerate(lines) if _is_ambiguous(line)]:
+        if not any(_is_chord_line(neighbour) for neighbour in _neighbours(lines, index)):
+            lines[index] = raw_lines[index]
+    return tuple(lines)
+
+
+def _is_ambiguous(line) -> bool:
+    return isinstance(line, tuple) and len(line) == 1 and line[0][1].lower() in AMBIGUOUS_WORDS
+
+
+def _is_chord_line(line) -> bool:
+    return isinstance(line, tuple) and not _is_ambiguous(line)
+
+
+def _neighbours(lines: list, index: int) -> list:
+    """The nearest non-blank lines above and below a line."""
+    found = []
+    for step in (-1, 1):
+        position = index + step
+        while 0 <= position < len(lines) and isinstance(lines[position], str) and not lines[position].strip():
+            position += step
+        if 0 <= position < len(lines):
+            found.append(lines[position])
+    return found
+
+
+# --- Transposition ---
+def transpose_chord(chord: str, semitones: int) -> str:
+    """Transposes a single chord token. Unknown tokens are returned unchanged."""
+    shift = semitones % SEMITONES
+    if chord in TABLE:
+        return TABLE[chord][shift]
+    base, _, bass = chord.partition("/")
+    if bass and base in TABLE and bass in TABLE:
+        return f"{TABLE[base][shift]}/{TABLE[bass][shift]}"
+    return chord
+
+
+def _render_chord_line(chords: tuple, semitones: int) -> str:
+    """Writes the transposed chords back in their original columns. When a
+    chord grows (LA -> SOL#) the next one is only pushed if they would touch."""
+    line = ""
+    for column, chord in chords:
+        padding = column - len(line)
+        if line and padding < 1:
+            padding = 1
+        line += " " * max(padding, 0) + transpose_chord(chord, semitones)
+    return line
+
+
+def detect_key(text: str) -> tuple[int, bool] | None:
+    """Estimates the key of a song from its first chord.
+    Returns:
+        tuple[int, bool] | None: (root semitone index, is_minor) or None if the
+        song has no chord lines.
+    """
+    for line in tokenize(text):
+        if isinstance(line, tuple):
+            root, suffix = CHORDS[line[0][1].partition("/")[0]]
+            return root, suffix.startswith("m") and not suffix.startswith("maj")
+    return None
+
+
+def canonical_shift(text: str) -> int:
+    """Semitones needed to move a song to C major (or A minor)."""
+    key = detect_key(text)
+    if key is None:
+        return 0
+    root, minor = key
+    target = CANONICAL_MINOR if minor else CANONICAL_MAJOR
+    return (target - root) % SEMITONES
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def transpose_song(text: str, semitones: int) -> str:
+    """Transposes a whole song. Results are kept in an LRU cache.
+    Args:
+        text (str): The song text.
+        semitones (int): Number of semitones to move (negative to go down).
+    Returns:
+        str: The transposed song.
+    """
+    shift = semitones % SEMITONES
+    if shift == 0:
+        return text
+    return "\n".join(
+        _render_chord_line(line, shift) if isinstance(line, tuple) else line
+        for line in tokenize(text)
+    )
+
+
+def normalize_song(text: str) -> str:
+    """Transposes a song to the canonical key (C major / A minor)."""
+    return transpose_song(text, canonical_shift(text))
+
+
+def transpose_corpus(texts: Iterable[str], semitones: int | None = None) -> list[str]:
+    """Transposes a batch of songs.
+    Args:
+        texts (Iterable[str]): The songs.
+        semitones (int | None): Semitones to move every song. If None, every
+                                song is normalized to the canonical key.
+    Returns:
+        list[str]: The transposed songs, in the same order.
+    """
+    if semitones is None:
+        return [normalize_song(text) for text in texts]
+    return [transpose_song(text, semitones) for text in texts]
+
+
+def clear_cache():
+    """Empties the tokenizer and transposition caches (used for benchmarks)."""
+    tokenize.cache_clear()
+    transpose_song.cache_clear()
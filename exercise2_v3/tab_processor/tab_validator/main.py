@@ -5,6 +5,12 @@ import re
 import logging as log
 import datetime
 import shutil
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from common import blobs, instrumentation, reporting
 
 INPUT_DIRECTORY = "./files/"
 CLEANED_DIRECTORY = f"{INPUT_DIRECTORY}cleaned"
@@ -46,13 +52,45 @@ def validate_song_format(song):
         return False
 
 
+def validate_file(file_path: str) -> tuple[bool, str]:
+    """Validates a cleaned tab and copies it to the ok or ko directory.
+    Args:
+        file_path (str): The cleaned tab, inside CLEANED_DIRECTORY.
+    Returns:
+        tuple[bool, str]: If the tab is valid, and the path it was copied to.
+    """
+    stats = instrumentation.current()
+    #make encoding utf8 to work
+    with stats.phase("read"):
+        with open(file_path, "r", encoding="utf8") as file:
+            text = file.read()
+
+    # Formatting of the text goes in that function call
+    with stats.phase("transform", span="validate"):
+        validated = validate_song_format(text)
+
+    output_directory = OUTPUT_DIRECTORY_OK if validated else OUTPUT_DIRECTORY_KO
+    output_file = file_path.replace(CLEANED_DIRECTORY, output_directory)
+    dir = "/".join(output_file.split("/")[:-1])
+
+    # Creates the path if not exists
+    if not os.path.exists(dir):
+        os.makedirs(dir, exist_ok=True)
+        log.debug(f"{dir} CREATED!!")
+
+    #unchanged copies of the cleaned tab are only a link to the same blob
+    with stats.phase("write"):
+        blobs.write_text(output_file, text)
+    return validated, output_file
+
+
 def list_files_recursive(path: str = "."):
     """Lists all files in a directory recursively."""
     for entry in os.listdir(path):
         
         #IGNORE VALIDATIONS FOLDER TO AVOID THE RECURSIVE PROBLEM
         if entry in ("validations"):
-            print("IGNORA ESTAS CARPETAS")
+            log.debug("IGNORA ESTAS CARPETAS")
             continue
         full_path = os.path.join(path, entry)
         if os.path.isdir(full_path):
@@ -74,11 +112,26 @@ def list_files_recursive(path: str = "."):
         "If flag is present, drops all files and validates from the clean directory. "
     ),
 )
-def main(init):
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Capture the run with cProfile and tracemalloc.",
+)
+@click.option(
+    "--trace",
+    is_flag=True,
+    default=False,
+    help="Record a per-song trace of the run in logs/traces (Chrome trace format).",
+)
+@reporting.verbosity_options
+def main(init, profile, trace, verbose, quiet):
+    reporting.setup("validator.log", verbose, quiet)
     # Start time tracking
     start_time = datetime.datetime.now()
     log.info(f"Validator started at {start_time}")
     print("Starting validator...")
+    stats = instrumentation.start("validator", profile=profile, trace=trace)
 
     if init:
         if os.path.exists(OUTPUT_DIRECTORY_OK):
@@ -86,48 +139,38 @@ def main(init):
         if os.path.exists(OUTPUT_DIRECTORY_KO):
             shutil.rmtree(OUTPUT_DIRECTORY_KO)
         log.info("Directories Removed")
+        # The outputs were just removed: the blobs that only they used can go too
+        log.info(f"{blobs.store().collect_garbage()} unused blobs removed")
 
     OK = 0
     KO = 0
 
-    for file_path in list_files_recursive(CLEANED_DIRECTORY):
-
-        text = str()
-        #make encoding utf8 to work
-        with open(file_path, "r", encoding ="utf8") as file:
-            text = file.read()
-
-        # Formatting of the text goes in that function call
-        validated = validate_song_format(text)
-
-        if validated:
-
-            output_file = file_path.replace(CLEANED_DIRECTORY, OUTPUT_DIRECTORY_OK)
-            dir = "/".join(output_file.split("/")[:-1])
+    with stats.phase("discover"):
+        file_paths = list_files_recursive(CLEANED_DIRECTORY)
+    progress = reporting.Progress("Validator", total=len(file_paths))
+
+    for file_path in file_paths:
+        progress.update()
+        with stats.item("file", song=file_path):
+            validated, output_file = validate_file(file_path)
+            if validated:
+                OK += 1
+            else:
+                KO += 1
             file_name = output_file.split("/")[-1:]
-            OK += 1
-        else:
-
-            output_file = file_path.replace(CLEANED_DIRECTORY, OUTPUT_DIRECTORY_KO)
-            dir = "/".join(output_file.split("/")[:-1])
-            file_name = output_file.split("/")[-1:]
-            KO += 1
-
-        # Creates the path if not exists
-        if not os.path.exists(dir):
-            os.makedirs(dir, exist_ok=True)
-            print("OKs = ", OK, "-- KOs = ", KO, "--", dir, " CREATED!!")
 
-        #make encoding utf8 to work
-        with open(output_file, "w", encoding="utf8") as file:
-            file.write(text)
-            print("OKs = ", OK, "-- KOs = ", KO, "--", file_name, " CREATED!!")
+            with stats.phase("print"):
+                log.debug(f"OKs = {OK} -- KOs = {KO} -- {file_name} CREATED!!")
 
+    progress.close()
+    stats.count("files_ok", OK)
+    stats.count("files_ko", KO)
     log.info(f"OKs = {OK}, -- KOs = {KO}, --")
     end_time = datetime.datetime.now()
     log.info(f"Validator ended at {end_time}")
     duration = end_time - start_time
     log.info(f"Total duration: {duration}")
+    stats.finish()
     print(
         f"Validator finished. Duration in seconds: {duration.total_seconds()}, that is {duration.total_seconds() / 60} minutes."
     )
@@ -0,0 +1,49 @@
+""" Merges the per-song traces of the stages (`--trace`) into a single timeline
+and lists the slowest songs, so the songs and phases behind the tail latency
+of a run stand out:
+
+    python pipeline.py --trace
+    python timeline.py            # last trace of every stage
+    python timeline.py logs/traces/cleaner-20250101-120000.json ...
+
+Open the merged file with https://ui.perfetto.dev or chrome://tracing.
+"""
+
+import os
+import glob
+import click
+
+from common import tracing
+
+# --- Configuration ---
+TIMELINE_FILE = f"{tracing.TRACES_DIRECTORY}timeline.json"
+
+
+def latest_traces(directory: str = tracing.TRACES_DIRECTORY) -> list[str]:
+    """The most recent trace of every stage."""
+    latest = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*-*-*.json"))):
+        stage = os.path.basename(path).rsplit("-", 2)[0]
+        latest[stage] = path  # Names sort by date
+    return sorted(latest.values(), key=os.path.getmtime)
+
+
+@click.command()
+@click.argument("traces", nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@click.option("--output", "-o", default=TIMELINE_FILE, help="Merged trace file.")
+@click.option("--top", default=10, help="Slowest spans listed.")
+def main(traces, output, top):
+    traces = list(traces) or latest_traces()
+    if not traces:
+        print(f"No traces found in {tracing.TRACES_DIRECTORY}. Run the stages with --trace.")
+        return
+
+    events = tracing.merge(traces, output)
+    print(f"{len(traces)} traces merged into {output} ({events} events)")
+    print("Slowest spans:")
+    for milliseconds, stage, name, song in tracing.slowest(traces, top):
+        print(f"  {milliseconds:10.2f} ms  {stage:<10} {name:<12} {song}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+""" Watch mode: processes every song as soon as the scrapper writes it.
+New or changed files under files/songs are cleaned, validated and, if valid,
+their lyrics are extracted, without scanning the whole tree again. Changes are
+debounced (a file is processed once it stopped changing) and go through a
+bounded queue, so a burst of downloads can not pile up unbounded work.
+
+    python watch.py            # inotify on Linux, polling elsewhere
+    python watch.py --poll     # force polling
+"""
+
+import os
+import time
+import queue
+import click
+import signal
+import threading
+import logging as log
+
+import lyrics
+from common import instrumentation, reporting
+from common.stages import load_module
+from common.watcher import create_watcher, walk_files
+
+# --- Configuration ---
+SONGS_DIRECTORY = "./files/songs"
+DEBOUNCE_SECONDS = 0.5
+QUEUE_SIZE = 1000
+WORKERS = 2
+
+
+class Debouncer:
+    """Collects changed paths and releases each one once it has been quiet for `delay` seconds.
+    A path changed several times while waiting is released only once, and a path that
+    changes while a worker has it is released again only after the worker is done."""
+
+    def __init__(self, output: queue.Queue, delay: float = DEBOUNCE_SECONDS):
+        self.output = output
+        self.delay = delay
+        self.running = False
+        self._pending = {}  # path -> time of the last change
+        self._active = set()  # Paths queued or being processed
+        self._lock = threading.Lock()
+
+    def touch(self, path: str):
+        with self._lock:
+            self._pending[path] = time.monotonic()
+
+    def done(self, path: str):
+        """Called by the workers when they finish a path."""
+        with self._lock:
+            self._active.discard(path)
+
+    def _release(self, quiet_only: bool = True) -> list[str]:
+        now = time.monotonic()
+        with self._lock:
+            ready = [
+                path for path, changed in self._pending.items()
+                if path not in self._active and (not quiet_only or now - changed >= self.delay)
+            ]
+            for path in ready:
+                del self._pending[path]
+                self._active.add(path)
+        return ready
+
+    def run(self):
+        self.running = True
+        while self.running:
+            time.sleep(min(self.delay / 2, 0.1) or 0.01)
+            ready = self._release()
+            for index, path in enumerate(ready):
+                # Blocks while the queue is full: the workers set the pace
+                while self.running:
+                    try:
+                        self.output.put(path, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                else:
+                    # Stopped while waiting: the rest go back to pending for drain()
+                    with self._lock:
+                        for unqueued in ready[index:]:
+                            self._pending.setdefault(unqueued, time.monotonic())
+                            self._active.discard(unqueued)
+                    break
+
+    def stop(self):
+        self.running = False
+
+    def drain(self):
+        """Queues every pending path, quiet or not (on shutdown, after stop() and while the
+        workers still run). Paths a worker has are queued again once it is done with them."""
+        queued = 0
+        while True:
+            with self._lock:
+                if not self._pending:
+                    break
+            ready = self._release(quiet_only=False)
+            for path in ready:
+                self.output.put(path)
+            queued += len(ready)
+            if not ready:
+                time.sleep(0.05)
+        if queued:
+            log.info(f"Queued {queued} songs changed just before stopping")
+
+
+def remove_stale(path: str):
+    """Removes a file (and its lyrics) if it exists."""
+    root, ext = os.path.splitext(path)
+    for stale in (path, root + "_lyrics" + ext):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+
+def process_song(path: str, cleaner, validator) -> str | None:
+    """Takes a downloaded song through clean -> validate -> lyrics.
+    Args:
+        path (str): The downloaded song.
+        cleaner: The tab_cleaner main module.
+        validator: The tab_validator main module.
+    Returns:
+        str | None: 'ok' or 'ko', None if the song was skipped by the cleaner.
+    """
+    cleaned = cleaner.clean_file(path)
+    if cleaned is None:
+        return None
+    validated, output_file = validator.validate_file(cleaned)
+
+    # A song that changed its verdict does not leave its old copy behind
+    if validated:
+        remove_stale(output_file.replace(validator.OUTPUT_DIRECTORY_OK, validator.OUTPUT_DIRECTORY_KO))
+        lyrics.extract_lyrics(output_file)
+        return "ok"
+    remove_stale(output_file.replace(validator.OUTPUT_DIRECTORY_KO, validator.OUTPUT_DIRECTORY_OK))
+    return "ko"
+
+
+def needs_processing(path: str, cleaner) -> bool:
+    """True if a song has no cleaned copy or it is older than the song."""
+    cleaned = path.replace(cleaner.INPUT_DIRECTORY, cleaner.OUTPUT_DIRECTORY)
+    return not os.path.exists(cleaned) or os.path.getmtime(cleaned) < os.path.getmtime(path)
+
+
+@click.command()
+@click.option("--poll", is_flag=True, default=False, help="Poll the directory instead of using inotify.")
+@click.option("--interval", default=2.0, help="Seconds between scans when polling.")
+@click.option("--debounce", default=DEBOUNCE_SECONDS, help="Seconds a file must stay unchanged before processing it.")
+@click.option("--workers", default=WORKERS, help="Songs processed in parallel.")
+@click.option("--queue-size", default=QUEUE_SIZE, help="Maximum songs waiting to be processed.")
+@click.option(
+    "--catch-up",
+    is_flag=True,
+    default=False,
+    help="Also process the songs downloaded while the watcher was not running.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Capture the run with cProfile and tracemalloc.",
+)
+@click.option(
+    "--trace",
+    is_flag=True,
+    default=False,
+    help="Record a per-song trace of the run in logs/traces (Chrome trace format).",
+)
+@reporting.verbosity_options
+def main(poll, interval, debounce, workers, queue_size, catch_up, profile, trace, verbose, quiet):
+    reporting.setup("watch.log", verbose, quiet)
+    stats = instrumentation.start("watch", profile=profile, trace=trace)
+    cleaner = load_module("tab_cleaner", "main")
+    validator = load_module("tab_validator", "main")
+    os.makedirs(SONGS_DIRECTORY, exist_ok=True)
+
+    work = queue.Queue(maxsize=queue_size)
+    debouncer = Debouncer(work, debounce)
+    progress = reporting.Progress("Watch")
+    stopping = threading.Event()
+
+    def changed(path):
+        if path.endswith(".txt"):
+            stats.count("events")
+            debouncer.touch(path)
+
+    watcher = create_watcher(SONGS_DIRECTORY, changed, poll=poll, interval=interval)
+
+    def worker():
+        while not stopping.is_set() or not work.empty():
+            try:
+                path = work.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                with stats.item("song", song=path):
+                    verdict = process_song(path, cleaner, validator)
+                stats.count(f"songs_{verdict or 'skipped'}")
+                log.debug(f"{path} -> {verdict or 'skipped'}")
+            except FileNotFoundError:
+                stats.count("songs_vanished")  # Deleted or renamed before we got to it
+            except Exception as e:
+                log.error(f"Error processing {path}: {e}")
+                stats.count("songs_failed")
+            finally:
+                debouncer.done(path)
+                work.task_done()
+                progress.update()
+
+    debouncing = threading.Thread(target=debouncer.run, daemon=True)
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in [debouncing, *workers]:
+        thread.start()
+
+    def shutdown(*_):
+        watcher.stop()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    if catch_up:
+        for path in walk_files(SONGS_DIRECTORY):
+            if path.endswith(".txt") and needs_processing(path, cleaner):
+                debouncer.touch(path)
+
+    print(f"Watching {SONGS_DIRECTORY} ({type(watcher).__name__}). Press Ctrl+C to stop.", flush=True)
+    log.info(f"Watching {SONGS_DIRECTORY} with {type(watcher).__name__}")
+    watcher.run()
+
+    # Let the songs already queued, and the ones still being debounced, finish
+    debouncer.stop()
+    debouncing.join()
+    debouncer.drain()
+    stopping.set()
+    for thread in workers:
+        thread.join()
+    progress.close()
+    stats.finish()
+    print("Watcher stopped.")
+
+
+if __name__ == "__main__":
+    main()
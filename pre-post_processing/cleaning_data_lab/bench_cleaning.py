@@ -0,0 +1,126 @@
+"""
+CLEANING BENCHMARK
+==================
+Compares the original step-by-step cleaning of main.py with the rule engine
+(rules.py) on a synthetic orders file, and checks that both write the same CSV.
+
+    python bench_cleaning.py --rows 10000000
+"""
+import os
+import time
+import tempfile
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import rules
+
+
+def synthetic_orders(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Orders with the problems of exercise.csv: duplicated ids, names in any case and
+    with extra spaces, invalid or missing emails and phones, bad dates, negative
+    quantities and prices, ages missing, not numeric or out of range."""
+    rng = np.random.default_rng(seed)
+
+    def pick(options, probabilities=None):
+        return pd.Series(np.array(options, dtype=object)[rng.choice(len(options), rows, p=probabilities)])
+
+    def missing(values: pd.Series, rate: float) -> pd.Series:
+        return values.where(rng.random(rows) >= rate)
+
+    ids = np.arange(1001, 1001 + rows)
+    duplicated = rng.random(rows) < 0.01
+    ids[duplicated] = rng.choice(ids, duplicated.sum())
+    first = pick(["john", "Jane", "BOB", "alice", "Grace", "o'neil", "mary-ann"])
+    last = pick(["doe", "Smith", "JOHNSON", "lee", "van der berg"])
+    names = missing(pick(["", " ", "  "]) + first + pick([" ", "  ", "\t"]) + last, 0.03)
+    users = first.str.lower().str.replace("'", "", regex=False) + pd.Series(rng.integers(0, 1000, rows)).astype(str)
+    emails = missing(pick(["", " "], [0.95, 0.05]) + users + pick(["@email.com", "@GMAIL.COM", "@bad", ".email.com"], [0.5, 0.3, 0.1, 0.1]), 0.03)
+    phones = missing(pick(["555-", "555", "556-"], [0.9, 0.05, 0.05]) + pd.Series(rng.integers(0, 10000, rows)).astype(str).str.zfill(4), 0.03)
+    countries = missing(pick(["USA", "US", "usa", "united states", "Canada", "UK"]), 0.05)
+    days = pd.Series(np.datetime_as_string(np.datetime64("2023-01-01") + rng.integers(0, 365, rows).astype("timedelta64[D]")))
+    dates = missing(days.where(rng.random(rows) >= 0.02, "2023-13-45"), 0.02)
+    quantities = pd.Series(rng.integers(-1, 10, rows)).astype(str).where(rng.random(rows) >= 0.01, "abc")
+    prices = pd.Series(np.round(rng.uniform(-5, 200, rows), 2)).astype(str)
+    ages = missing(pd.Series(rng.integers(10, 110, rows)).astype(str).where(rng.random(rows) >= 0.02, "unknown"), 0.05)
+    statuses = missing(pick(["Completed", "Pending", "Cancelled", "Shipped"]), 0.02)
+    return pd.DataFrame({
+        "OrderID": ids, "CustomerName": names, "Email": emails, "Phone": phones, "Country": countries,
+        "OrderDate": dates, "Quantity": quantities, "Price": prices, "CustomerAge": ages, "OrderStatus": statuses,
+    })
+
+
+def legacy_clean(df: pd.DataFrame) -> pd.DataFrame:
+    # STEP 4 of main.py before the rule engine
+    df = df.drop_duplicates(["OrderID"])
+    df["CustomerName"] = df["CustomerName"].fillna("Unknown")
+    df["CustomerName"] = df["CustomerName"].apply(lambda name: " ".join(part.capitalize() for part in name.split()))
+    df = df.dropna(subset=["Email"])
+    df["EmailTrue"] = df["Email"].str.match(rules.EMAIL_REGEX)
+    df = df[df["EmailTrue"] == True]
+    df = df.drop(columns=["EmailTrue"])
+    df["Email"] = df["Email"].str.lower()
+    df = df.dropna(subset=["Phone"])
+    df["PhoneValid"] = df["Phone"].str.match(rules.PHONE_REGEX)
+    df = df[df["PhoneValid"] == True]
+    df = df.drop(columns=["PhoneValid"])
+    df["Country"] = df["Country"].fillna("Unknown")
+    df["Country"] = df["Country"].str.upper()
+    df["Country"] = df["Country"].replace("US", "USA")
+    df["OrderDate"] = pd.to_datetime(df["OrderDate"], errors="coerce")
+    df = df.dropna(subset=["OrderDate"])
+    df["Quantity"] = pd.to_numeric(df["Quantity"], errors="coerce")
+    df = df.dropna(subset=["Quantity"])
+    df = df[df["Quantity"] > 0]
+    df["Price"] = pd.to_numeric(df["Price"], errors="coerce")
+    df = df.dropna(subset=["Price"])
+    df = df[df["Price"] >= 0]
+    df["CustomerAge"] = pd.to_numeric(df["CustomerAge"], errors="coerce")
+    df["CustomerAge"] = df["CustomerAge"].fillna(df["CustomerAge"].median())
+    df = df[(df["CustomerAge"] >= 18) & (df["CustomerAge"] <= 100)]
+    df = df.dropna(subset=["OrderStatus"])
+    return df
+
+
+def timed(function, df: pd.DataFrame) -> tuple[float, pd.DataFrame]:
+    start = time.perf_counter()
+    result = function(df)
+    return time.perf_counter() - start, result
+
+
+def same_csv(first: pd.DataFrame, second: pd.DataFrame, rows: int = 1_000_000) -> bool:
+    # Compared as the CSV they write, a slice at a time (the whole text would not fit in memory)
+    if len(first) != len(second):
+        return False
+    for start in range(0, max(len(first), 1), rows):
+        header = start == 0
+        if first[start:start + rows].to_csv(index=False, header=header) != second[start:start + rows].to_csv(index=False, header=header):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the order cleaning rules.")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Rows of the synthetic orders file.")
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows} synthetic orders...")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "orders.csv")
+        synthetic_orders(args.rows).to_csv(path, index=False)
+        # Read back from CSV, like main.py, so the column types are the same as with a real file
+        df = pd.read_csv(path)
+
+    legacy_seconds, legacy = timed(legacy_clean, df)
+    rules_seconds, cleaned = timed(lambda frame: rules.clean(frame, rules.ORDER_RULES), df)
+    if not same_csv(legacy, cleaned):
+        raise SystemExit("The rule engine output differs from the original cleaning")
+
+    print(f"Rows kept: {len(cleaned)} of {len(df)}")
+    print(f"Step by step: {legacy_seconds:.2f} s")
+    print(f"Rule engine:  {rules_seconds:.2f} s ({legacy_seconds / rules_seconds:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
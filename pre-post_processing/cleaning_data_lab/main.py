@@ -4,9 +4,12 @@ DATA CLEANING EXERCISE
 Retrieve, explore, and clean an e-commerce customer orders dataset
 """
 from datetime import datetime
-import requests
+import os
+import tempfile
 import pandas as pd
-import io
+
+import rules
+import streaming
 
 print("=" * 70)
 print("DATA CLEANING EXERCISE - E-COMMERCE CUSTOMER ORDERS")
@@ -18,8 +21,6 @@ print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
 # ============================================================================
 print("STEP 1: RETRIEVE DATA FROM WEB SOURCE")
 url = "https://raw.githubusercontent.com/victorbrub/data-engineering-class/refs/heads/main/pre-post_processing/exercise.csv"
-response = requests.get(url)
-print(response.text)
 
 
 # df = pd.read_csv("exercise.csv")
@@ -28,16 +29,17 @@ print(response.text)
 
 try:
     print(f"Fetching data from: {url}")
-    response = requests.get(url, timeout=10)
- 
-    print("Response:", response.text)
-   
-    print("✓ Data fetched from web source, loading into DataFrame...")
-    # print("Response:", response.text)  
-    
-    # #de esta forma no lee las lineas que estan mal formateadas, podemos llevar un registrs y hacer un post-proceso
-    # df = pd.read_csv(io.StringIO(response.text),sep=',',on_bad_lines='skip')
-    df = pd.read_csv(io.StringIO(response.text),sep=',',on_bad_lines='warn')
+    # The body is streamed to a temporary file instead of being held (and printed) as one string;
+    # for files too big for memory, streaming.py cleans that file a chunk at a time
+    with tempfile.TemporaryDirectory() as download_dir:
+        download_path = os.path.join(download_dir, "exercise.csv")
+        response = streaming.download(url, download_path, timeout=10)
+
+        print(f"✓ Data fetched from web source ({os.path.getsize(download_path)} bytes), loading into DataFrame...")
+
+        # #de esta forma no lee las lineas que estan mal formateadas, podemos llevar un registrs y hacer un post-proceso
+        # df = pd.read_csv(download_path,sep=',',on_bad_lines='skip')
+        df = pd.read_csv(download_path,sep=',',on_bad_lines='warn')
     print(f"✓ Data retrieved successfully!")
     print(f"✓ Status Code: {response.status_code}")
     print(f"✓ Rows: {len(df)}, Columns: {len(df.columns)}\n")
@@ -74,59 +76,10 @@ if df[df.duplicated(subset=['OrderID'], keep=False)].shape[0] > 0:
 # STEP 4: DATA CLEANING
 # RULES: 
 # ============================================================================
-#OrderID: 
-df = df.drop_duplicates(["OrderID"])
-
-#CustomerName:
-df["CustomerName"] = df["CustomerName"].fillna("Unknown")
-df["CustomerName"] = df["CustomerName"].apply(
-    lambda name: " ".join(part.capitalize() for part in name.split())
-)
-
-#Email:
-df = df.dropna(subset=["Email"])
-# Validate email format
-regex = r"^[\w\.-]+@[\w\.-]+\.\w+$"
-df["EmailTrue"] = df["Email"].str.match(regex)
-df = df[df["EmailTrue"] == True]
-df = df.drop(columns=["EmailTrue"])
-df["Email"] = df["Email"].str.lower()
-
-#Phone:
-df = df.dropna(subset=["Phone"])
-# Validate phone format
-phone_regex = r"^555-\d{4}$"
-df["PhoneValid"] = df["Phone"].str.match(phone_regex)
-df = df[df["PhoneValid"] == True]
-df = df.drop(columns=["PhoneValid"])
-
-#Country:
-df["Country"] = df["Country"].fillna("Unknown")
-df["Country"] = df["Country"].str.upper()
-# In this case, replace "US" with "USA"
-df["Country"] = df["Country"].replace("US", "USA")
-
-#OrderDate:
-df["OrderDate"] = pd.to_datetime(df["OrderDate"], errors="coerce")
-df = df.dropna(subset=["OrderDate"])
-
-#Quantity:
-df["Quantity"] = pd.to_numeric(df["Quantity"], errors="coerce")
-df = df.dropna(subset=["Quantity"])
-df = df[df["Quantity"] > 0]
-
-#Price:
-df["Price"] = pd.to_numeric(df["Price"], errors="coerce")
-df = df.dropna(subset=["Price"])
-df = df[df["Price"] >= 0]
-
-#CustomerAge:
-df["CustomerAge"] = pd.to_numeric(df["CustomerAge"], errors="coerce")
-df["CustomerAge"] = df["CustomerAge"].fillna(df["CustomerAge"].median())
-df = df[(df["CustomerAge"] >= 18) & (df["CustomerAge"] <= 100)]
-
-#OrderStatus:
-df = df.dropna(subset=["OrderStatus"])
+# The rules (OrderID dedupe, fills, email/phone validation, normalization, date and
+# number parsing, range checks) are declared in rules.ORDER_RULES and applied in a
+# single vectorized pass, with the same result as applying them one step at a time
+df = rules.clean(df, rules.ORDER_RULES)
 print(df.head(20))
 
 # ============================================================================
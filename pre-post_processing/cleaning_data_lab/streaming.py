@@ -0,0 +1,311 @@
+"""
+OUT-OF-CORE CLEANING
+====================
+Cleans an orders file of any size with the rules of rules.py, reading it a chunk at a
+time and writing the cleaned rows as they are produced: memory depends on the chunk
+size, not on the file.
+
+    python streaming.py orders.csv cleaned_orders.csv --chunk-rows 100000
+    python streaming.py https://.../exercise.csv cleaned_exercise.csv
+
+Most rules only look at their own row. The ones that look at the whole file are
+handled here:
+- Dedupe: the values already seen are kept in a hash set that lives across chunks.
+- FillMedian: the median needs every value, so the file is read twice. The first pass
+  spills the values to a temporary file and the exact median is selected from there;
+  the second one fills with it and writes.
+- ParseDates: the date format is inferred once, from the first chunk with dates, and
+  used for every chunk.
+The chunks are read as text, so the first pass also records the types pd.read_csv
+infers over the whole file, before any rule drops rows, and the types the rules
+convert to. Every chunk is then written with the types the in-memory cleaning of
+main.py ends with (e.g. Price as a float in every chunk when some price anywhere in
+the file had decimals, even if that row is dropped).
+"""
+import os
+import argparse
+import tempfile
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import requests
+from pandas.tseries.api import guess_datetime_format
+
+import rules
+
+CHUNK_ROWS = 100_000
+DOWNLOAD_BLOCK = 1024 * 1024
+SPILL_VALUES = 1_000_000  # values of the median spill file read at a time
+RADIX_BITS = 16  # bits of the sort key fixed per pass of the median selection
+# Values pd.to_datetime skips when it infers the format from the first one
+NOT_DATES = {"", "NaT", "nat", "NAT", "nan", "NaN", "NAN", "now", "today"}
+
+
+def download(url: str, path: str, timeout: int = 10) -> requests.Response:
+    """Saves the response body to a file a block at a time (it is never held whole in memory)."""
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        with open(path, "wb") as file:
+            for block in response.iter_content(chunk_size=DOWNLOAD_BLOCK):
+                file.write(block)
+    return response
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    return pd.util.hash_array(values.to_numpy(dtype=object), categorize=False)
+
+
+class SeenValues:
+    """Set of 64-bit value hashes that persists across chunks: open addressing with linear
+    probing over a numpy table, filled a whole chunk at a time, at most half full (~16 bytes
+    per distinct value). Integer ids hash without collisions; for text ids two different
+    values share a hash with probability ~n²/2^65."""
+
+    def __init__(self, capacity: int = 1 << 16):
+        self.table = np.zeros(capacity, dtype=np.uint64)  # 0 marks an empty slot
+        self.size = 0
+        self.zero = False  # hash 0 can't go in the table
+
+    def add(self, hashes: np.ndarray) -> np.ndarray:
+        """Adds the hashes; True where the value had not been seen before (only its first
+        occurrence in the chunk)."""
+        unique, first = np.unique(hashes, return_index=True)
+        new = np.zeros(len(unique), dtype=bool)
+        if len(unique) and unique[0] == 0:
+            new[0] = not self.zero
+            self.zero = True
+        if 2 * (self.size + len(unique)) > len(self.table):
+            self._grow(self.size + len(unique))
+        new[unique != 0] = self._insert(unique[unique != 0])
+        is_new = np.zeros(len(hashes), dtype=bool)
+        is_new[first[new]] = True
+        return is_new
+
+    def _insert(self, hashes: np.ndarray) -> np.ndarray:
+        # hashes are distinct and not 0; returns the ones that were not in the table
+        mask = np.uint64(len(self.table) - 1)
+        slots = (hashes & mask).astype(np.intp)
+        inserted = np.zeros(len(hashes), dtype=bool)
+        pending = np.arange(len(hashes))
+        while len(pending):
+            current = self.table[slots[pending]]
+            done = current == hashes[pending]
+            empty = np.flatnonzero(current == 0)
+            # Hashes that want the same empty slot: one of them gets it, the rest keep probing
+            claim = pending[empty]
+            self.table[slots[claim]] = hashes[claim]
+            won = self.table[slots[claim]] == hashes[claim]
+            inserted[claim[won]] = True
+            done[empty[won]] = True
+            pending = pending[~done]
+            slots[pending] = (slots[pending] + 1) & (len(self.table) - 1)
+        self.size += int(inserted.sum())
+        return inserted
+
+    def _grow(self, size: int):
+        stored = self.table[self.table != 0]
+        capacity = len(self.table)
+        while 2 * size > capacity:
+            capacity *= 2
+        self.table = np.zeros(capacity, dtype=np.uint64)
+        self.size = 0
+        self._insert(stored)
+
+
+def _sort_keys(values: np.ndarray) -> np.ndarray:
+    # float64 -> uint64 with the same order: flip every bit of the negatives, only the sign of the rest
+    bits = values.view(np.uint64)
+    return np.where(bits >> np.uint64(63), ~bits, bits | np.uint64(1 << 63))
+
+
+def _from_sort_key(key: np.uint64) -> float:
+    bits = key & np.uint64((1 << 63) - 1) if key >> np.uint64(63) else ~key
+    return float(np.array([bits], dtype=np.uint64).view(np.float64)[0])
+
+
+class SpilledMedian:
+    """Exact median of more values than fit in memory. The values are spilled to a temporary
+    file; the middle ones are found by radix selection, reading the file once for every
+    RADIX_BITS bits of their sort key."""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.count = 0
+
+    def add(self, values: np.ndarray):
+        np.asarray(values, dtype=np.float64).tofile(self.file)
+        self.count += len(values)
+
+    def _keys(self):
+        self.file.seek(0)
+        while len(values := np.fromfile(self.file, dtype=np.float64, count=SPILL_VALUES)):
+            yield _sort_keys(values)
+
+    def _select(self, rank: int) -> float:
+        # Value of the given rank (0 = smallest): the key is fixed RADIX_BITS bits at a time
+        prefix, bits = 0, 0
+        while bits < 64:
+            shift = np.uint64(64 - bits - RADIX_BITS)
+            counts = np.zeros(1 << RADIX_BITS, dtype=np.int64)
+            for keys in self._keys():
+                if bits:
+                    keys = keys[keys >> np.uint64(64 - bits) == np.uint64(prefix)]
+                digits = ((keys >> shift) & np.uint64((1 << RADIX_BITS) - 1)).astype(np.intp)
+                counts += np.bincount(digits, minlength=1 << RADIX_BITS)
+            digit = int(np.searchsorted(np.cumsum(counts), rank, side="right"))
+            rank -= int(counts[:digit].sum())
+            prefix = (prefix << RADIX_BITS) | digit
+            bits += RADIX_BITS
+        return _from_sort_key(np.uint64(prefix))
+
+    def median(self) -> float:
+        """Same as Series.median(): the mean of the two middle values when the count is even."""
+        if not self.count:
+            return np.nan
+        middle = self.count // 2
+        if self.count % 2:
+            return self._select(middle)
+        return (self._select(middle - 1) + self._select(middle)) / 2
+
+
+# ============================================================================
+# CROSS-CHUNK RULES
+# ============================================================================
+@dataclass
+class StreamingDedupe:
+    column: str
+    seen: SeenValues = field(default_factory=SeenValues)
+
+    def apply(self, cleaning: rules.Cleaning):
+        values = cleaning.column(self.column)
+        cleaning.filter(pd.Series(self.seen.add(hash_values(values)), index=values.index))
+
+
+@dataclass
+class CollectMedian:
+    """First pass of FillMedian: spills the values, fills nothing."""
+
+    column: str
+    values: SpilledMedian = field(default_factory=SpilledMedian)
+
+    def apply(self, cleaning: rules.Cleaning):
+        self.values.add(cleaning.column(self.column).dropna().to_numpy(dtype=np.float64))
+
+
+@dataclass
+class StreamingDates(rules.ParseDates):
+    """ParseDates with the format inferred from the first chunk that has dates."""
+
+    def apply(self, cleaning: rules.Cleaning):
+        if self.format is None:
+            values = cleaning.column(self.column)
+            dates = values[values.notna() & ~values.isin(NOT_DATES)]
+            if len(dates):
+                # "mixed" is what pd.to_datetime does when it can't infer a format
+                self.format = guess_datetime_format(dates.iloc[0]) or "mixed"
+        super().apply(cleaning)
+
+
+def _common_dtype(dtypes: set):
+    if len(dtypes) == 1:
+        return next(iter(dtypes))
+    try:
+        return np.result_type(*dtypes)  # e.g. int64 in some chunks, float64 in others
+    except TypeError:
+        return np.dtype(object)
+
+
+def _written_dtype(read, converted):
+    # What a column read as `read` by pd.read_csv ends as in the in-memory cleaning: a numeric
+    # column stays numeric (a float column converted to integers is still a float column)
+    if converted is None:
+        return read if read.kind in "iuf" else None  # other columns are written as in the file
+    if read.kind in "iuf" and converted.kind in "iuf":
+        return np.result_type(read, converted)
+    return converted
+
+
+def read_chunks(source: str, chunk_rows: int, dtype=str):
+    # Everything as text: the rules convert what they need, the same way in every chunk
+    return pd.read_csv(source, sep=",", dtype=dtype, chunksize=chunk_rows, on_bad_lines="warn")
+
+
+def clean_csv(source: str, destination: str, rule_set: list = rules.ORDER_RULES,
+              chunk_rows: int = CHUNK_ROWS) -> tuple[int, int]:
+    """Cleans source into destination a chunk at a time (two passes over source).
+    Returns:
+        tuple[int, int]: rows read, rows written.
+    """
+    dates = {
+        rule.column: StreamingDates(rule.column, rule.format)
+        for rule in rule_set if isinstance(rule, rules.ParseDates)
+    }
+
+    def streaming(rule, medians: dict):
+        if isinstance(rule, rules.Dedupe):
+            return StreamingDedupe(rule.column)
+        if isinstance(rule, rules.FillMedian):
+            return medians[rule.column]
+        if isinstance(rule, rules.ParseDates):
+            return dates[rule.column]  # the format found in the first pass is kept for the second
+        return rule
+
+    # Pass 1: the medians, the types pd.read_csv infers for the whole file (read again with
+    # inference, the same chunks) and the types the rules convert to
+    collect = {rule.column: CollectMedian(rule.column) for rule in rule_set if isinstance(rule, rules.FillMedian)}
+    first_pass = [streaming(rule, collect) for rule in rule_set]
+    read, converted = {}, {}
+    rows = 0
+    for chunk, inferred in zip(read_chunks(source, chunk_rows), read_chunks(source, chunk_rows, dtype=None)):
+        rows += len(chunk)
+        for name, dtype in inferred.dtypes.items():
+            read.setdefault(name, set()).add(dtype)
+        cleaning = rules.Cleaning(chunk)
+        for rule in first_pass:
+            rule.apply(cleaning)
+        for name, (_, values) in cleaning.columns.items():
+            if len(values):
+                converted.setdefault(name, set()).add(values.dtype)
+    dtypes = {
+        name: _written_dtype(_common_dtype(found), _common_dtype(converted[name]) if name in converted else None)
+        for name, found in read.items()
+    }
+    dtypes = {name: dtype for name, dtype in dtypes.items() if dtype is not None}
+
+    # Pass 2: clean and write
+    fills = {column: rules.Fill(column, rule.values.median()) for column, rule in collect.items()}
+    second_pass = [streaming(rule, fills) for rule in rule_set]
+    written = 0
+    with open(destination + ".tmp", "w", newline="", encoding="utf-8") as file:
+        pd.read_csv(source, nrows=0).to_csv(file, index=False)
+        for chunk in read_chunks(source, chunk_rows):
+            cleaned = rules.clean(chunk, second_pass)
+            cleaned = cleaned.astype({name: dtype for name, dtype in dtypes.items() if name in cleaned})
+            cleaned.to_csv(file, index=False, header=False)
+            written += len(cleaned)
+    os.replace(destination + ".tmp", destination)
+    return rows, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cleans an orders CSV a chunk at a time.")
+    parser.add_argument("source", help="CSV file or http(s) URL.")
+    parser.add_argument("destination", help="Cleaned CSV.")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows read at a time.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = args.source
+        if source.startswith(("http://", "https://")):
+            source = os.path.join(directory, "orders.csv")
+            download(args.source, source)
+        rows, written = clean_csv(source, args.destination, rules.ORDER_RULES, args.chunk_rows)
+    print(f"Rows before cleaning: {rows}, Rows after cleaning: {written}")
+    if rows:
+        print(f"Rows percent meeting the quality criteria: {written / rows * 100:.2f}%")
+    print(f"Cleaned data saved to '{args.destination}'")
+
+
+if __name__ == "__main__":
+    main()